@@ -23,6 +23,7 @@ ALTER TABLE location_property_tiger_import RENAME TO location_property_tiger;
 ALTER INDEX IF EXISTS idx_location_property_tiger_parent_place_id_imp RENAME TO idx_location_property_tiger_housenumber_parent_place_id;
 ALTER INDEX IF EXISTS idx_location_property_tiger_place_id_imp RENAME TO idx_location_property_tiger_place_id;
 
+DROP FUNCTION tiger_import_from_staging (staging TEXT);
 DROP FUNCTION tiger_line_import (linegeo GEOMETRY, in_startnumber INTEGER,
                                  in_endnumber INTEGER, interpolationtype TEXT,
                                  token_info JSONB, in_postcode TEXT);
@@ -15,6 +15,8 @@ CREATE TABLE location_property_tiger_import (
   step SMALLINT,
   postcode TEXT);
 
+-- Import a single Tiger line. Returns 1 when the line has been imported
+-- and 0 when it was rejected.
 CREATE OR REPLACE FUNCTION tiger_line_import(linegeo GEOMETRY, in_startnumber INTEGER,
                                              in_endnumber INTEGER, interpolationtype TEXT,
                                              token_info JSONB, in_postcode TEXT) RETURNS INTEGER
@@ -96,3 +98,91 @@ values (linegeo, nextval('seq_place'), out_partition,
 END;
 $$
 LANGUAGE plpgsql;
+
+-- Import the lines from a staging table with the columns linegeo (as text),
+-- startnumber, endnumber, interpolation, token_info and postcode.
+-- All lines are imported with a single statement. When this fails, for
+-- example because of a broken geometry, the lines are imported one by one
+-- and lines that cannot be imported are skipped with a warning.
+-- Returns the number of lines imported.
+CREATE OR REPLACE FUNCTION tiger_import_from_staging(staging TEXT) RETURNS INTEGER
+  AS $$
+DECLARE
+  lines_sql TEXT;
+  num_lines INTEGER;
+  line RECORD;
+BEGIN
+  -- Normalized lines together with the reason for rejecting them, if any.
+  lines_sql := format($sql$
+    SELECT *,
+           CASE WHEN in_startnumber < 0
+                THEN format('Negative house number range (%%s to %%s)',
+                            in_startnumber, endnumber)
+                -- Filter out really broken tiger data
+                WHEN numberrange > 0
+                     and numberrange::float/step::float > 500
+                     and ST_length(linegeo)/(numberrange::float/step::float) < 0.000001
+                THEN format('Road too short for number range %%s to %%s (%%s)',
+                            startnumber, endnumber,
+                            ST_length(linegeo)/(numberrange::float/step::float))
+           END as rejected
+      FROM (SELECT linegeo, endnumber, token_info, postcode,
+                   startnumber as in_startnumber,
+                   endnumber - startnumber as numberrange,
+                   CASE WHEN (interpolation = 'odd' AND startnumber %% 2 = 0)
+                             OR (interpolation = 'even' AND startnumber %% 2 = 1)
+                        THEN startnumber + 1 ELSE startnumber END as startnumber,
+                   CASE WHEN interpolation in ('odd', 'even') THEN 2 ELSE 1 END as step
+              FROM (SELECT CASE WHEN endnumber > startnumber THEN linegeo::GEOMETRY
+                                ELSE ST_Reverse(linegeo::GEOMETRY) END as linegeo,
+                           least(startnumber, endnumber) as startnumber,
+                           greatest(startnumber, endnumber) as endnumber,
+                           interpolation, token_info, postcode
+                      FROM %I) l) n
+    $sql$, staging);
+
+  EXECUTE format($sql$
+    INSERT INTO location_property_tiger_import (linegeo, place_id, partition,
+                                                parent_place_id, startnumber, endnumber,
+                                                step, postcode)
+      SELECT linegeo, nextval('seq_place'), partition,
+             coalesce(getNearestNamedRoadPlaceId(partition, centroid, token_info),
+                      getNearestParallelRoadFeature(partition, linegeo),
+                      getNearestRoadPlaceId(partition, centroid)),
+             startnumber, endnumber, step, postcode
+        FROM (SELECT *, ST_Centroid(linegeo) as centroid, get_partition('us') as partition
+                FROM (%s) lines WHERE rejected is NULL) valid
+    $sql$, lines_sql);
+
+  GET DIAGNOSTICS num_lines = ROW_COUNT;
+
+  FOR line IN EXECUTE format('SELECT rejected FROM (%s) lines WHERE rejected is not NULL',
+                             lines_sql)
+  LOOP
+    RAISE WARNING '%', line.rejected;
+  END LOOP;
+
+  RETURN num_lines;
+EXCEPTION
+  WHEN others THEN
+    RAISE WARNING 'Cannot import Tiger lines in bulk (%). Importing them one by one.',
+                  SQLERRM;
+    num_lines := 0;
+    FOR line IN EXECUTE format('SELECT * FROM %I', staging) LOOP
+      BEGIN
+        num_lines := num_lines
+                     + tiger_line_import(line.linegeo::GEOMETRY,
+                                         line.startnumber, line.endnumber,
+                                         line.interpolation, line.token_info,
+                                         line.postcode);
+      EXCEPTION
+        WHEN others THEN
+          RAISE WARNING 'Skipping Tiger line with number range % to % (%)',
+                        line.startnumber, line.endnumber, SQLERRM;
+      END;
+    END LOOP;
+
+    RETURN num_lines;
+END;
+$$
+LANGUAGE plpgsql;
@@ -7,28 +7,42 @@
 """
 Extended SQLAlchemy connection class that also includes access to the schema.
 """
-from typing import cast, Any, Mapping, Sequence, Union, Dict, Optional, Set
+from typing import cast, Any, Mapping, Sequence, Union, Dict, Optional, Set, \
+                   Awaitable, Callable, TypeVar, TYPE_CHECKING
 
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncConnection
 
 from nominatim.typing import SaFromClause
+from nominatim.config import Configuration
 from nominatim.db.sqlalchemy_schema import SearchTables
 from nominatim.db.sqlalchemy_types import Geometry
 from nominatim.api.logging import log
 
+if TYPE_CHECKING:
+    from nominatim.api.search.word_cache import WordTokenCache
+
+T = TypeVar('T')
+
 class SearchConnection:
     """ An extended SQLAlchemy connection class, that also contains
         then table definitions. The underlying asynchronous SQLAlchemy
         connection can be accessed with the 'connection' property.
         The 't' property is the collection of Nominatim tables.
+        The 'config' property is the configuration of the API object.
+        The 'word_cache' property is the cache for lookups in the word
+        table shared by all connections of the API object, if any.
     """
 
     def __init__(self, conn: AsyncConnection,
                  tables: SearchTables,
-                 properties: Dict[str, Any]) -> None:
+                 properties: Dict[str, Any],
+                 config: Configuration,
+                 word_cache: Optional['WordTokenCache'] = None) -> None:
         self.connection = conn
         self.t = tables # pylint: disable=invalid-name
+        self.config = config
+        self.word_cache = word_cache
         self._property_cache = properties
         self._classtables: Optional[Set[str]] = None
 
@@ -74,11 +88,51 @@ class SearchConnection:
         if value is None:
             raise ValueError(f"Property '{name}' not found in database.")
 
+        if self._property_cache.get(name, value) != value:
+            # Values derived from the old property value are outdated now.
+            for key in [k for k in self._property_cache
+                        if ':' in k and not k.startswith('DB:')]:
+                del self._property_cache[key]
+
         self._property_cache[name] = cast(str, value)
 
         return cast(str, value)
 
 
+    async def refresh_properties(self, prefix: str) -> None:
+        """ Read all cached properties whose name starts with the given
+            prefix again from the database. When one of them has changed,
+            the values derived from the properties are dropped.
+        """
+        for name in [k for k in self._property_cache
+                     if k.startswith(prefix) and ':' not in k]:
+            await self.get_property(name, cached=False)
+
+
+    async def get_cached_value(self, group: str, name: str,
+                               factory: Callable[[], Awaitable[T]]) -> T:
+        """ Access the cache of the Nominatim API object. The cache
+            is shared between all connections of the API object. Each
+            value belongs to a group and has a name within the group.
+            This function is for internal use by the API only.
+
+            `factory` is an asynchronous function that produces the
+            value when it is not cached yet.
+
+            All cached values are dropped when one of the properties
+            is found to have changed in the database.
+        """
+        full_name = f'{group}:{name}'
+
+        if full_name in self._property_cache:
+            return cast(T, self._property_cache[full_name])
+
+        value = await factory()
+        self._property_cache[full_name] = value
+
+        return value
+
+
     async def get_db_property(self, name: str) -> Any:
         """ Get a setting from the database. At the moment, only
             'server_version', the version of the database software, can
@@ -7,7 +7,8 @@
 """
 Implementation of classes for API access via libraries.
 """
-from typing import Mapping, Optional, Any, AsyncIterator, Dict, Sequence, List, Tuple
+from typing import Mapping, Optional, Any, AsyncIterator, Awaitable, Callable, Dict, \
+                   Hashable, Sequence, List, Tuple
 import asyncio
 import contextlib
 from pathlib import Path
@@ -24,11 +25,13 @@ from nominatim.api.status import get_status, StatusResult
 from nominatim.api.lookup import get_detailed_place, get_simple_place
 from nominatim.api.reverse import ReverseGeocoder
 from nominatim.api.search import ForwardGeocoder, Phrase, PhraseType, make_query_analyzer
+from nominatim.api.search.word_cache import WordTokenCache
+from nominatim.api.search.result_cache import SearchResultCache, make_cache_key
 import nominatim.api.types as ntyp
 from nominatim.api.results import DetailedResult, ReverseResult, SearchResults
 
 
-class NominatimAPIAsync:
+class NominatimAPIAsync: # pylint: disable=too-many-instance-attributes
     """ API loader asynchornous version.
     """
     def __init__(self, project_dir: Path,
@@ -39,7 +42,14 @@ class NominatimAPIAsync:
         self._engine_lock = asyncio.Lock()
         self._engine: Optional[sa_asyncio.AsyncEngine] = None
         self._tables: Optional[SearchTables] = None
+        self._pool_size = 0
+        self._connections_in_use = 0
+        self._search_concurrency = self.config.get_int('API_SEARCH_CONCURRENCY')
         self._property_cache: Dict[str, Any] = {'DB:server_version': 0}
+        self.word_cache = WordTokenCache(self.config.get_int('API_WORD_CACHE_SIZE'),
+                                         self.config.get_int('API_WORD_CACHE_TTL'))
+        self.result_cache = SearchResultCache(self.config.get_int('API_RESULT_CACHE_SIZE'),
+                                              self.config.get_int('API_RESULT_CACHE_TTL'))
 
 
     async def setup_database(self) -> None:
@@ -88,6 +98,7 @@ class NominatimAPIAsync:
             self._property_cache['DB:server_version'] = server_version
 
             self._tables = SearchTables(sa.MetaData(), engine.name) # pylint: disable=no-member
+            self._pool_size = pool_size
             self._engine = engine
 
 
@@ -114,8 +125,31 @@ class NominatimAPIAsync:
         assert self._engine is not None
         assert self._tables is not None
 
-        async with self._engine.begin() as conn:
-            yield SearchConnection(conn, self._tables, self._property_cache)
+        self._connections_in_use += 1
+        try:
+            async with self._engine.begin() as conn:
+                yield SearchConnection(conn, self._tables, self._property_cache,
+                                       self.config, self.word_cache)
+        finally:
+            self._connections_in_use -= 1
+
+
+    @contextlib.asynccontextmanager
+    async def _begin_if_available(self) -> AsyncIterator[Optional[SearchConnection]]:
+        """ Create a new connection like begin() but only when a connection
+            from the pool is available right away. Otherwise None is returned.
+        """
+        if self._connections_in_use >= self._pool_size:
+            yield None
+        else:
+            async with self.begin() as conn:
+                yield conn
+
+
+    def _forward_geocoder(self, conn: SearchConnection,
+                          details: ntyp.SearchDetails) -> ForwardGeocoder:
+        return ForwardGeocoder(conn, details, self._search_concurrency,
+                               self._begin_if_available)
 
 
     async def status(self) -> StatusResult:
@@ -174,6 +208,24 @@ class NominatimAPIAsync:
             return await geocoder.lookup(coord)
 
 
+    async def _cached_search(self, conn: SearchConnection, use_cache: bool,
+                             key: Hashable,
+                             search: Callable[[], Awaitable[SearchResults]]) -> SearchResults:
+        """ Run the given search function or return its results from
+            the result cache when available.
+        """
+        if not use_cache or not self.result_cache.enabled:
+            return await search()
+
+        await self.result_cache.validate(conn)
+        results = self.result_cache.get(key)
+        if results is None:
+            results = await search()
+            self.result_cache.add(key, results)
+
+        return results
+
+
     async def search(self, query: str, **params: Any) -> SearchResults:
         """ Find a place by free-text search. Also known as forward geocoding.
         """
@@ -181,10 +233,15 @@ class NominatimAPIAsync:
         if not query:
             raise UsageError('Nothing to search for.')
 
+        use_cache = params.pop('use_cache', True)
+        details = ntyp.SearchDetails.from_kwargs(params)
+        phrases = [Phrase(PhraseType.NONE, p.strip()) for p in query.split(',')]
+
         async with self.begin() as conn:
-            geocoder = ForwardGeocoder(conn, ntyp.SearchDetails.from_kwargs(params))
-            phrases = [Phrase(PhraseType.NONE, p.strip()) for p in query.split(',')]
-            return await geocoder.lookup(phrases)
+            geocoder = self._forward_geocoder(conn, details)
+            return await self._cached_search(conn, use_cache,
+                                             make_cache_key('search', phrases, details),
+                                             lambda: geocoder.lookup(phrases))
 
 
     # pylint: disable=too-many-arguments,too-many-branches
@@ -198,6 +255,7 @@ class NominatimAPIAsync:
                              **params: Any) -> SearchResults:
         """ Find an address using structured search.
         """
+        use_cache = params.pop('use_cache', True)
         async with self.begin() as conn:
             details = ntyp.SearchDetails.from_kwargs(params)
 
@@ -239,8 +297,10 @@ class NominatimAPIAsync:
                 if amenity:
                     details.layers |= ntyp.DataLayer.POI
 
-            geocoder = ForwardGeocoder(conn, details)
-            return await geocoder.lookup(phrases)
+            geocoder = self._forward_geocoder(conn, details)
+            return await self._cached_search(conn, use_cache,
+                                             make_cache_key('search_address', phrases, details),
+                                             lambda: geocoder.lookup(phrases))
 
 
     async def search_category(self, categories: List[Tuple[str, str]],
@@ -253,6 +313,7 @@ class NominatimAPIAsync:
         if not categories:
             return SearchResults()
 
+        use_cache = params.pop('use_cache', True)
         details = ntyp.SearchDetails.from_kwargs(params)
         async with self.begin() as conn:
             if near_query:
@@ -262,8 +323,11 @@ class NominatimAPIAsync:
                 if details.keywords:
                     await make_query_analyzer(conn)
 
-            geocoder = ForwardGeocoder(conn, details)
-            return await geocoder.lookup_pois(categories, phrases)
+            geocoder = self._forward_geocoder(conn, details)
+            return await self._cached_search(conn, use_cache,
+                                             make_cache_key('search_category', phrases,
+                                                            details, categories),
+                                             lambda: geocoder.lookup_pois(categories, phrases))
 
 
 
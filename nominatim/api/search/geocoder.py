@@ -7,7 +7,8 @@
 """
 Public interface to the search code.
 """
-from typing import List, Any, Optional, Iterator, Tuple
+from typing import List, Any, Optional, Iterator, Tuple, Dict, Callable, AsyncContextManager
+import asyncio
 import itertools
 
 from nominatim.api.connection import SearchConnection
@@ -20,14 +21,31 @@ from nominatim.api.search.query_analyzer_factory import make_query_analyzer, Abs
 from nominatim.api.search.query import Phrase, QueryStruct
 from nominatim.api.logging import log
 
+# Maximum difference in penalty between the current search and searches
+# that are started in advance. Once a result has been found, searches with
+# a penalty of more than 0.3 above are cut off in any case.
+LOOKAHEAD_PENALTY = 0.3
+
+# Function returning an additional database connection or None,
+# when no connection is available at the moment.
+ConnectionFactory = Callable[[], AsyncContextManager[Optional[SearchConnection]]]
+
 class ForwardGeocoder:
     """ Main class responsible for place search.
+
+        When `concurrency` is larger than 1 and a factory for additional
+        connections is given, up to that many searches are executed at
+        the same time.
     """
 
-    def __init__(self, conn: SearchConnection, params: SearchDetails) -> None:
+    def __init__(self, conn: SearchConnection, params: SearchDetails,
+                 concurrency: int = 1,
+                 extra_connection: Optional[ConnectionFactory] = None) -> None:
         self.conn = conn
         self.params = params
         self.query_analyzer: Optional[AbstractQueryAnalyzer] = None
+        self.concurrency = concurrency if extra_connection is not None else 1
+        self.extra_connection = extra_connection
 
 
     @property
@@ -74,16 +92,40 @@ class ForwardGeocoder:
         num_results = 0
         min_ranking = 1000.0
         prev_penalty = 0.0
-        for i, search in enumerate(searches):
-            if search.penalty > prev_penalty and (search.penalty > min_ranking or i > 20):
-                break
-            log().table_dump(f"{i + 1}. Search", _dump_searches([search], query))
-            for result in await search.lookup(self.conn, self.params):
-                results.append(result)
-                min_ranking = min(min_ranking, result.ranking + 0.5, search.penalty + 0.3)
-            log().result_dump('Results', ((r.accuracy, r) for r in results[num_results:]))
-            num_results = len(results)
-            prev_penalty = search.penalty
+        running: Dict[int, 'asyncio.Task[Optional[SearchResults]]'] = {}
+        try:
+            for i, search in enumerate(searches):
+                if _is_cutoff(i, search.penalty, prev_penalty, min_ranking):
+                    break
+
+                # Start the following searches of similar penalty in advance,
+                # as long as they would not be cut off with the results
+                # known so far.
+                for j in range(i + 1, min(i + self.concurrency, len(searches))):
+                    if j not in running:
+                        if searches[j].penalty > search.penalty + LOOKAHEAD_PENALTY \
+                           or _is_cutoff(j, searches[j].penalty, searches[j - 1].penalty,
+                                         min_ranking):
+                            break
+                        running[j] = asyncio.ensure_future(
+                                        self._lookup_on_extra_connection(searches[j]))
+
+                log().table_dump(f"{i + 1}. Search", _dump_searches([search], query))
+                task = running.pop(i, None)
+                lookup_results = None if task is None else await task
+                if lookup_results is None:
+                    lookup_results = await search.lookup(self.conn, self.params)
+                for result in lookup_results:
+                    results.append(result)
+                    min_ranking = min(min_ranking, result.ranking + 0.5, search.penalty + 0.3)
+                log().result_dump('Results', ((r.accuracy, r) for r in results[num_results:]))
+                num_results = len(results)
+                prev_penalty = search.penalty
+        finally:
+            for task in running.values():
+                task.cancel()
+            if running:
+                await asyncio.gather(*running.values(), return_exceptions=True)
 
         if results:
             min_ranking = min(r.ranking for r in results)
@@ -102,6 +144,18 @@ class ForwardGeocoder:
         return results
 
 
+    async def _lookup_on_extra_connection(self,
+                                          search: AbstractSearch) -> Optional[SearchResults]:
+        """ Run the search on an additional connection. Returns None
+            when no connection is available.
+        """
+        assert self.extra_connection is not None
+        async with self.extra_connection() as conn:
+            if conn is None:
+                return None
+            return await search.lookup(conn, self.params)
+
+
     async def lookup_pois(self, categories: List[Tuple[str, str]],
                           phrases: List[Phrase]) -> SearchResults:
         """ Look up places by category. If phrase is given, a place search
@@ -148,6 +202,14 @@ class ForwardGeocoder:
         return results
 
 
+def _is_cutoff(num: int, penalty: float, prev_penalty: float, min_ranking: float) -> bool:
+    """ Check if the search with the given position and penalty should
+        not be executed anymore, given the penalty of the search before
+        and the best ranking of the results found so far.
+    """
+    return penalty > prev_penalty and (penalty > min_ranking or num > 20)
+
+
 # pylint: disable=invalid-name,too-many-locals
 def _dump_searches(searches: List[AbstractSearch], query: QueryStruct,
                    start: int = 0) -> Iterator[Optional[List[Any]]]:
@@ -22,6 +22,7 @@ from nominatim.api.connection import SearchConnection
 from nominatim.api.logging import log
 from nominatim.api.search import query as qmod
 from nominatim.api.search.query_analyzer_factory import AbstractQueryAnalyzer
+from nominatim.api.search.word_dictionary_loader import get_word_dictionary_loader
 
 
 DB_TO_TOKEN_TYPE = {
@@ -133,10 +134,20 @@ class ICUQueryAnalyzer(AbstractQueryAnalyzer):
     async def setup(self) -> None:
         """ Set up static data structures needed for the analysis.
         """
-        rules = await self.conn.get_property('tokenizer_import_normalisation')
-        self.normalizer = Transliterator.createFromRules("normalization", rules)
-        rules = await self.conn.get_property('tokenizer_import_transliteration')
-        self.transliterator = Transliterator.createFromRules("transliteration", rules)
+        async def _make_normalizer() -> Any:
+            rules = await self.conn.get_property('tokenizer_import_normalisation')
+            return Transliterator.createFromRules("normalization", rules)
+
+        async def _make_transliterator() -> Any:
+            rules = await self.conn.get_property('tokenizer_import_transliteration')
+            return Transliterator.createFromRules("transliteration", rules)
+
+        # Building the transliterators is expensive, so they are shared
+        # between all connections of the API.
+        self.normalizer = await self.conn.get_cached_value('ICUTOK', 'normalizer',
+                                                           _make_normalizer)
+        self.transliterator = await self.conn.get_cached_value('ICUTOK', 'transliterator',
+                                                               _make_transliterator)
 
         if 'word' not in self.conn.t.meta.tables:
             sa.Table('word', self.conn.t.meta,
@@ -146,6 +157,8 @@ class ICUQueryAnalyzer(AbstractQueryAnalyzer):
                      sa.Column('word', sa.Text),
                      sa.Column('info', self.conn.t.types.Json))
 
+        self.word_dictionary = await get_word_dictionary_loader(self.conn)
+
 
     async def analyze_query(self, phrases: List[qmod.Phrase]) -> qmod.QueryStruct:
         """ Analyze the given list of phrases and return the
@@ -228,12 +241,36 @@ class ICUQueryAnalyzer(AbstractQueryAnalyzer):
         return parts, words
 
 
-    async def lookup_in_db(self, words: List[str]) -> 'sa.Result[Any]':
+    async def lookup_in_db(self, words: List[str]) -> List[SaRow]:
         """ Return the token information from the database for the
-            given word tokens.
+            given word tokens. Tokens found in the word cache of the
+            API are not looked up again. When a word dictionary is
+            available, the tokens are looked up there instead.
         """
-        t = self.conn.t.meta.tables['word']
-        return await self.conn.execute(t.select().where(t.c.word_token.in_(words)))
+        if self.word_dictionary is not None:
+            dict_rows = self.word_dictionary.lookup(words)
+            if dict_rows is not None:
+                return dict_rows
+
+        cache = self.conn.word_cache
+        rows: List[SaRow]
+        if cache is None or not cache.enabled:
+            rows, missing = [], words
+        else:
+            await cache.validate(self.conn)
+            rows, missing = cache.get(words)
+            log().comment(f"Word cache: {len(words) - len(missing)} of {len(words)} "
+                          "tokens found")
+
+        if missing:
+            t = self.conn.t.meta.tables['word']
+            new_rows = list(await self.conn.execute(t.select()
+                                                     .where(t.c.word_token.in_(missing))))
+            if cache is not None:
+                cache.add(missing, new_rows)
+            rows.extend(new_rows)
+
+        return rows
 
 
     def add_extra_tokens(self, query: qmod.QueryStruct, parts: QueryParts) -> None:
@@ -7,10 +7,11 @@
 """
 Factory for creating a query analyzer for the configured tokenizer.
 """
-from typing import List, cast, TYPE_CHECKING
+from typing import Any, List, cast, TYPE_CHECKING
 from abc import ABC, abstractmethod
 from pathlib import Path
 import importlib
+import time
 
 from nominatim.api.logging import log
 from nominatim.api.connection import SearchConnection
@@ -18,6 +19,9 @@ from nominatim.api.connection import SearchConnection
 if TYPE_CHECKING:
     from nominatim.api.search.query import Phrase, QueryStruct
 
+# Minimum time in seconds between two checks of the tokenizer properties.
+PROPERTY_CHECK_INTERVAL = 60.0
+
 class AbstractQueryAnalyzer(ABC):
     """ Class for analysing incomming queries.
 
@@ -30,16 +34,44 @@ class AbstractQueryAnalyzer(ABC):
         """
 
 
+class _PropertyCheck:
+    """ Time of the next check of the tokenizer properties.
+    """
+
+    def __init__(self) -> None:
+        self.next_check = time.monotonic() + PROPERTY_CHECK_INTERVAL
+
+
+async def _make_property_check() -> _PropertyCheck:
+    return _PropertyCheck()
+
+
 async def make_query_analyzer(conn: SearchConnection) -> AbstractQueryAnalyzer:
     """ Create a query analyzer for the tokenizer used by the database.
+
+        The tokenizer module and the state of the analyzer are shared
+        between all connections. They are rebuilt when the properties of
+        the tokenizer have changed in the database. The properties are
+        checked at most every PROPERTY_CHECK_INTERVAL seconds.
     """
+    check = await conn.get_cached_value('TOKENIZER', 'property_check', _make_property_check)
+    now = time.monotonic()
+    if now >= check.next_check:
+        # Set before querying, so that concurrent tasks do not check as well.
+        check.next_check = now + PROPERTY_CHECK_INTERVAL
+        await conn.refresh_properties('tokenizer')
+
     name = await conn.get_property('tokenizer')
 
-    src_file = Path(__file__).parent / f'{name}_tokenizer.py'
-    if not src_file.is_file():
-        log().comment(f"No tokenizer named '{name}' available. Database not set up properly.")
-        raise RuntimeError('Tokenizer not found')
+    async def _load_module() -> Any:
+        src_file = Path(__file__).parent / f'{name}_tokenizer.py'
+        if not src_file.is_file():
+            log().comment(f"No tokenizer named '{name}' available. "
+                          "Database not set up properly.")
+            raise RuntimeError('Tokenizer not found')
+
+        return importlib.import_module(f'nominatim.api.search.{name}_tokenizer')
 
-    module = importlib.import_module(f'nominatim.api.search.{name}_tokenizer')
+    module = await conn.get_cached_value('TOKENIZER', name, _load_module)
 
     return cast(AbstractQueryAnalyzer, await module.create_query_analyzer(conn))
@@ -0,0 +1,142 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+In-process cache for the results of forward searches.
+"""
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple, cast
+from collections import OrderedDict
+import copy
+import dataclasses
+import math
+import time
+
+from nominatim.api.connection import SearchConnection
+from nominatim.api.status import get_data_version
+from nominatim.api.types import SearchDetails, Bbox
+from nominatim.api.results import SearchResults
+from nominatim.api.search.query import Phrase
+
+# Minimum time in seconds between two checks of the import status.
+STATUS_CHECK_INTERVAL = 10.0
+
+# Fields of SearchDetails that are derived from other fields.
+_DERIVED_FIELDS = ('viewbox_x2', )
+
+def _key_value(value: Any) -> Hashable:
+    if isinstance(value, Bbox):
+        return value.coords
+    if isinstance(value, (list, tuple)):
+        return tuple(_key_value(v) for v in value)
+    return cast(Hashable, value)
+
+
+def make_cache_key(endpoint: str, phrases: Iterable[Phrase],
+                   details: SearchDetails, *extra: Any) -> Hashable:
+    """ Create the key for a search from the name of the search function,
+        the phrases of the query and the search parameters. Phrases are
+        normalized for case and whitespace. `extra` takes further
+        parameters of the search function.
+    """
+    return (endpoint,
+            tuple((p.ptype, ' '.join(p.text.split()).lower()) for p in phrases),
+            tuple(_key_value(getattr(details, f.name)) for f in dataclasses.fields(details)
+                  if f.name not in _DERIVED_FIELDS),
+            _key_value(extra))
+
+
+class SearchResultCache:
+    """ Least-recently-used cache for the results of forward searches.
+        The cache is shared by all connections of an API object.
+
+        Entries are dropped after `ttl` seconds, a `ttl` of 0 keeps them
+        until they are evicted. Each entry is tagged with the import status
+        of the database at the time the search was done. Entries from an
+        older state of the database are dropped as soon as new data has
+        been imported. A `maxsize` of 0 disables the cache.
+
+        The results are copied when they are saved and when they are
+        returned, so that callers may modify them freely.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any, SearchResults]]' = OrderedDict()
+        self._data_version: Any = None
+        self._next_status_check = 0.0
+
+
+    @property
+    def enabled(self) -> bool:
+        """ True if the cache may hold any entries.
+        """
+        return self.maxsize > 0
+
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+    def clear(self) -> None:
+        """ Remove all entries from the cache. Counters are kept.
+        """
+        self._data.clear()
+
+
+    async def validate(self, conn: SearchConnection) -> None:
+        """ Check the import status of the database and drop all entries
+            that were created for an older state of the data. The status
+            is looked up at most every few seconds.
+        """
+        now = time.monotonic()
+        if now < self._next_status_check:
+            return
+        # Set before querying, so that concurrent tasks do not check as well.
+        self._next_status_check = now + STATUS_CHECK_INTERVAL
+
+        version = await get_data_version(conn)
+
+        if version != self._data_version:
+            self._data_version = version
+            for key in [k for k, v in self._data.items() if v[1] != version]:
+                del self._data[key]
+
+
+    def get(self, key: Hashable) -> Optional[SearchResults]:
+        """ Return a copy of the results saved for the given key or None
+            when there is no valid entry.
+        """
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != self._data_version:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._data.move_to_end(key)
+        return copy.deepcopy(entry[2])
+
+
+    def add(self, key: Hashable, results: SearchResults) -> None:
+        """ Save a copy of the results for the given key.
+        """
+        if not self.enabled:
+            return
+
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else math.inf
+        self._data[key] = (expires, self._data_version, copy.deepcopy(results))
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+    def stats(self) -> Dict[str, int]:
+        """ Return the current counters of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
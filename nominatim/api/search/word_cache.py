@@ -0,0 +1,127 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+In-process cache for the rows of the word table.
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+from collections import OrderedDict
+import math
+import time
+
+from nominatim.typing import SaRow
+from nominatim.api.connection import SearchConnection
+from nominatim.api.status import get_data_version
+
+# Minimum time in seconds between two checks of the import status.
+STATUS_CHECK_INTERVAL = 10.0
+
+class WordTokenCache:
+    """ Least-recently-used cache for looking up rows of the word table
+        by their word token. The cache is shared by all query analyzers
+        of an API object.
+
+        Entries are dropped after `ttl` seconds, a `ttl` of 0 keeps them
+        until they are evicted. The whole cache is cleared when the import
+        status of the database shows that new data has been imported.
+        A `maxsize` of 0 disables the cache.
+
+        The cache is safe to use from concurrent tasks of the same
+        event loop: no function awaits while the cache content is
+        modified.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[str, Tuple[float, List[SaRow]]]' = OrderedDict()
+        self._data_version: Any = None
+        self._next_status_check = 0.0
+
+
+    @property
+    def enabled(self) -> bool:
+        """ True if the cache may hold any entries.
+        """
+        return self.maxsize > 0
+
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+    def clear(self) -> None:
+        """ Remove all entries from the cache. Counters are kept.
+        """
+        self._data.clear()
+
+
+    async def validate(self, conn: SearchConnection) -> None:
+        """ Check the import status of the database and clear the cache
+            when new data has been imported since the last check. The
+            status is looked up at most every few seconds.
+        """
+        now = time.monotonic()
+        if now < self._next_status_check:
+            return
+        # Set before querying, so that concurrent tasks do not check as well.
+        self._next_status_check = now + STATUS_CHECK_INTERVAL
+
+        version = await get_data_version(conn)
+
+        if version != self._data_version:
+            self._data_version = version
+            self.clear()
+
+
+    def get(self, tokens: Iterable[str]) -> Tuple[List[SaRow], List[str]]:
+        """ Look up the given word tokens in the cache. Returns the
+            cached rows and the list of tokens that are not in the cache.
+        """
+        rows: List[SaRow] = []
+        missing: List[str] = []
+        now = time.monotonic()
+
+        for token in tokens:
+            entry = self._data.get(token)
+            if entry is None or entry[0] < now:
+                self.misses += 1
+                missing.append(token)
+            else:
+                self.hits += 1
+                self._data.move_to_end(token)
+                rows.extend(entry[1])
+
+        return rows, missing
+
+
+    def add(self, tokens: Iterable[str], rows: Iterable[SaRow]) -> None:
+        """ Save the rows found in the database for the given word tokens.
+            Tokens without any row are saved as well, so that they are not
+            looked up again.
+        """
+        if not self.enabled:
+            return
+
+        by_token: Dict[str, List[SaRow]] = {t: [] for t in tokens}
+        for row in rows:
+            by_token.setdefault(row.word_token, []).append(row)
+
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else math.inf
+        for token, token_rows in by_token.items():
+            self._data[token] = (expires, token_rows)
+            self._data.move_to_end(token)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+    def stats(self) -> Dict[str, int]:
+        """ Return the current counters of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
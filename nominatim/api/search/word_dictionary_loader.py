@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Access to the exported word dictionary for the query analysis of the
+ICU tokenizer.
+"""
+from typing import List, Optional, Tuple, cast
+from pathlib import Path
+import time
+
+from nominatim.typing import SaRow
+from nominatim.data.word_dictionary import WordDictionary
+from nominatim.api.connection import SearchConnection
+from nominatim.api.logging import log
+
+# Minimum time in seconds between two checks if the file has been replaced.
+FILE_CHECK_INTERVAL = 10.0
+
+class WordDictionaryLoader:
+    """ Keeps the word dictionary file mapped into memory and maps it
+        again when the file has been replaced by a new export.
+    """
+
+    def __init__(self, filename: Path) -> None:
+        self.filename = filename
+        self.dictionary: Optional[WordDictionary] = None
+        self._file_id: Optional[Tuple[int, int, int]] = None
+        self._next_check = 0.0
+
+
+    def get(self) -> Optional[WordDictionary]:
+        """ Return the current word dictionary or None if the file
+            is not available.
+        """
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + FILE_CHECK_INTERVAL
+            try:
+                stat = self.filename.stat()
+                file_id: Optional[Tuple[int, int, int]] = \
+                    (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                file_id = None
+
+            if file_id != self._file_id:
+                self._file_id = file_id
+                if self.dictionary is not None:
+                    self.dictionary.close()
+                    self.dictionary = None
+                if file_id is not None:
+                    try:
+                        self.dictionary = WordDictionary(self.filename)
+                    except (OSError, ValueError) as err:
+                        log().comment(f"Cannot open word dictionary: {err}")
+
+        return self.dictionary
+
+
+    def lookup(self, words: List[str]) -> Optional[List[SaRow]]:
+        """ Return the token information for the given word tokens
+            from the word dictionary. Returns None when the dictionary
+            is not available.
+        """
+        dictionary = self.get()
+        if dictionary is None:
+            return None
+
+        rows = []
+        for word in words:
+            rows.extend(dictionary.lookup(word))
+
+        return cast(List[SaRow], rows)
+
+
+async def get_word_dictionary_loader(conn: SearchConnection) -> Optional[WordDictionaryLoader]:
+    """ Return the loader for the word dictionary file, when one is
+        configured. The loader is shared between all connections of the API.
+    """
+    filename = conn.config.get_path('API_WORD_DICTIONARY')
+    if filename is None:
+        return None
+
+    async def _make_loader() -> WordDictionaryLoader:
+        assert filename is not None
+        return WordDictionaryLoader(filename)
+
+    return await conn.get_cached_value('ICUTOK', 'word_dictionary', _make_loader)
@@ -7,7 +7,7 @@
 """
 Classes and function releated to status call.
 """
-from typing import Optional
+from typing import Optional, Tuple
 import datetime as dt
 import dataclasses
 
@@ -44,3 +44,13 @@ async def get_status(conn: SearchConnection) -> StatusResult:
         pass
 
     return status
+
+
+async def get_data_version(conn: SearchConnection) -> Optional[Tuple[dt.datetime, Optional[int]]]:
+    """ Return the date and the replication sequence ID of the data
+        in the database. The result changes whenever new data is imported.
+    """
+    t = conn.t.import_status
+    row = (await conn.execute(sa.select(t.c.lastimportdate, t.c.sequence_id).limit(1))).first()
+
+    return None if row is None else (row.lastimportdate, row.sequence_id)
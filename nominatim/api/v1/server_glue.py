@@ -435,6 +435,9 @@ async def search_endpoint(api: napi.NominatimAPIAsync, params: ASGIAdaptor) -> A
     details['viewbox'] = params.get('viewbox', None) or params.get('viewboxlbrt', None)
     details['bounded_viewbox'] = params.get_bool('bounded', False)
     details['dedupe'] = params.get_bool('dedupe', True)
+    # Debug output needs a full search, clients may ask for fresh results.
+    details['use_cache'] = not debug \
+                           and 'no-cache' not in (params.get_header('cache-control') or '')
 
     max_results = max(1, min(50, params.get_int('limit', 10)))
     details['max_results'] = max_results + min(10, max_results) \
@@ -87,12 +87,23 @@ class NominatimArgs:
     offline: bool
     ignore_errors: bool
     index_noanalyse: bool
+    pretokenize: bool
 
     # Arguments to 'index'
     boundaries_only: bool
     no_boundaries: bool
     minrank: int
     maxrank: int
+    tokenizer_processes: int
+    fetch_connections: int
+    write_mode: str
+    auto_batch_size: bool
+    checkpoint: bool
+    shard: Optional[str]
+    locality_dispatch: bool
+    benchmark: bool
+    benchmark_sanitizers: bool
+    sample: int
 
     # Arguments to 'export'
     output_type: str
@@ -108,6 +119,7 @@ class NominatimArgs:
     postcodes: bool
     word_tokens: bool
     word_counts: bool
+    word_dictionary: bool
     address_levels: bool
     functions: bool
     wiki_data: bool
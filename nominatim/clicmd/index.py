@@ -41,22 +41,90 @@ class UpdateIndex:
                            help='Minimum/starting rank')
         group.add_argument('--maxrank', '-R', type=int, metavar='RANK', default=30,
                            help='Maximum/finishing rank')
+        group = parser.add_argument_group('Resume arguments')
+        group.add_argument('--checkpoint', action='store_true',
+                           help="""Record the progress of indexing in the database.
+                                   When the indexing is interrupted, rerunning the
+                                   command with this option resumes where it stopped.
+                                   Do not add new data before resuming.""")
+        group = parser.add_argument_group('Performance arguments')
+        group.add_argument('--tokenizer-processes', type=int, metavar='NUM', default=0,
+                           help="""Number of separate processes to use for computing
+                                   the search terms of places (default: compute in
+                                   the main process)""")
+        group.add_argument('--fetch-connections', type=int, metavar='NUM', default=1,
+                           help="""Number of database connections to use for
+                                   fetching place details in parallel (default: 1)""")
+        group.add_argument('--write-mode', choices=['values', 'copy'], default='values',
+                           help="""How to write indexing results back into the
+                                   database: per small batch of places (values) or
+                                   in bulk through staging tables (copy)
+                                   (default: values)""")
+        group.add_argument('--auto-batch-size', action='store_true',
+                           help="""Adapt the number of places fetched and written
+                                   at once to the measured performance. Statement
+                                   times include time spent by the indexer process
+                                   itself, e.g. in the tokenizer""")
+        group.add_argument('--locality-dispatch', action='store_true',
+                           help="""Never update places of the same area concurrently.
+                                   Reduces deadlocks between neighbouring places""")
+        group.add_argument('--shard', metavar='K/N',
+                           help="""Only do the K-th part of the work, when indexing
+                                   is split over N processes or machines that run
+                                   at the same time. All N shards must be started.""")
+        group = parser.add_argument_group('Benchmark arguments')
+        group.add_argument('--benchmark', action='store_true',
+                           help="""Do not index anything. Instead measure the speed
+                                   of the tokenizer on a random sample of places""")
+        group.add_argument('--benchmark-sanitizers', action='store_true',
+                           help="""Do not index anything. Instead measure how much
+                                   time the sanitizers of the ICU tokenizer take
+                                   on a random sample of places""")
+        group.add_argument('--sample', type=int, metavar='NUM', default=1000,
+                           help="""Number of places to use for the benchmark
+                                   (default: 1000)""")
 
 
     def run(self, args: NominatimArgs) -> int:
-        from ..indexer.indexer import Indexer
+        from ..indexer.indexer import Indexer, IndexerOptions
+        from ..indexer.sharding import Shard
+        from ..indexer.metrics import create_metrics_writer
         from ..tokenizer import factory as tokenizer_factory
 
+        if args.benchmark_sanitizers:
+            from ..indexer.benchmark import benchmark_sanitizer_on_db
+            print(benchmark_sanitizer_on_db(args.config.get_libpq_dsn(), args.config,
+                                            args.sample).report())
+            return 0
+
         tokenizer = tokenizer_factory.get_tokenizer_for_db(args.config)
 
+        if args.benchmark:
+            from ..indexer.benchmark import benchmark_tokenizer
+            result = benchmark_tokenizer(args.config.get_libpq_dsn(), tokenizer, args.sample)
+            print(result.report())
+            return 0
+
+        shard = Shard.from_string(args.shard) if args.shard else None
+
+        options = IndexerOptions(tokenizer_processes=args.tokenizer_processes,
+                                 fetch_connections=args.fetch_connections,
+                                 write_mode=args.write_mode,
+                                 adaptive_batches=args.auto_batch_size,
+                                 checkpoints=args.checkpoint,
+                                 shard=shard,
+                                 locality_dispatch=args.locality_dispatch,
+                                 metrics=create_metrics_writer(args.config))
         indexer = Indexer(args.config.get_libpq_dsn(), tokenizer,
-                          args.threads or psutil.cpu_count() or 1)
+                          args.threads or psutil.cpu_count() or 1, options)
 
         if not args.no_boundaries:
             indexer.index_boundaries(args.minrank, args.maxrank)
         if not args.boundaries_only:
             indexer.index_by_rank(args.minrank, args.maxrank)
 
+        indexer.clear_checkpoint()
+
         if not args.no_boundaries and not args.boundaries_only \
            and args.minrank == 0 and args.maxrank == 30:
             with connect(args.config.get_libpq_dsn()) as conn:
@@ -57,6 +57,8 @@ class UpdateRefresh:
                            help='Clean up search terms')
         group.add_argument('--word-counts', action='store_true',
                            help='Compute frequency of full-word search terms')
+        group.add_argument('--word-dictionary', action='store_true',
+                           help='Export the search terms for use by the Python frontend')
         group.add_argument('--address-levels', action='store_true',
                            help='Reimport address level configuration')
         group.add_argument('--functions', action='store_true',
@@ -106,11 +108,21 @@ class UpdateRefresh:
         if args.word_tokens:
             LOG.warning('Updating word tokens')
             tokenizer = self._get_tokenizer(args.config)
-            tokenizer.update_word_tokens()
+            tokenizer.update_word_tokens(threads=args.threads or 1)
 
         if args.word_counts:
             LOG.warning('Recompute word statistics')
-            self._get_tokenizer(args.config).update_statistics()
+            self._get_tokenizer(args.config).update_statistics(threads=args.threads or 1)
+
+        if args.word_dictionary or \
+           ((args.word_tokens or args.word_counts) and args.config.API_WORD_DICTIONARY):
+            filename = args.config.get_path('API_WORD_DICTIONARY')
+            if filename is None:
+                LOG.fatal('No word dictionary configured. '
+                          'Set NOMINATIM_API_WORD_DICTIONARY.')
+                return 1
+            with connect(args.config.get_libpq_dsn()) as conn:
+                refresh.export_word_dictionary(conn, filename)
 
         if args.address_levels:
             LOG.warning('Updating address levels')
@@ -125,8 +125,9 @@ class UpdateReplication:
 
     def _update(self, args: NominatimArgs) -> None:
         # pylint: disable=too-many-locals
-        from ..tools import replication
-        from ..indexer.indexer import Indexer
+        from ..tools import replication, refresh
+        from ..indexer.indexer import Indexer, IndexerOptions
+        from ..indexer.metrics import create_metrics_writer
         from ..tokenizer import factory as tokenizer_factory
 
         update_interval = self._compute_update_interval(args)
@@ -145,9 +146,11 @@ class UpdateReplication:
             recheck_interval = args.config.get_int('REPLICATION_RECHECK_INTERVAL')
 
         tokenizer = tokenizer_factory.get_tokenizer_for_db(args.config)
-        indexer = Indexer(args.config.get_libpq_dsn(), tokenizer, args.threads or 1)
+        indexer = Indexer(args.config.get_libpq_dsn(), tokenizer, args.threads or 1,
+                          IndexerOptions(metrics=create_metrics_writer(args.config)))
 
         dsn = args.config.get_libpq_dsn()
+        word_dictionary = args.config.get_path('API_WORD_DICTIONARY')
 
         while True:
             start = dt.datetime.now(dt.timezone.utc)
@@ -167,6 +170,10 @@ class UpdateReplication:
                     status.set_indexed(conn, True)
                     status.log_status(conn, index_start, 'index')
                     conn.commit()
+
+                    if word_dictionary is not None:
+                        refresh.export_word_dictionary(conn, word_dictionary,
+                                                       only_if_changed=True)
             else:
                 index_start = None
 
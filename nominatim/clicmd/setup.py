@@ -45,7 +45,7 @@ class SetupAll:
                            help='OSM file to be imported'
                                 ' (repeat for importing multiple files)')
         group1.add_argument('--continue', dest='continue_at',
-                           choices=['load-data', 'indexing', 'db-postprocess'],
+                           choices=['load-data', 'tokenize', 'indexing', 'db-postprocess'],
                            help='Continue an import that was interrupted')
         group2 = parser.add_argument_group('Optional arguments')
         group2.add_argument('--osm2pgsql-cache', metavar='SIZE', type=int,
@@ -65,12 +65,17 @@ class SetupAll:
                            help='Continue import even when errors in SQL are present')
         group3.add_argument('--index-noanalyse', action='store_true',
                            help='Do not perform analyse operations during index (expert only)')
+        group3.add_argument('--pretokenize', action='store_true',
+                           help='Compute the token information of all places in a separate'
+                                ' pass before indexing')
 
 
-    def run(self, args: NominatimArgs) -> int: # pylint: disable=too-many-statements
+    def run(self, args: NominatimArgs) -> int: # pylint: disable=too-many-statements,too-many-locals
         from ..data import country_info
         from ..tools import database_import, refresh, postcodes, freeze
-        from ..indexer.indexer import Indexer
+        from ..indexer.indexer import Indexer, IndexerOptions
+        from ..indexer import pretokenize
+        from ..indexer.metrics import create_metrics_writer
 
         num_threads = args.threads or psutil.cpu_count() or 1
 
@@ -128,9 +133,20 @@ class SetupAll:
             postcodes.update_postcodes(args.config.get_libpq_dsn(),
                                        args.project_dir, tokenizer)
 
-        if args.continue_at is None or args.continue_at in ('load-data', 'indexing'):
+        if args.continue_at == 'tokenize' \
+           or (args.pretokenize and args.continue_at in (None, 'load-data')):
+            LOG.warning('Tokenizing places')
+            pretokenize.pretokenize_places(args.config.get_libpq_dsn(), tokenizer, num_threads)
+
+        if args.continue_at is None \
+           or args.continue_at in ('load-data', 'tokenize', 'indexing'):
             LOG.warning('Indexing places')
-            indexer = Indexer(args.config.get_libpq_dsn(), tokenizer, num_threads)
+            indexer = Indexer(args.config.get_libpq_dsn(), tokenizer, num_threads,
+                              IndexerOptions(checkpoints=True,
+                                             metrics=create_metrics_writer(args.config)))
+            if args.continue_at != 'indexing':
+                # Any progress recorded refers to previously loaded data.
+                indexer.clear_checkpoint()
             indexer.index_full(analyse=not args.index_noanalyse)
 
         LOG.warning('Post-process tables')
@@ -141,12 +157,13 @@ class SetupAll:
             LOG.warning('Create search index for default country names.')
             country_info.create_country_names(conn, tokenizer,
                                               args.config.get_str_list('LANGUAGES'))
+            pretokenize.drop_pretokenized(conn)
             if args.no_updates:
                 freeze.drop_update_tables(conn)
         tokenizer.finalize_import(args.config)
 
         LOG.warning('Recompute word counts')
-        tokenizer.update_statistics()
+        tokenizer.update_statistics(threads=num_threads)
 
         webdir = args.project_dir / 'website'
         LOG.warning('Setup website at %s', webdir)
@@ -0,0 +1,220 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+File format for a read-only copy of the word table of the ICU tokenizer.
+
+The word dictionary contains all rows of the word table sorted by their
+word token, so that the rows for a token can be found with a binary
+search. The file is accessed through a read-only memory map, which lets
+all processes reading the same file share it in the page cache.
+
+The file consists of three parts:
+
+ * the header with the format version, the number of tokens and rows,
+   the highest word ID and the position of the index,
+ * the data with one entry for each token: the UTF-8 encoded token and
+   its rows, each consisting of the word ID and a JSON array with type,
+   word and info of the row,
+ * the index with the positions of all token entries in token order.
+"""
+from typing import Any, List, NamedTuple, Optional, Type, Union, cast
+from types import TracebackType
+from pathlib import Path
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'NOMWDICT'
+VERSION = 1
+
+# magic, version, number of tokens, number of rows, max word ID, index position
+HEADER = struct.Struct('<8sIIQqQ')
+# length of token, number of rows
+TOKEN_HEADER = struct.Struct('<II')
+# word ID, length of row data
+ROW_HEADER = struct.Struct('<qI')
+# word ID saved for rows without one
+NO_WORD_ID = -1
+# position of a token entry
+INDEX_ENTRY = struct.Struct('<Q')
+
+
+class WordRow(NamedTuple):
+    """ A row of the word table as saved in the word dictionary.
+    """
+    word_id: Optional[int]
+    word_token: str
+    type: str
+    word: Optional[str]
+    info: Optional[Any]
+
+
+class WordDictionaryWriter: # pylint: disable=too-many-instance-attributes
+    """ Writer for a new word dictionary. The rows must be added in the
+        order of the UTF-8 encoded word tokens. The new file is written
+        under a temporary name and replaces `filename` only when the
+        writer is finished without error.
+    """
+
+    def __init__(self, filename: Union[str, 'os.PathLike[str]']) -> None:
+        self.filename = Path(filename)
+        self.num_rows = 0
+        self.max_word_id = 0
+        self._tmpname = self.filename.with_name(self.filename.name + '.tmp')
+        self._fd = open(self._tmpname, 'wb') # pylint: disable=consider-using-with
+        self._fd.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0))
+        self._index = array.array('Q')
+        self._token: Optional[bytes] = None
+        self._rows: List[bytes] = []
+
+
+    def __enter__(self) -> 'WordDictionaryWriter':
+        return self
+
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        if exc_type is None:
+            self.finish()
+        else:
+            self._fd.close()
+            self._tmpname.unlink()
+
+
+    def add(self, word_id: Optional[int], word_token: str, wtype: str,
+            word: Optional[str], info: Optional[Any]) -> None:
+        """ Add a row of the word table.
+        """
+        token = word_token.encode('utf-8')
+        if token != self._token:
+            if self._token is not None and token < self._token:
+                raise ValueError('Rows of the word dictionary must be sorted by token.')
+            self._write_token()
+            self._token = token
+
+        data = json.dumps([wtype, word, info]).encode('utf-8')
+        if word_id is None:
+            word_id = NO_WORD_ID
+        else:
+            self.max_word_id = max(self.max_word_id, word_id)
+        self._rows.append(ROW_HEADER.pack(word_id, len(data)) + data)
+        self.num_rows += 1
+
+
+    def finish(self) -> None:
+        """ Write out the index and header and move the new file into place.
+        """
+        self._write_token()
+
+        index_pos = self._fd.tell()
+        if sys.byteorder != 'little':
+            self._index.byteswap()
+        self._fd.write(self._index.tobytes())
+
+        self._fd.seek(0)
+        self._fd.write(HEADER.pack(MAGIC, VERSION, len(self._index), self.num_rows,
+                                   self.max_word_id, index_pos))
+        self._fd.close()
+
+        os.replace(self._tmpname, self.filename)
+
+
+    def _write_token(self) -> None:
+        if self._token is not None:
+            self._index.append(self._fd.tell())
+            self._fd.write(TOKEN_HEADER.pack(len(self._token), len(self._rows)))
+            self._fd.write(self._token)
+            for row in self._rows:
+                self._fd.write(row)
+        self._rows = []
+
+
+class WordDictionary:
+    """ Read-only access to a word dictionary file.
+
+        Raises a ValueError when the file is not a word dictionary
+        in a supported version.
+    """
+
+    def __init__(self, filename: Union[str, 'os.PathLike[str]']) -> None:
+        with open(filename, 'rb') as fd:
+            self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError(f"File '{filename}' is not a word dictionary.")
+
+        magic, version, self.num_tokens, self.num_rows, self.max_word_id, index_pos \
+            = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"File '{filename}' is not a word dictionary "
+                             f"in version {VERSION}.")
+
+        self._index_pos = index_pos
+
+
+    def __enter__(self) -> 'WordDictionary':
+        return self
+
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        """ Release the memory map of the file.
+        """
+        self._map.close()
+
+
+    def _offset_at(self, pos: int) -> int:
+        return cast(int, INDEX_ENTRY.unpack_from(self._map,
+                                                 self._index_pos + pos * INDEX_ENTRY.size)[0])
+
+
+    def _token_at(self, pos: int) -> bytes:
+        offset = self._offset_at(pos)
+        length = TOKEN_HEADER.unpack_from(self._map, offset)[0]
+        start = offset + TOKEN_HEADER.size
+        return self._map[start:start + length]
+
+
+    def lookup(self, word_token: str) -> List[WordRow]:
+        """ Return all rows for the given word token.
+        """
+        key = word_token.encode('utf-8')
+
+        low, high = 0, self.num_tokens
+        while low < high:
+            mid = (low + high) // 2
+            if self._token_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+
+        if low >= self.num_tokens or self._token_at(low) != key:
+            return []
+
+        offset = self._offset_at(low)
+        length, num_rows = TOKEN_HEADER.unpack_from(self._map, offset)
+        offset += TOKEN_HEADER.size + length
+
+        rows = []
+        for _ in range(num_rows):
+            word_id, length = ROW_HEADER.unpack_from(self._map, offset)
+            offset += ROW_HEADER.size
+            wtype, word, info = json.loads(self._map[offset:offset + length])
+            offset += length
+            rows.append(WordRow(None if word_id == NO_WORD_ID else word_id,
+                                word_token, wtype, word, info))
+
+        return rows
@@ -6,7 +6,7 @@
 # For a full list of authors see the git log.
 """ Non-blocking database connections.
 """
-from typing import Callable, Any, Optional, Iterator, Sequence
+from typing import Callable, Any, Optional, Iterator, Sequence, Dict, Set, Hashable
 import logging
 import select
 import time
@@ -50,13 +50,13 @@ class DeadlockHandler:
             return True
 
         if self.ignore_sql_errors and isinstance(exc_value, psycopg2.Error):
-            LOG.info("SQL error ignored: %s", exc_value)
+            LOG.warning("SQL error ignored: %s", exc_value)
             return True
 
         return False
 
 
-class DBConnection:
+class DBConnection: # pylint: disable=too-many-instance-attributes
     """ A single non-blocking database connection.
     """
 
@@ -68,6 +68,12 @@ class DBConnection:
         self.current_query: Optional[Query] = None
         self.current_params: Optional[Sequence[Any]] = None
         self.ignore_sql_errors = ignore_sql_errors
+        # Statistics about the time spent executing queries. The time of a query
+        # lasts until its end is noticed in is_done() or wait().
+        self.query_start = 0.0
+        self.query_time = 0.0
+        self.query_count = 0
+        self.deadlock_count = 0
 
         self.conn: Optional['psycopg2.connection'] = None
         self.cursor: Optional['psycopg2.cursor'] = None
@@ -114,9 +120,9 @@ class DBConnection:
 
     def _deadlock_handler(self) -> None:
         LOG.info("Deadlock detected (params = %s), retry.", str(self.current_params))
+        self.deadlock_count += 1
         assert self.cursor is not None
         assert self.current_query is not None
-        assert self.current_params is not None
 
         self.cursor.execute(self.current_query, self.current_params)
 
@@ -126,7 +132,7 @@ class DBConnection:
         while True:
             with DeadlockHandler(self._deadlock_handler, self.ignore_sql_errors):
                 wait_select(self.conn)
-                self.current_query = None
+                self._query_done()
                 return
 
     def perform(self, sql: Query, args: Optional[Sequence[Any]] = None) -> None:
@@ -136,6 +142,7 @@ class DBConnection:
         assert self.cursor is not None
         self.current_query = sql
         self.current_params = args
+        self.query_start = time.time()
         self.cursor.execute(sql, args)
 
     def fileno(self) -> int:
@@ -157,11 +164,17 @@ class DBConnection:
 
         with DeadlockHandler(self._deadlock_handler, self.ignore_sql_errors):
             if self.conn.poll() == psycopg2.extensions.POLL_OK:
-                self.current_query = None
+                self._query_done()
                 return True
 
         return False
 
+    def _query_done(self) -> None:
+        if self.current_query is not None:
+            self.query_time += time.time() - self.query_start
+            self.query_count += 1
+        self.current_query = None
+
 
 class WorkerPool:
     """ A pool of asynchronous database connections.
@@ -173,8 +186,14 @@ class WorkerPool:
     def __init__(self, dsn: str, pool_size: int, ignore_sql_errors: bool = False) -> None:
         self.threads = [DBConnection(dsn, ignore_sql_errors=ignore_sql_errors)
                         for _ in range(pool_size)]
-        self.free_workers = self._yield_free_worker()
         self.wait_time = 0.0
+        self.reconnect_count = 0
+        # Locality keys of the work last sent to each connection.
+        self.worker_keys: Dict[int, Set[Hashable]] = {}
+        # Number of times work was held back because a connection
+        # was still busy with work of the same locality.
+        self.conflicts_avoided = 0
+        self.free_workers = self._yield_free_worker()
 
 
     def finish_all(self) -> None:
@@ -192,13 +211,44 @@ class WorkerPool:
         for thread in self.threads:
             thread.close()
         self.threads = []
+        self.worker_keys = {}
         self.free_workers = iter([])
 
 
     def next_free_worker(self) -> DBConnection:
         """ Get the next free connection.
         """
-        return next(self.free_workers)
+        worker = next(self.free_workers)
+        self.worker_keys.pop(id(worker), None)
+        return worker
+
+
+    def next_free_worker_for(self, keys: Set[Hashable]) -> DBConnection:
+        """ Get the next free connection for work that touches the
+            localities described by `keys`.
+
+            Concurrent updates of places that are close to each other
+            easily run into deadlocks. If another connection is still busy
+            with work of one of the same localities, then wait until
+            it is done and hand out that connection, so that work for
+            the same locality is executed one after another.
+        """
+        busy = [thread for thread in self.threads
+                if not thread.is_done() and self.worker_keys.get(id(thread), set()) & keys]
+
+        if busy:
+            self.conflicts_avoided += 1
+            tstart = time.time()
+            for thread in busy:
+                while not thread.is_done():
+                    thread.wait()
+            self.wait_time += time.time() - tstart
+            worker = busy[0]
+        else:
+            worker = self.next_free_worker()
+
+        self.worker_keys[id(worker)] = keys
+        return worker
 
 
     def _yield_free_worker(self) -> Iterator[DBConnection]:
@@ -225,6 +275,7 @@ class WorkerPool:
             while not thread.is_done():
                 thread.wait()
             thread.connect()
+        self.reconnect_count += 1
 
 
     def __enter__(self) -> 'WorkerPool':
@@ -0,0 +1,189 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Benchmark for the name analysis of the tokenizer on real data.
+"""
+from typing import Any, Dict, List, Mapping, Sequence
+import logging
+import time
+
+import psycopg2.extras
+
+from nominatim.config import Configuration
+from nominatim.data.place_info import PlaceInfo
+from nominatim.db.connection import connect
+from nominatim.tokenizer.base import AbstractTokenizer
+from nominatim.tokenizer.place_sanitizer import PlaceSanitizer
+from nominatim.tokenizer.profiling import CacheStats
+
+LOG = logging.getLogger()
+
+
+class BenchmarkResult:
+    """ Outcome of a tokenizer benchmark run. All times are in seconds.
+    """
+
+    def __init__(self, places: int, total_time: float, dry_run: bool,
+                 times: Dict[str, float], caches: Dict[str, CacheStats]) -> None:
+        self.places = places
+        self.total_time = total_time
+        self.dry_run = dry_run
+        self.times = dict(times)
+        if times:
+            # Whatever is not covered by the other steps is spent
+            # in the analysis of the names.
+            self.times['token analysis'] = max(0.0, total_time - sum(times.values()))
+        self.caches = caches
+
+
+    @property
+    def places_per_second(self) -> float:
+        """ Throughput of the name analysis.
+        """
+        return self.places / self.total_time if self.total_time > 0 else 0.0
+
+
+    def report(self) -> str:
+        """ Return a human-readable summary of the result.
+        """
+        lines: List[str] = [f"Processed {self.places} places in {self.total_time:.2f}s"
+                            f" ({self.places_per_second:.1f} places/s)"]
+
+        if self.times:
+            lines.append("Time per processing step:")
+            for step, seconds in sorted(self.times.items()):
+                share = 100 * seconds / self.total_time if self.total_time > 0 else 0.0
+                lines.append(f"  {step:<16} {seconds:8.3f}s  {share:5.1f}%")
+        else:
+            lines.append("The tokenizer does not provide a split of processing times.")
+
+        if self.caches:
+            lines.append("Cache hit rates:")
+            for name, stats in sorted(self.caches.items()):
+                lines.append(f"  {name:<16} {100 * stats.hit_rate:5.1f}%"
+                             f"  ({stats.hits} hits, {stats.misses} misses)")
+
+        if not self.dry_run:
+            lines.append("Note: the tokenizer does not support dry runs."
+                         " New words have been saved in the database.")
+
+        return '\n'.join(lines)
+
+
+class SanitizerBenchmarkResult:
+    """ Outcome of a benchmark of the sanitizers. All times are in seconds.
+    """
+
+    def __init__(self, places: int, full_time: float, planned_time: float,
+                 skipped: Mapping[str, int]) -> None:
+        self.places = places
+        self.full_time = full_time
+        self.planned_time = planned_time
+        self.skipped = skipped
+
+
+    def report(self) -> str:
+        """ Return a human-readable summary of the result.
+        """
+        lines = [f"Sanitized {self.places} places",
+                 f"  running all sanitizers:     {self.full_time:8.3f}s",
+                 f"  skipping unused sanitizers: {self.planned_time:8.3f}s"]
+        if self.planned_time > 0:
+            lines.append(f"  speedup: {self.full_time / self.planned_time:.2f}x")
+
+        if self.skipped:
+            lines.append("Places skipped per sanitizer:")
+            for step, num in self.skipped.items():
+                share = 100 * num / self.places if self.places else 0.0
+                lines.append(f"  {step:<28} {share:5.1f}%")
+
+        return '\n'.join(lines)
+
+
+def _sample_places(dsn: str, sample_size: int) -> List[PlaceInfo]:
+    """ Get a random sample of places from the placex table as they
+        would be handed to the tokenizer.
+    """
+    with connect(dsn) as conn:
+        psycopg2.extras.register_hstore(conn)
+        with conn.cursor() as cur:
+            num_places = cur.scalar("""SELECT reltuples FROM pg_class
+                                       WHERE relname = 'placex'""")
+            # Sample twice as much as needed to be on the safe side
+            # with the estimated table size.
+            percent = 100.0 if num_places is None or num_places <= 0 \
+                      else min(100.0, 200.0 * sample_size / num_places)
+
+            LOG.warning("Fetching a sample of %d places.", sample_size)
+            cur.execute("""SELECT place_id, extra.*
+                           FROM placex TABLESAMPLE BERNOULLI (%s),
+                                LATERAL placex_indexing_prepare(placex) as extra
+                           LIMIT %s""", (percent, sample_size))
+            return [PlaceInfo(dict(row)) for row in cur]
+
+
+def benchmark_tokenizer(dsn: str, tokenizer: AbstractTokenizer,
+                        sample_size: int) -> BenchmarkResult:
+    """ Run a random sample of places from the placex table through the
+        name analysis of the tokenizer. The results of the analysis are
+        discarded, nothing is written to placex. Only the time for the
+        analysis itself is measured, fetching the places is excluded.
+    """
+    places = _sample_places(dsn, sample_size)
+
+    LOG.warning("Analysing %d places.", len(places))
+    with tokenizer.name_analyzer() as analyzer:
+        profile = analyzer.enable_profiling(dry_run=True)
+
+        tstart = time.perf_counter()
+        for place in places:
+            analyzer.process_place(place)
+        total_time = time.perf_counter() - tstart
+
+    return BenchmarkResult(len(places), total_time, profile.dry_run,
+                           profile.times, profile.caches)
+
+
+def benchmark_sanitizer(places: Sequence[PlaceInfo], rules: Sequence[Mapping[str, Any]],
+                        config: Configuration, rounds: int = 5) -> SanitizerBenchmarkResult:
+    """ Run the given places through the sanitizers configured by `rules`,
+        once running all sanitizers for every place and once skipping
+        the sanitizers that cannot apply. The best time of `rounds`
+        runs is reported.
+    """
+    rounds = max(1, rounds)
+    results = []
+    for dispatch in (False, True):
+        sanitizer = PlaceSanitizer(rules, config, dispatch=dispatch)
+        best = None
+        for _ in range(rounds):
+            tstart = time.perf_counter()
+            for place in places:
+                sanitizer.process_names(place)
+            duration = time.perf_counter() - tstart
+            best = duration if best is None else min(best, duration)
+        assert best is not None
+        results.append(best)
+
+    skipped = {f"{i + 1}. {rule['step']}": num // rounds
+               for i, (rule, num) in enumerate(zip(rules, sanitizer.skipped))}
+
+    return SanitizerBenchmarkResult(len(places), results[0], results[1], skipped)
+
+
+def benchmark_sanitizer_on_db(dsn: str, config: Configuration,
+                              sample_size: int) -> SanitizerBenchmarkResult:
+    """ Benchmark the sanitizers of the ICU tokenizer configuration on
+        a random sample of places from the placex table.
+    """
+    from nominatim.tokenizer.icu_rule_loader import ICURuleLoader # pylint: disable=C0415
+
+    places = _sample_places(dsn, sample_size)
+    rules = ICURuleLoader(config).sanitizer_rules
+
+    LOG.warning("Sanitizing %d places.", len(places))
+    return benchmark_sanitizer(places, rules, config)
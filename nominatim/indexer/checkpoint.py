@@ -0,0 +1,145 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Persistent checkpoints that allow to resume an interrupted indexing run.
+"""
+from typing import Optional, Set
+import json
+import logging
+import time
+
+from nominatim.db.connection import connect
+from nominatim.db import properties
+from nominatim.indexer import runners
+from nominatim.typing import DictCursorResults
+
+LOG = logging.getLogger()
+
+
+class IndexCheckpoint:
+    """ Keeps track of the progress of an indexing run in the property
+        table. The checkpoint records the names of the runners that have
+        completely finished and, for runners that process their places
+        in order of the geometry sector, the sector from which indexing
+        needs to continue.
+
+        Checkpoints are only valid as long as no new data is added to the
+        database. They must be cleared when the indexing run has finished.
+
+        If `enabled` is false, no checkpoints are loaded or saved.
+        Independent indexer processes, like the shards of a sharded
+        indexing run, need to use different property names.
+    """
+    PROPERTY = 'indexer_checkpoint'
+    # Minimum time between two checkpoints within a runner (in seconds).
+    SAVE_INTERVAL = 300
+
+    def __init__(self, dsn: str, enabled: bool = False,
+                 property_name: str = PROPERTY) -> None:
+        self.dsn = dsn
+        self.enabled = enabled
+        self.property_name = property_name
+        self.finished: Set[str] = set()
+        self.runner: Optional[str] = None
+        self.sector: Optional[int] = None
+        self.last_save = time.time()
+
+        if enabled:
+            with connect(dsn) as conn:
+                data = properties.get_property(conn, self.property_name)
+            if data:
+                state = json.loads(data)
+                self.finished = set(state.get('finished', []))
+                self.runner = state.get('runner')
+                self.sector = state.get('sector')
+
+
+    def is_finished(self, runner: runners.Runner) -> bool:
+        """ Check if the given runner has already been completed
+            in a previous run.
+        """
+        return self.enabled and runner.name() in self.finished
+
+
+    def start(self, runner: runners.Runner) -> None:
+        """ Mark the beginning of the given runner. If the runner was
+            interrupted in a previous run, then the runner is set up to
+            resume at the last recorded sector.
+        """
+        if not self.enabled:
+            return
+
+        if self.runner == runner.name() and self.sector is not None \
+           and runner.orders_by_sector():
+            LOG.warning("Resuming %s at geometry sector %d.", runner.name(), self.sector)
+            if runner.min_sector is None or runner.min_sector < self.sector:
+                runner.min_sector = self.sector
+        else:
+            self.sector = None
+
+        self.runner = runner.name()
+        self.last_save = time.time()
+
+
+    def places_done(self, runner: runners.Runner, places: DictCursorResults) -> None:
+        """ Record that the given places have been handed to the database.
+        """
+        if self.enabled and places and runner.orders_by_sector():
+            sector = max(p['geometry_sector'] for p in places)
+            if self.sector is None or sector > self.sector:
+                self.sector = sector
+
+
+    def is_due(self) -> bool:
+        """ Check if it is time to save the next checkpoint within a runner.
+        """
+        return self.enabled and time.time() - self.last_save > self.SAVE_INTERVAL
+
+
+    def save(self) -> None:
+        """ Write the current state into the database. The caller must
+            ensure that all places recorded with `places_done()` have
+            been fully processed.
+        """
+        if not self.enabled:
+            return
+
+        with connect(self.dsn) as conn:
+            properties.set_property(conn, self.property_name,
+                                    json.dumps({'finished': sorted(self.finished),
+                                                'runner': self.runner,
+                                                'sector': self.sector}))
+        self.last_save = time.time()
+        LOG.info("Saved indexing checkpoint (%s, sector %s).", self.runner, self.sector)
+
+
+    def finish(self, runner: runners.Runner) -> None:
+        """ Mark the given runner as completely done.
+        """
+        if self.enabled:
+            self.finished.add(runner.name())
+            self.runner = None
+            self.sector = None
+            self.save()
+
+
+    def clear(self) -> None:
+        """ Remove all checkpoint information from the database.
+        """
+        if not self.enabled:
+            return
+
+        self.finished = set()
+        self.runner = None
+        self.sector = None
+
+        with connect(self.dsn) as conn:
+            if conn.table_exists('nominatim_properties'):
+                with conn.cursor() as cur:
+                    cur.execute('DELETE FROM nominatim_properties WHERE property = %s',
+                                (self.property_name, ))
+                conn.commit()
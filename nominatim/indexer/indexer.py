@@ -7,7 +7,10 @@
 """
 Main work horse for indexing (computing addresses) the database.
 """
-from typing import Optional, Any, cast
+from typing import Optional, Any, Iterator, Sequence, List, Tuple, Deque, cast
+from collections import deque
+import contextlib
+import dataclasses
 import logging
 import time
 
@@ -16,6 +19,14 @@ import psycopg2.extras
 from nominatim.tokenizer.base import AbstractTokenizer
 from nominatim.indexer.progress import ProgressLogger
 from nominatim.indexer import runners
+from nominatim.indexer.tokenizer_pool import TokenizerPool, PendingBatch
+from nominatim.indexer.staging import StagingWriter
+from nominatim.indexer.tuning import BatchSizes
+from nominatim.indexer.checkpoint import IndexCheckpoint
+from nominatim.indexer.sharding import Shard
+from nominatim.indexer.pending import PendingSummary
+from nominatim.indexer.metrics import MetricsWriter, RunnerMetrics
+from nominatim.indexer.pretokenize import PRETOKENIZED_TABLE
 from nominatim.db.async_connection import DBConnection, WorkerPool
 from nominatim.db.connection import connect, Connection, Cursor
 from nominatim.typing import DictCursorResults
@@ -24,13 +35,22 @@ LOG = logging.getLogger()
 
 
 class PlaceFetcher:
-    """ Asynchronous connection that fetches place details for processing.
+    """ Asynchronous connections that fetch place details for processing.
+
+        The fetcher keeps a queue of up to `num_connections` batches for
+        which details are requested in parallel, each on its own connection.
+        Batches are handed out in the order in which they were requested.
     """
-    def __init__(self, dsn: str, setup_conn: Connection) -> None:
-        self.wait_time = 0.0
-        self.current_ids: Optional[DictCursorResults] = None
-        self.conn: Optional[DBConnection] = DBConnection(dsn,
-                                               cursor_factory=psycopg2.extras.DictCursor)
+    def __init__(self, dsn: str, setup_conn: Connection, num_connections: int = 1,
+                 fetch_size: int = 100) -> None:
+        self.fetch_size = fetch_size
+        self.pending: Deque[Tuple[Optional[int], Optional[DictCursorResults]]] = deque()
+        self.free_conns: Deque[int] = deque(range(num_connections))
+        self.wait_times = [0.0] * num_connections
+        self.has_more_ids = True
+        self.conns: List[DBConnection] = \
+            [DBConnection(dsn, cursor_factory=psycopg2.extras.DictCursor)
+             for _ in range(num_connections)]
 
         with setup_conn.cursor() as cur:
             # need to fetch those manually because register_hstore cannot
@@ -38,69 +58,167 @@ class PlaceFetcher:
             hstore_oid = cur.scalar("SELECT 'hstore'::regtype::oid")
             hstore_array_oid = cur.scalar("SELECT 'hstore[]'::regtype::oid")
 
-        psycopg2.extras.register_hstore(self.conn.conn, oid=hstore_oid,
-                                        array_oid=hstore_array_oid)
+        for conn in self.conns:
+            psycopg2.extras.register_hstore(conn.conn, oid=hstore_oid,
+                                            array_oid=hstore_array_oid)
+
+
+    @property
+    def wait_time(self) -> float:
+        """ Total time spent waiting for place details over all connections.
+        """
+        return sum(self.wait_times)
+
 
     def close(self) -> None:
-        """ Close the underlying asynchronous connection.
+        """ Close the underlying asynchronous connections.
         """
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        for conn in self.conns:
+            conn.close()
+        self.conns = []
 
 
     def fetch_next_batch(self, cur: Cursor, runner: runners.Runner) -> bool:
-        """ Send a request for the next batch of places.
+        """ Send requests for the next batches of places until the
+            prefetch queue is full.
             If details for the places are required, they will be fetched
             asynchronously.
 
             Returns true if there is still data available.
         """
-        ids = cast(Optional[DictCursorResults], cur.fetchmany(100))
+        while self.has_more_ids and self.free_conns \
+              and len(self.pending) < len(self.conns):
+            ids = cast(Optional[DictCursorResults], cur.fetchmany(self.fetch_size))
 
-        if not ids:
-            self.current_ids = None
-            return False
+            if not ids:
+                self.has_more_ids = False
+                break
 
-        assert self.conn is not None
-        self.current_ids = runner.get_place_details(self.conn, ids)
+            conn_idx = self.free_conns.popleft()
+            details = runner.get_place_details(self.conns[conn_idx], ids)
+            if details:
+                # Nothing to fetch, the connection can be reused right away.
+                self.free_conns.appendleft(conn_idx)
+                self.pending.append((None, details))
+            else:
+                self.pending.append((conn_idx, None))
+
+        return len(self.pending) > 0
 
-        return True
 
     def get_batch(self) -> DictCursorResults:
         """ Get the next batch of data, previously requested with
             `fetch_next_batch`.
         """
-        assert self.conn is not None
-        assert self.conn.cursor is not None
+        if not self.pending:
+            return []
+
+        conn_idx, places = self.pending.popleft()
+
+        if places is None:
+            assert conn_idx is not None
+            conn = self.conns[conn_idx]
+            assert conn.cursor is not None
 
-        if self.current_ids is not None and not self.current_ids:
             tstart = time.time()
-            self.conn.wait()
-            self.wait_time += time.time() - tstart
-            self.current_ids = cast(Optional[DictCursorResults],
-                                    self.conn.cursor.fetchall())
+            conn.wait()
+            self.wait_times[conn_idx] += time.time() - tstart
+            places = cast(DictCursorResults, conn.cursor.fetchall())
+            self.free_conns.append(conn_idx)
 
-        return self.current_ids if self.current_ids is not None else []
+        return places
 
     def __enter__(self) -> 'PlaceFetcher':
         return self
 
 
     def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
-        assert self.conn is not None
-        self.conn.wait()
+        for conn in self.conns:
+            conn.wait()
         self.close()
 
 
+@dataclasses.dataclass
+class IndexerOptions: # pylint: disable=too-many-instance-attributes
+    """ Optional settings for tuning the performance of the indexer.
+
+        `tokenizer_processes` sets the number of processes that compute
+        the token information in parallel to the database work. With 0,
+        the name analysis is done in the indexer process itself.
+
+        `fetch_connections` is the number of connections used for
+        fetching place details in parallel.
+
+        `write_mode` determines how the results are written back to
+        the database: with 'values' each SQL statement updates a small
+        batch of places directly, with 'copy' results are collected
+        in staging tables first and then applied in bulk.
+
+        When `adaptive_batches` is set, the number of places fetched and
+        written at once is adapted at runtime to the measured performance.
+
+        When `checkpoints` is set, the progress is recorded in the database
+        and an interrupted indexing run resumes where it stopped. This
+        must only be used when no new data is added between the runs.
+
+        When a `shard` is given, only the part of the work belonging to
+        the shard is done. The other shards must be run in parallel
+        by other indexer processes, possibly on other machines.
+
+        When a `metrics` writer is given, performance figures are
+        recorded for each rank and table that has been indexed.
+
+        When `locality_dispatch` is set, batches of places that lie in
+        the same geometry sector are never processed concurrently on
+        different connections. This avoids deadlocks between neighbouring
+        places at the cost of some parallelism.
+    """
+    tokenizer_processes: int = 0
+    fetch_connections: int = 1
+    write_mode: str = 'values'
+    adaptive_batches: bool = False
+    checkpoints: bool = False
+    shard: Optional[Shard] = None
+    metrics: Optional[MetricsWriter] = None
+    locality_dispatch: bool = False
+
+
+@dataclasses.dataclass
+class _IndexRun:
+    """ Objects used while indexing with a single runner.
+    """
+    runner: runners.Runner
+    pool: WorkerPool
+    writer: Optional[StagingWriter]
+    progress: ProgressLogger
+    sizes: BatchSizes
+
+
 class Indexer:
     """ Main indexing routine.
+
+        `options` sets up optional features for tuning the performance,
+        see IndexerOptions.
     """
+    # Maximum number of places to collect in a staging table in 'copy' mode.
+    STAGING_FLUSH_ROWS = 2000
+    # Number of places to fetch from the database in one go.
+    FETCH_SIZE = 100
 
-    def __init__(self, dsn: str, tokenizer: AbstractTokenizer, num_threads: int):
+    def __init__(self, dsn: str, tokenizer: AbstractTokenizer, num_threads: int,
+                 options: Optional[IndexerOptions] = None):
         self.dsn = dsn
         self.tokenizer = tokenizer
         self.num_threads = num_threads
+        self.options = options or IndexerOptions()
+        shard = self.options.shard
+        if shard is None:
+            self.checkpoint = IndexCheckpoint(dsn, enabled=self.options.checkpoints)
+        else:
+            self.checkpoint = IndexCheckpoint(
+                dsn, enabled=self.options.checkpoints,
+                property_name=f'{IndexCheckpoint.PROPERTY}_{shard.shard}_{shard.num_shards}')
+        self.pending: Optional[PendingSummary] = None
 
 
     def has_pending(self) -> bool:
@@ -120,7 +238,7 @@ class Indexer:
             database will be analysed at the appropriate places to
             ensure that database statistics are updated.
         """
-        with connect(self.dsn) as conn:
+        with connect(self.dsn) as conn, self._pending_summary():
             conn.autocommit = True
 
             def _analyze() -> None:
@@ -143,6 +261,20 @@ class Indexer:
             if self.index_postcodes() > 100:
                 _analyze()
 
+        self.clear_checkpoint()
+
+
+    def clear_checkpoint(self) -> None:
+        """ Remove any recorded progress of a previous indexing run.
+            Must be called when new data has been added after an
+            interrupted run. When indexing is sharded, this also records
+            that the shard has finished. The saved partitioning is removed
+            by the last shard that gets here.
+        """
+        self.checkpoint.clear()
+        if self.options.shard is not None:
+            self.options.shard.finish(self.dsn)
+
 
     def index_boundaries(self, minrank: int, maxrank: int) -> int:
         """ Index only administrative boundaries within the given rank range.
@@ -151,9 +283,12 @@ class Indexer:
         LOG.warning("Starting indexing boundaries using %s threads",
                     self.num_threads)
 
-        with self.tokenizer.name_analyzer() as analyzer:
+        pretokenized = self._has_pretokenized()
+        with self._pending_summary(), self._tokenizer_pool() as tokpool, \
+             self.tokenizer.name_analyzer() as analyzer:
             for rank in range(max(minrank, 4), min(maxrank, 26)):
-                total += self._index(runners.BoundaryRunner(rank, analyzer))
+                total += self._index(runners.BoundaryRunner(rank, analyzer, pretokenized),
+                                     tokpool=tokpool)
 
         return total
 
@@ -169,13 +304,18 @@ class Indexer:
         LOG.warning("Starting indexing rank (%i to %i) using %i threads",
                     minrank, maxrank, self.num_threads)
 
-        with self.tokenizer.name_analyzer() as analyzer:
+        pretokenized = self._has_pretokenized()
+        with self._pending_summary(), self._tokenizer_pool() as tokpool, \
+             self.tokenizer.name_analyzer() as analyzer:
             for rank in range(max(1, minrank), maxrank + 1):
-                total += self._index(runners.RankRunner(rank, analyzer), 20 if rank == 30 else 1)
+                total += self._index(runners.RankRunner(rank, analyzer, pretokenized),
+                                     20 if rank == 30 else 1, tokpool=tokpool)
 
             if maxrank == 30:
-                total += self._index(runners.RankRunner(0, analyzer))
-                total += self._index(runners.InterpolationRunner(analyzer), 20)
+                total += self._index(runners.RankRunner(0, analyzer, pretokenized),
+                                     tokpool=tokpool)
+                total += self._index(runners.InterpolationRunner(analyzer), 20,
+                                     tokpool=tokpool)
 
         return total
 
@@ -185,7 +325,8 @@ class Indexer:
         """
         LOG.warning("Starting indexing postcodes using %s threads", self.num_threads)
 
-        return self._index(runners.PostcodeRunner(), 20)
+        with self._pending_summary():
+            return self._index(runners.PostcodeRunner(), 20)
 
 
     def update_status_table(self) -> None:
@@ -197,46 +338,275 @@ class Indexer:
 
             conn.commit()
 
-    def _index(self, runner: runners.Runner, batch: int = 1) -> int:
+    def _has_pretokenized(self) -> bool:
+        """ Check if the token information of the places has been
+            computed in advance.
+        """
+        with connect(self.dsn) as conn:
+            return conn.table_exists(PRETOKENIZED_TABLE)
+
+
+    @contextlib.contextmanager
+    def _pending_summary(self) -> Iterator[None]:
+        """ Compute the summary of pending places, unless an enclosing
+            indexing function has already done so. The summary is
+            dropped again when the outermost function finishes.
+        """
+        if self.pending is not None:
+            yield
+            return
+
+        with connect(self.dsn) as conn:
+            self.pending = PendingSummary.load(conn)
+        try:
+            yield
+        finally:
+            self.pending = None
+
+
+    def _count_pending(self, conn: Connection, runner: runners.Runner) -> int:
+        """ Return the number of places the runner needs to process.
+            The number is taken from the pending summary where possible.
+            Because places may be marked for reindexing while the indexer
+            runs, a runner without places in the summary is checked again.
+        """
+        with conn.cursor() as cur:
+            if self.pending is not None:
+                count = self.pending.get(runner)
+                if count:
+                    return count
+                if count == 0 and not cur.scalar(runner.sql_has_pending()):
+                    return 0
+
+            return cast(int, cur.scalar(runner.sql_count_objects()))
+
+
+    @contextlib.contextmanager
+    def _tokenizer_pool(self) -> Iterator[Optional[TokenizerPool]]:
+        """ Set up the pool of tokenizer processes, if requested.
+            Must be called before any database connection is opened
+            because the pool processes are forked from the current process.
+        """
+        if self.options.tokenizer_processes > 0:
+            with TokenizerPool(self.tokenizer, self.options.tokenizer_processes) as pool:
+                yield pool
+        else:
+            yield None
+
+
+    @contextlib.contextmanager
+    def _staging_writer(self, pool: WorkerPool, runner: runners.Runner,
+                        batch: int) -> Iterator[Optional[StagingWriter]]:
+        """ Set up the staging tables when writing in 'copy' mode.
+            The number of places written in one go scales with
+            the batch size of the runner.
+        """
+        if self.options.write_mode == 'copy':
+            with StagingWriter(self.dsn, pool, runner,
+                               min(self.STAGING_FLUSH_ROWS, batch * 100)) as writer:
+                yield writer
+        else:
+            yield None
+
+
+    def _index(self, runner: runners.Runner, batch: int = 1,
+               tokpool: Optional[TokenizerPool] = None) -> int:
         """ Index a single rank or table. `runner` describes the SQL to use
             for indexing. `batch` describes the number of objects that
-            should be processed with a single SQL statement
+            should be processed with a single SQL statement. When a
+            tokenizer pool `tokpool` is given, then the token information
+            is computed in the pool processes.
         """
-        LOG.warning("Starting %s (using batch size %s)", runner.name(), batch)
+        if tokpool is not None:
+            if runner.needs_analysis():
+                tokpool.wait_time = 0.0
+                tokpool.cpu_time = 0.0
+            else:
+                tokpool = None
+
+        if not self._start_runner(runner):
+            self._wait_for_shards(runner)
+            return 0
 
         with connect(self.dsn) as conn:
+            total_tuples = self._count_pending(conn, runner)
+            conn.commit()
+
+            if total_tuples == 0:
+                LOG.info("Skipping %s (nothing to index)", runner.name())
+                self._wait_for_shards(runner)
+                return 0
+
+            LOG.warning("Starting %s (using batch size %s)", runner.name(), batch)
+            LOG.debug("Total number of rows: %i", total_tuples)
+
             psycopg2.extras.register_hstore(conn)
-            with conn.cursor() as cur:
-                total_tuples = cur.scalar(runner.sql_count_objects())
-                LOG.debug("Total number of rows: %i", total_tuples)
+
+            tstart = time.time()
+            stats = RunnerMetrics(runner.name())
+            progress = ProgressLogger(runner.name(), total_tuples)
+            sizes = BatchSizes(self.FETCH_SIZE, batch, self.num_threads,
+                               adaptive=self.options.adaptive_batches)
+            if sizes.adaptive:
+                progress.set_batch_sizes(sizes.fetch_size, sizes.batch_size)
+
+            with conn.cursor(name='places') as cur:
+                cur.execute(runner.sql_get_objects())
+
+                with PlaceFetcher(self.dsn, conn, self.options.fetch_connections,
+                                  sizes.fetch_size) as fetcher, \
+                     WorkerPool(self.dsn, self.num_threads) as pool:
+                    with self._staging_writer(pool, runner, batch) as writer:
+                        self._index_places(_IndexRun(runner, pool, writer, progress, sizes),
+                                           cur, fetcher, tokpool)
+
+                    pool.finish_all()
+                    self._collect_pool_metrics(stats, fetcher, pool)
 
             conn.commit()
 
-            progress = ProgressLogger(runner.name(), total_tuples)
+        self.checkpoint.finish(runner)
+        done = progress.done()
 
-            if total_tuples > 0:
-                with conn.cursor(name='places') as cur:
-                    cur.execute(runner.sql_get_objects())
+        if self.options.metrics is not None:
+            stats.places = done
+            stats.duration = time.time() - tstart
+            stats.tokenizer_cpu = runner.analysis_time
+            if tokpool is not None:
+                stats.tokenizer_cpu += tokpool.cpu_time
+            self.options.metrics.add(stats)
 
-                    with PlaceFetcher(self.dsn, conn) as fetcher:
-                        with WorkerPool(self.dsn, self.num_threads) as pool:
-                            has_more = fetcher.fetch_next_batch(cur, runner)
-                            while has_more:
-                                places = fetcher.get_batch()
+        self._wait_for_shards(runner)
 
-                                # asynchronously get the next batch
-                                has_more = fetcher.fetch_next_batch(cur, runner)
+        return done
 
-                                # And insert the current batch
-                                for idx in range(0, len(places), batch):
-                                    part = places[idx:idx + batch]
-                                    LOG.debug("Processing places: %s", str(part))
-                                    runner.index_places(pool.next_free_worker(), part)
-                                    progress.add(len(part))
 
-                            LOG.info("Wait time: fetcher: %.2fs,  pool: %.2fs",
-                                     fetcher.wait_time, pool.wait_time)
+    def _start_runner(self, runner: runners.Runner) -> bool:
+        """ Check if the runner has any work to do in this indexing run
+            and record the start in the checkpoint. Returns False, when
+            the runner has finished in a previous run or the shard has
+            no part in it.
+        """
+        if self.checkpoint.is_finished(runner):
+            LOG.warning("Skipping %s (finished in a previous run)", runner.name())
+            return False
+
+        shard = self.options.shard
+        if shard is not None and not shard.restrict(self.dsn, runner):
+            LOG.warning("Skipping %s (no work for shard %s)", runner.name(), shard)
+            return False
+
+        self.checkpoint.start(runner)
+        return True
 
-                conn.commit()
 
-        return progress.done()
+    def _index_places(self, run: _IndexRun, cur: Cursor, fetcher: PlaceFetcher,
+                      tokpool: Optional[TokenizerPool]) -> None:
+        """ Process all places returned by the cursor. Place details are
+            fetched asynchronously while the previous batch is processed.
+        """
+        pending: Optional[PendingBatch[DictCursorResults]] = None
+        has_more = fetcher.fetch_next_batch(cur, run.runner)
+        while has_more:
+            places = fetcher.get_batch()
+
+            # asynchronously get the next batch
+            has_more = fetcher.fetch_next_batch(cur, run.runner)
+
+            if tokpool is None:
+                # And insert the current batch
+                self._index_batch(run, places)
+            else:
+                # Let the tokenizer processes work on the
+                # current batch while the previous one
+                # is inserted.
+                current = tokpool.submit(places)
+                if pending is not None:
+                    self._index_batch(run, pending.places, pending.get())
+                pending = current
+
+            if self.checkpoint.is_due():
+                if run.writer is not None:
+                    run.writer.flush()
+                run.pool.finish_all()
+                self.checkpoint.save()
+
+            if run.sizes.update(fetcher.wait_time, run.pool):
+                fetcher.fetch_size = run.sizes.fetch_size
+                run.progress.set_batch_sizes(run.sizes.fetch_size, run.sizes.batch_size)
+
+        if pending is not None:
+            self._index_batch(run, pending.places, pending.get())
+
+        if tokpool is None:
+            LOG.info("Wait time: fetcher: %.2fs,  pool: %.2fs",
+                     fetcher.wait_time, run.pool.wait_time)
+        else:
+            LOG.info("Wait time: fetcher: %.2fs,  tokenizer: %.2fs,"
+                     "  pool: %.2fs", fetcher.wait_time,
+                     tokpool.wait_time, run.pool.wait_time)
+        if len(fetcher.wait_times) > 1:
+            LOG.info("Wait time per fetcher connection: %s",
+                     ', '.join(f'{t:.2f}s' for t in fetcher.wait_times))
+
+
+    def _collect_pool_metrics(self, stats: RunnerMetrics, fetcher: PlaceFetcher,
+                              pool: WorkerPool) -> None:
+        """ Add the figures collected by the fetcher and the worker pool
+            to the metrics of the runner.
+        """
+        stats.fetch_wait = fetcher.wait_time
+        stats.statement_time = sum(t.query_time for t in pool.threads)
+        stats.statements = sum(t.query_count for t in pool.threads)
+        stats.deadlock_retries = sum(t.deadlock_count for t in pool.threads)
+        stats.reconnects = pool.reconnect_count
+        stats.conflicts_avoided = pool.conflicts_avoided
+        if self.options.locality_dispatch:
+            LOG.info("Deadlock retries: %d, batches held back to avoid"
+                     " conflicts: %d", stats.deadlock_retries,
+                     stats.conflicts_avoided)
+
+
+    def _wait_for_shards(self, runner: runners.Runner) -> None:
+        """ Make sure that the next runner is only started once
+            all other shards have finished the given runner.
+        """
+        if self.options.shard is not None:
+            self.options.shard.wait_for_others(self.dsn, runner)
+
+
+    def _index_batch(self, run: _IndexRun, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None:
+        """ Send the given places to the database, `run.sizes.batch_size`
+            places per SQL statement. `token_info`, when given, must contain
+            the precomputed token information for each place.
+            When the run has a staging writer, the places are handed
+            to the writer instead.
+        """
+        self.checkpoint.places_done(run.runner, places)
+
+        if run.writer is not None:
+            run.writer.add(places, token_info)
+            run.progress.add(len(places))
+            return
+
+        batch = run.sizes.batch_size
+        for idx in range(0, len(places), batch):
+            part = places[idx:idx + batch]
+            LOG.debug("Processing places: %s", str(part))
+            run.runner.index_places(self._next_worker(run.runner, run.pool, part), part,
+                                    None if token_info is None else token_info[idx:idx + batch])
+            run.progress.add(len(part))
+
+
+    def _next_worker(self, runner: runners.Runner, pool: WorkerPool,
+                     places: DictCursorResults) -> DBConnection:
+        """ Choose the connection for indexing the given places.
+        """
+        if self.options.locality_dispatch:
+            keys = {runner.locality_key(p) for p in places}
+            keys.discard(None)
+            if keys:
+                return pool.next_free_worker_for(keys)
+
+        return pool.next_free_worker()
@@ -0,0 +1,156 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Export of performance metrics of the indexer.
+"""
+from typing import Optional, Dict, Any, List
+from abc import ABC, abstractmethod
+from pathlib import Path
+import datetime as dt
+import json
+import logging
+import os
+
+from nominatim.config import Configuration
+from nominatim.errors import UsageError
+
+LOG = logging.getLogger()
+
+
+class RunnerMetrics: # pylint: disable=too-many-instance-attributes
+    """ Performance figures collected while indexing with a single runner.
+        All times are in seconds.
+    """
+
+    def __init__(self, runner: str) -> None:
+        self.runner = runner
+        self.timestamp = dt.datetime.now(dt.timezone.utc)
+        self.places = 0
+        self.duration = 0.0
+        # Time spent waiting for place details from the database.
+        self.fetch_wait = 0.0
+        # CPU time used for the name analysis by the tokenizer.
+        self.tokenizer_cpu = 0.0
+        # Total execution time of the statements on the worker connections.
+        self.statement_time = 0.0
+        self.statements = 0
+        self.deadlock_retries = 0
+        # Batches that were held back with locality-aware dispatch
+        # because a conflicting batch was still running.
+        self.conflicts_avoided = 0
+        self.reconnects = 0
+
+
+    @property
+    def places_per_second(self) -> float:
+        """ Indexing throughput over the complete run of the runner.
+        """
+        return self.places / self.duration if self.duration > 0 else 0.0
+
+
+    def as_dict(self) -> Dict[str, Any]:
+        """ Return the metrics as a JSON-serializable dictionary.
+        """
+        return {'timestamp': self.timestamp.isoformat(timespec='seconds'),
+                'runner': self.runner,
+                'places': self.places,
+                'duration': round(self.duration, 3),
+                'places_per_second': round(self.places_per_second, 3),
+                'fetch_wait': round(self.fetch_wait, 3),
+                'tokenizer_cpu': round(self.tokenizer_cpu, 3),
+                'statement_time': round(self.statement_time, 3),
+                'statements': self.statements,
+                'deadlock_retries': self.deadlock_retries,
+                'conflicts_avoided': self.conflicts_avoided,
+                'reconnects': self.reconnects}
+
+
+class MetricsWriter(ABC):
+    """ Base class for writing out the metrics of the indexer.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+
+    @abstractmethod
+    def add(self, metrics: RunnerMetrics) -> None:
+        """ Record the metrics of a finished runner.
+        """
+
+
+class JsonLinesWriter(MetricsWriter):
+    """ Appends the metrics of each runner as a single line of JSON.
+    """
+
+    def add(self, metrics: RunnerMetrics) -> None:
+        with self.path.open('a', encoding='utf-8') as fd:
+            fd.write(json.dumps(metrics.as_dict()))
+            fd.write('\n')
+
+
+class PrometheusWriter(MetricsWriter):
+    """ Writes the metrics of the latest run of each runner in the text
+        format of Prometheus. The file is meant to be picked up by the
+        textfile collector of the node exporter and is replaced atomically
+        whenever a runner has finished.
+    """
+    PREFIX = 'nominatim_indexer_'
+    METRICS = (('places', 'Number of places indexed in the last run.'),
+               ('duration', 'Duration of the last run in seconds.'),
+               ('places_per_second', 'Indexing throughput of the last run.'),
+               ('fetch_wait', 'Time spent waiting for place details in seconds.'),
+               ('tokenizer_cpu', 'CPU time used by the tokenizer in seconds.'),
+               ('statement_time', 'Execution time of indexing statements in seconds.'),
+               ('statements', 'Number of indexing statements executed.'),
+               ('deadlock_retries', 'Number of statements retried after a deadlock.'),
+               ('conflicts_avoided', 'Number of batches held back to avoid deadlocks.'),
+               ('reconnects', 'Number of times the worker connections were reopened.'))
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self.runs: Dict[str, RunnerMetrics] = {}
+
+
+    def add(self, metrics: RunnerMetrics) -> None:
+        self.runs[metrics.runner] = metrics
+
+        lines: List[str] = []
+        for name, helptext in self.METRICS:
+            lines.append(f'# HELP {self.PREFIX}{name} {helptext}')
+            lines.append(f'# TYPE {self.PREFIX}{name} gauge')
+            for run in self.runs.values():
+                value = run.as_dict()[name]
+                lines.append(f'{self.PREFIX}{name}{{runner="{run.runner}"}} {value}')
+        lines.append(f'# HELP {self.PREFIX}last_run_timestamp_seconds'
+                     ' Time when the last run started.')
+        lines.append(f'# TYPE {self.PREFIX}last_run_timestamp_seconds gauge')
+        for run in self.runs.values():
+            lines.append(f'{self.PREFIX}last_run_timestamp_seconds{{runner="{run.runner}"}}'
+                         f' {run.timestamp.timestamp():.0f}')
+
+        tmpfile = self.path.with_name(self.path.name + '.tmp')
+        tmpfile.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        os.replace(tmpfile, self.path)
+
+
+def create_metrics_writer(config: Configuration) -> Optional[MetricsWriter]:
+    """ Create the writer for indexer metrics according to the
+        configuration. Returns None if no metrics should be written.
+    """
+    path = config.get_path('INDEXER_METRICS_FILE')
+    if path is None:
+        return None
+
+    fmt = config.INDEXER_METRICS_FORMAT
+    if fmt == 'json':
+        return JsonLinesWriter(path)
+    if fmt == 'prometheus':
+        return PrometheusWriter(path)
+
+    LOG.fatal("Unknown format '%s' for indexer metrics. Use 'json' or 'prometheus'.", fmt)
+    raise UsageError("Bad setting NOMINATIM_INDEXER_METRICS_FORMAT.")
@@ -0,0 +1,62 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Summary of the places that are waiting for indexing.
+"""
+from typing import Dict, Tuple, Optional
+
+from nominatim.db.connection import Connection
+from nominatim.indexer import runners
+
+class PendingSummary:
+    """ Number of places waiting for indexing per table and rank.
+
+        The summary is computed with a single query over the partial
+        indexes that serve as todo list for the indexer. That is a lot
+        cheaper than counting the places for each rank separately when
+        only few places have changed, as is the case for updates.
+
+        Indexing places may mark other places of higher ranks for
+        reindexing. The numbers in the summary must therefore be taken
+        as an estimate only.
+    """
+
+    def __init__(self, counts: Dict[Tuple[str, int], int]) -> None:
+        self.counts = counts
+
+
+    @staticmethod
+    def load(conn: Connection) -> 'PendingSummary':
+        """ Compute the summary from the current state of the database.
+        """
+        with conn.cursor() as cur:
+            cur.execute("""SELECT 'placex', rank_address, count(*) FROM placex
+                             WHERE indexed_status > 0 GROUP BY rank_address
+                           UNION ALL
+                           SELECT 'boundary', rank_search, count(*) FROM placex
+                             WHERE indexed_status > 0 and class = 'boundary'
+                                   and type = 'administrative'
+                             GROUP BY rank_search
+                           UNION ALL
+                           SELECT 'interpolation', 0, count(*) FROM location_property_osmline
+                             WHERE indexed_status > 0
+                           UNION ALL
+                           SELECT 'postcode', 0, count(*) FROM location_postcode
+                             WHERE indexed_status > 0""")
+
+            return PendingSummary({(row[0], row[1]): row[2] for row in cur})
+
+
+    def get(self, runner: runners.Runner) -> Optional[int]:
+        """ Return the estimated number of places the runner needs to
+            process. Returns None when the runner is restricted to a
+            part of its places, for which no estimate is available.
+        """
+        if runner.min_sector is not None or runner.max_sector is not None:
+            return None
+
+        return self.counts.get(runner.pending_key(), 0)
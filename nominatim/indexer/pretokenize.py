@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Offline computation of the token information for an initial import.
+
+The name analysis of the tokenizer is independent of the geometry work
+that the indexer does. For a new database, the token information of
+all places can therefore be computed in a separate pass before indexing:
+places are streamed out of placex, analysed in a pool of tokenizer
+processes and the results are copied into a side table in bulk.
+
+The indexer later uses the precomputed token information whenever the
+name and address it has prepared for a place are still the same as the
+ones that were analysed. This is not the case for places that inherit
+their address or get the names of a linked place. Those are analysed
+again during indexing.
+"""
+from typing import Any, Deque, Sequence, cast
+from collections import deque
+import json
+import logging
+
+import psycopg2.extras
+
+from nominatim.db.connection import connect, Connection
+from nominatim.db.utils import CopyBuffer
+from nominatim.indexer.progress import ProgressLogger
+from nominatim.indexer.token_info import place_digest, PlaceData, PlaceDataList
+from nominatim.indexer.tokenizer_pool import TokenizerPool
+from nominatim.tokenizer.base import AbstractTokenizer
+from nominatim.typing import DictCursorResults
+
+LOG = logging.getLogger()
+
+PRETOKENIZED_TABLE = 'placex_pretokenized'
+
+# Number of places sent to the tokenizer processes in one go.
+BATCH_SIZE = 1000
+
+
+def _prepare_place(row: PlaceData) -> PlaceData:
+    """ Derive name and address of a place from the placex row in the same
+        way as placex_indexing_prepare() does, as far as this is possible
+        without looking at other places.
+    """
+    place = dict(row)
+
+    name = row['name']
+    if name is not None:
+        name = {k: v for k, v in name.items() if not k.startswith('_')} or None
+    place['name'] = name
+
+    address = row['address']
+    if address is not None:
+        if '_inherited' in address:
+            address = None
+        else:
+            address = {k: v for k, v in address.items() if k != '_unlisted_place'}
+    place['address'] = address
+
+    return place
+
+
+def drop_pretokenized(conn: Connection) -> None:
+    """ Remove the precomputed token information again.
+    """
+    with conn.cursor() as cur:
+        cur.drop_table(PRETOKENIZED_TABLE)
+    conn.commit()
+
+
+def _write_batch(conn: Connection, places: PlaceDataList,
+                 digests: Sequence[str], infos: Sequence[Any]) -> None:
+    with CopyBuffer() as buf:
+        for place, digest, info in zip(places, digests, infos):
+            buf.add(place['place_id'], digest, json.dumps(info))
+
+        with conn.cursor() as cur:
+            buf.copy_out(cur, PRETOKENIZED_TABLE,
+                         columns=['place_id', 'digest', 'token_info'])
+
+
+def pretokenize_places(dsn: str, tokenizer: AbstractTokenizer, num_processes: int) -> int:
+    """ Compute the token information for all places in placex that
+        still need indexing and save it in the pretokenized table.
+        Any previously computed information is discarded.
+
+        Returns the number of places processed.
+    """
+    num_processes = max(1, num_processes)
+    # The pool needs to be created before any connection is opened
+    # because the processes are forked.
+    with TokenizerPool(tokenizer, num_processes) as tokpool, connect(dsn) as conn:
+        psycopg2.extras.register_hstore(conn)
+
+        with conn.cursor() as cur:
+            cur.drop_table(PRETOKENIZED_TABLE)
+            cur.execute(f"""CREATE UNLOGGED TABLE {PRETOKENIZED_TABLE} (
+                              place_id BIGINT NOT NULL,
+                              digest TEXT NOT NULL,
+                              token_info JSONB)""")
+            where = "indexed_status > 0 and (name is not null or address is not null)"
+            total = cur.scalar(f"SELECT count(*) FROM placex WHERE {where}")
+        conn.commit()
+
+        progress = ProgressLogger('tokenization', total)
+        pending: Deque[Any] = deque()
+
+        with conn.cursor(name='pretokenize_places') as cur:
+            cur.itersize = BATCH_SIZE * 10
+            cur.execute(f"""SELECT place_id, name, address, class, type,
+                                   country_code, rank_address
+                            FROM placex WHERE {where}""")
+
+            with connect(dsn) as write_conn:
+                while True:
+                    rows = cast(DictCursorResults, cur.fetchmany(BATCH_SIZE))
+                    if not rows:
+                        break
+
+                    places = [_prepare_place(row) for row in rows]
+                    pending.append((tokpool.submit(places),
+                                    [place_digest(p) for p in places]))
+
+                    # Keep the tokenizer processes busy while writing out
+                    # the results of the previous batches.
+                    while len(pending) > 2:
+                        batch, digests = pending.popleft()
+                        _write_batch(write_conn, batch.places, digests, batch.get())
+                        progress.add(len(digests))
+
+                while pending:
+                    batch, digests = pending.popleft()
+                    _write_batch(write_conn, batch.places, digests, batch.get())
+                    progress.add(len(digests))
+
+                write_conn.commit()
+
+        with conn.cursor() as cur:
+            cur.execute(f'ALTER TABLE {PRETOKENIZED_TABLE} ADD PRIMARY KEY (place_id)')
+            cur.execute(f'ANALYZE {PRETOKENIZED_TABLE}')
+        conn.commit()
+
+    return progress.done()
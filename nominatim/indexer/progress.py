@@ -7,6 +7,7 @@
 """
 Helpers for progress logging.
 """
+from typing import Optional
 import logging
 from datetime import datetime
 
@@ -29,6 +30,18 @@ class ProgressLogger:
         self.rank_start_time = datetime.now()
         self.log_interval = log_interval
         self.next_info = INITIAL_PROGRESS if LOG.isEnabledFor(logging.WARNING) else total + 1
+        self.batch_info: Optional[str] = None
+
+    def set_batch_sizes(self, fetch_size: int, batch_size: int) -> None:
+        """ Set the batch sizes currently in use. They will be included
+            in the following progress messages.
+        """
+        self.batch_info = f"fetch size {fetch_size}, batch size {batch_size}"
+
+    def _name_with_info(self) -> str:
+        if self.batch_info is None:
+            return self.name
+        return f"{self.name} ({self.batch_info})"
 
     def add(self, num: int = 1) -> None:
         """ Mark `num` places as processed. Print a log message if the
@@ -51,7 +64,7 @@ class ProgressLogger:
 
         LOG.warning("Done %d in %d @ %.3f per second - %s ETA (seconds): %.2f",
                     self.done_places, int(done_time),
-                    places_per_sec, self.name, eta)
+                    places_per_sec, self._name_with_info(), eta)
 
         self.next_info += int(places_per_sec) * self.log_interval
 
@@ -69,6 +82,6 @@ class ProgressLogger:
 
         LOG.warning("Done %d/%d in %d @ %.3f per second - FINISHED %s\n",
                     self.done_places, self.total_places, int(diff_seconds),
-                    places_per_sec, self.name)
+                    places_per_sec, self._name_with_info())
 
         return self.done_places
@@ -8,15 +8,19 @@
 Mix-ins that provide the actual commands for the indexer for various indexing
 tasks.
 """
-from typing import Any, List
+from typing import Any, List, Optional, Sequence, Mapping, Tuple, Hashable, cast
 import functools
+import json
+import time
 
 from psycopg2 import sql as pysql
 import psycopg2.extras
 
-from nominatim.data.place_info import PlaceInfo
 from nominatim.tokenizer.base import AbstractAnalyzer
+from nominatim.indexer.pretokenize import PRETOKENIZED_TABLE
+from nominatim.indexer.token_info import analyze_places
 from nominatim.db.async_connection import DBConnection
+from nominatim.db.utils import CopyBuffer
 from nominatim.typing import Query, DictCursorResult, DictCursorResults, Protocol
 
 # pylint: disable=C0111
@@ -24,28 +28,107 @@ from nominatim.typing import Query, DictCursorResult, DictCursorResults, Protoco
 def _mk_valuelist(template: str, num: int) -> pysql.Composed:
     return pysql.SQL(',').join([pysql.SQL(template)] * num)
 
-def _analyze_place(place: DictCursorResult, analyzer: AbstractAnalyzer) -> psycopg2.extras.Json:
-    return psycopg2.extras.Json(analyzer.process_place(PlaceInfo(place)))
+def _analyze_places(places: DictCursorResults,
+                    analyzer: AbstractAnalyzer) -> List[psycopg2.extras.Json]:
+    return [psycopg2.extras.Json(info)
+            for info in analyze_places(analyzer, places)]
 
+def _hstore_text(data: Optional[Mapping[str, Optional[str]]]) -> Optional[str]:
+    """ Format a dictionary in the textual input format of hstore.
+    """
+    if data is None:
+        return None
+
+    def _quote(value: Optional[str]) -> str:
+        if value is None:
+            return 'NULL'
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+    return ','.join(f'{_quote(k)}=>{_quote(v)}' for k, v in data.items())
+
+def _sector_filter(min_sector: Optional[int], max_sector: Optional[int]) -> pysql.Composable:
+    parts = []
+    if min_sector is not None:
+        parts.append(pysql.SQL('and geometry_sector >= {}').format(pysql.Literal(min_sector)))
+    if max_sector is not None:
+        parts.append(pysql.SQL('and geometry_sector < {}').format(pysql.Literal(max_sector)))
+    return pysql.SQL(' ').join(parts)
+
+def _sql_percentiles(table: str, where: pysql.Composable,
+                     fractions: Sequence[float]) -> pysql.Composed:
+    return pysql.SQL("""SELECT percentile_disc({}::float[])
+                               WITHIN GROUP (ORDER BY geometry_sector)
+                        FROM {} WHERE {}
+                     """).format(pysql.Literal(list(fractions)), pysql.Identifier(table), where)
 
 class Runner(Protocol):
+    min_sector: Optional[int]
+    max_sector: Optional[int]
+    # CPU time spent in the name analysis of the tokenizer.
+    analysis_time: float
+
     def name(self) -> str: ...
+    def orders_by_sector(self) -> bool: ...
+    def pending_key(self) -> Tuple[str, int]: ...
     def sql_count_objects(self) -> Query: ...
     def sql_get_objects(self) -> Query: ...
+    def sql_has_pending(self) -> Query: ...
+    def sql_sector_percentiles(self, fractions: Sequence[float]) -> Optional[Query]: ...
     def get_place_details(self, worker: DBConnection,
                           ids: DictCursorResults) -> DictCursorResults: ...
-    def index_places(self, worker: DBConnection, places: DictCursorResults) -> None: ...
+    def needs_analysis(self) -> bool: ...
+    def locality_key(self, place: DictCursorResult) -> Optional[Hashable]: ...
+    def index_places(self, worker: DBConnection, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None: ...
+    def staging_table_columns(self) -> Sequence[Tuple[str, str]]: ...
+    def stage_places(self, copy: CopyBuffer, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None: ...
+    def sql_index_from_staging(self, table: str) -> pysql.Composed: ...
+
+
+class AbstractAnalyzingRunner:
+    """ Common functions for runners that need to compute the token
+        information for their places.
+    """
+
+    def __init__(self, analyzer: AbstractAnalyzer) -> None:
+        self.analyzer = analyzer
+        self.min_sector: Optional[int] = None
+        self.max_sector: Optional[int] = None
+        self.analysis_time = 0.0
+
+
+    def needs_analysis(self) -> bool:
+        return True
+
+
+    def locality_key(self, place: DictCursorResult) -> Optional[Hashable]:
+        return cast(int, place['geometry_sector'])
 
 
-class AbstractPlacexRunner:
+    def _token_info(self, places: DictCursorResults,
+                    token_info: Optional[Sequence[Any]]) -> List[psycopg2.extras.Json]:
+        if token_info is None:
+            tstart = time.process_time()
+            result = _analyze_places(places, self.analyzer)
+            self.analysis_time += time.process_time() - tstart
+            return result
+
+        assert len(token_info) == len(places)
+        return [psycopg2.extras.Json(info) for info in token_info]
+
+
+class AbstractPlacexRunner(AbstractAnalyzingRunner):
     """ Returns SQL commands for indexing of the placex table.
     """
     SELECT_SQL = pysql.SQL('SELECT place_id FROM placex ')
     UPDATE_LINE = "(%s, %s::hstore, %s::hstore, %s::int, %s::jsonb)"
 
-    def __init__(self, rank: int, analyzer: AbstractAnalyzer) -> None:
+    def __init__(self, rank: int, analyzer: AbstractAnalyzer,
+                 pretokenized: bool = False) -> None:
+        super().__init__(analyzer)
         self.rank = rank
-        self.analyzer = analyzer
+        self.pretokenized = pretokenized
 
 
     @functools.lru_cache(maxsize=1)
@@ -60,24 +143,57 @@ class AbstractPlacexRunner:
 
 
     def get_place_details(self, worker: DBConnection, ids: DictCursorResults) -> DictCursorResults:
-        worker.perform("""SELECT place_id, extra.*
-                          FROM placex, LATERAL placex_indexing_prepare(placex) as extra
-                          WHERE place_id IN %s""",
-                       (tuple((p[0] for p in ids)), ))
+        if self.pretokenized:
+            worker.perform(pysql.SQL(
+                """SELECT placex.place_id, geometry_sector, extra.*,
+                          pt.digest as pretoken_digest, pt.token_info as pretoken_info
+                   FROM placex LEFT JOIN {} pt ON pt.place_id = placex.place_id,
+                        LATERAL placex_indexing_prepare(placex) as extra
+                   WHERE placex.place_id IN %s""").format(pysql.Identifier(PRETOKENIZED_TABLE)),
+                (tuple((p[0] for p in ids)), ))
+        else:
+            worker.perform("""SELECT place_id, geometry_sector, extra.*
+                              FROM placex, LATERAL placex_indexing_prepare(placex) as extra
+                              WHERE place_id IN %s""",
+                           (tuple((p[0] for p in ids)), ))
 
         return []
 
 
-    def index_places(self, worker: DBConnection, places: DictCursorResults) -> None:
+    def index_places(self, worker: DBConnection, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None:
         values: List[Any] = []
-        for place in places:
+        for place, info in zip(places, self._token_info(places, token_info)):
             for field in ('place_id', 'name', 'address', 'linked_place_id'):
                 values.append(place[field])
-            values.append(_analyze_place(place, self.analyzer))
+            values.append(info)
 
         worker.perform(self._index_sql(len(places)), values)
 
 
+    def staging_table_columns(self) -> Sequence[Tuple[str, str]]:
+        return (('place_id', 'BIGINT'), ('name', 'HSTORE'), ('address', 'HSTORE'),
+                ('linked_place_id', 'BIGINT'), ('token_info', 'JSONB'))
+
+
+    def stage_places(self, copy: CopyBuffer, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None:
+        for place, info in zip(places, self._token_info(places, token_info)):
+            copy.add(place['place_id'], _hstore_text(place['name']),
+                     _hstore_text(place['address']), place['linked_place_id'],
+                     json.dumps(info.adapted))
+
+
+    def sql_index_from_staging(self, table: str) -> pysql.Composed:
+        return pysql.SQL(
+            """ UPDATE placex
+                SET indexed_status = 0, address = v.address, token_info = v.token_info,
+                    name = v.name, linked_place_id = v.linked_place_id
+                FROM {} as v
+                WHERE placex.place_id = v.place_id
+            """).format(pysql.Identifier(table))
+
+
 class RankRunner(AbstractPlacexRunner):
     """ Returns SQL commands for indexing one rank within the placex table.
     """
@@ -85,16 +201,32 @@ class RankRunner(AbstractPlacexRunner):
     def name(self) -> str:
         return f"rank {self.rank}"
 
+    def orders_by_sector(self) -> bool:
+        return True
+
+    def pending_key(self) -> Tuple[str, int]:
+        return ('placex', self.rank)
+
+    def _sql_where(self) -> pysql.Composed:
+        return pysql.SQL("indexed_status > 0 and rank_address = {}")\
+                    .format(pysql.Literal(self.rank))
+
     def sql_count_objects(self) -> pysql.Composed:
-        return pysql.SQL("""SELECT count(*) FROM placex
-                            WHERE rank_address = {} and indexed_status > 0
-                         """).format(pysql.Literal(self.rank))
+        return pysql.SQL("SELECT count(*) FROM placex WHERE {} {}")\
+                    .format(self._sql_where(),
+                            _sector_filter(self.min_sector, self.max_sector))
 
     def sql_get_objects(self) -> pysql.Composed:
-        return self.SELECT_SQL + pysql.SQL(
-            """WHERE indexed_status > 0 and rank_address = {}
-               ORDER BY geometry_sector
-            """).format(pysql.Literal(self.rank))
+        return self.SELECT_SQL + pysql.SQL("WHERE {} {} ORDER BY geometry_sector")\
+                    .format(self._sql_where(),
+                            _sector_filter(self.min_sector, self.max_sector))
+
+    def sql_has_pending(self) -> pysql.Composed:
+        return pysql.SQL("SELECT EXISTS(SELECT * FROM placex WHERE {})")\
+                    .format(self._sql_where())
+
+    def sql_sector_percentiles(self, fractions: Sequence[float]) -> pysql.Composed:
+        return _sql_percentiles('placex', self._sql_where(), fractions)
 
 
 class BoundaryRunner(AbstractPlacexRunner):
@@ -105,46 +237,74 @@ class BoundaryRunner(AbstractPlacexRunner):
     def name(self) -> str:
         return f"boundaries rank {self.rank}"
 
-    def sql_count_objects(self) -> pysql.Composed:
-        return pysql.SQL("""SELECT count(*) FROM placex
-                            WHERE indexed_status > 0
-                              AND rank_search = {}
-                              AND class = 'boundary' and type = 'administrative'
+    def orders_by_sector(self) -> bool:
+        return False
+
+    def pending_key(self) -> Tuple[str, int]:
+        return ('boundary', self.rank)
+
+    def _sql_where(self) -> pysql.Composed:
+        return pysql.SQL("""indexed_status > 0 and rank_search = {}
+                            and class = 'boundary' and type = 'administrative'
                          """).format(pysql.Literal(self.rank))
 
+    def sql_count_objects(self) -> pysql.Composed:
+        return pysql.SQL("SELECT count(*) FROM placex WHERE {} {}")\
+                    .format(self._sql_where(),
+                            _sector_filter(self.min_sector, self.max_sector))
+
     def sql_get_objects(self) -> pysql.Composed:
-        return self.SELECT_SQL + pysql.SQL(
-            """WHERE indexed_status > 0 and rank_search = {}
-                     and class = 'boundary' and type = 'administrative'
-               ORDER BY partition, admin_level
-            """).format(pysql.Literal(self.rank))
+        return self.SELECT_SQL + pysql.SQL("WHERE {} {} ORDER BY partition, admin_level")\
+                    .format(self._sql_where(),
+                            _sector_filter(self.min_sector, self.max_sector))
+
+    def sql_has_pending(self) -> pysql.Composed:
+        return pysql.SQL("SELECT EXISTS(SELECT * FROM placex WHERE {})")\
+                    .format(self._sql_where())
 
+    def sql_sector_percentiles(self, fractions: Sequence[float]) -> pysql.Composed:
+        return _sql_percentiles('placex', self._sql_where(), fractions)
 
-class InterpolationRunner:
+
+class InterpolationRunner(AbstractAnalyzingRunner):
     """ Returns SQL commands for indexing the address interpolation table
         location_property_osmline.
     """
 
-    def __init__(self, analyzer: AbstractAnalyzer) -> None:
-        self.analyzer = analyzer
-
 
     def name(self) -> str:
         return "interpolation lines (location_property_osmline)"
 
-    def sql_count_objects(self) -> str:
-        return """SELECT count(*) FROM location_property_osmline
-                  WHERE indexed_status > 0"""
+    def orders_by_sector(self) -> bool:
+        return True
 
-    def sql_get_objects(self) -> str:
-        return """SELECT place_id
-                  FROM location_property_osmline
-                  WHERE indexed_status > 0
-                  ORDER BY geometry_sector"""
+    def pending_key(self) -> Tuple[str, int]:
+        return ('interpolation', 0)
+
+    def sql_count_objects(self) -> pysql.Composed:
+        return pysql.SQL("""SELECT count(*) FROM location_property_osmline
+                            WHERE indexed_status > 0 {}
+                         """).format(_sector_filter(self.min_sector, self.max_sector))
+
+    def sql_get_objects(self) -> pysql.Composed:
+        return pysql.SQL("""SELECT place_id
+                            FROM location_property_osmline
+                            WHERE indexed_status > 0 {}
+                            ORDER BY geometry_sector
+                         """).format(_sector_filter(self.min_sector, self.max_sector))
+
+    def sql_has_pending(self) -> str:
+        return """SELECT EXISTS(SELECT * FROM location_property_osmline
+                                WHERE indexed_status > 0)"""
+
+    def sql_sector_percentiles(self, fractions: Sequence[float]) -> pysql.Composed:
+        return _sql_percentiles('location_property_osmline',
+                                pysql.SQL('indexed_status > 0'), fractions)
 
 
     def get_place_details(self, worker: DBConnection, ids: DictCursorResults) -> DictCursorResults:
-        worker.perform("""SELECT place_id, get_interpolation_address(address, osm_id) as address
+        worker.perform("""SELECT place_id, geometry_sector,
+                                 get_interpolation_address(address, osm_id) as address
                           FROM location_property_osmline WHERE place_id IN %s""",
                        (tuple((p[0] for p in ids)), ))
         return []
@@ -159,23 +319,53 @@ class InterpolationRunner:
                          """).format(_mk_valuelist("(%s, %s::hstore, %s::jsonb)", num_places))
 
 
-    def index_places(self, worker: DBConnection, places: DictCursorResults) -> None:
+    def index_places(self, worker: DBConnection, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None:
         values: List[Any] = []
-        for place in places:
+        for place, info in zip(places, self._token_info(places, token_info)):
             values.extend((place[x] for x in ('place_id', 'address')))
-            values.append(_analyze_place(place, self.analyzer))
+            values.append(info)
 
         worker.perform(self._index_sql(len(places)), values)
 
 
+    def staging_table_columns(self) -> Sequence[Tuple[str, str]]:
+        return (('place_id', 'BIGINT'), ('address', 'HSTORE'), ('token_info', 'JSONB'))
+
+
+    def stage_places(self, copy: CopyBuffer, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None:
+        for place, info in zip(places, self._token_info(places, token_info)):
+            copy.add(place['place_id'], _hstore_text(place['address']),
+                     json.dumps(info.adapted))
+
+
+    def sql_index_from_staging(self, table: str) -> pysql.Composed:
+        return pysql.SQL("""UPDATE location_property_osmline
+                            SET indexed_status = 0, address = v.address,
+                                token_info = v.token_info
+                            FROM {} as v
+                            WHERE location_property_osmline.place_id = v.place_id
+                         """).format(pysql.Identifier(table))
+
+
 
 class PostcodeRunner(Runner):
     """ Provides the SQL commands for indexing the location_postcode table.
     """
+    min_sector: Optional[int] = None
+    max_sector: Optional[int] = None
+    analysis_time = 0.0
 
     def name(self) -> str:
         return "postcodes (location_postcode)"
 
+    def orders_by_sector(self) -> bool:
+        return False
+
+    def pending_key(self) -> Tuple[str, int]:
+        return ('postcode', 0)
+
 
     def sql_count_objects(self) -> str:
         return 'SELECT count(*) FROM location_postcode WHERE indexed_status > 0'
@@ -187,10 +377,44 @@ class PostcodeRunner(Runner):
                   ORDER BY country_code, postcode"""
 
 
+    def sql_has_pending(self) -> str:
+        return """SELECT EXISTS(SELECT * FROM location_postcode
+                                WHERE indexed_status > 0)"""
+
+
+    def sql_sector_percentiles(self, fractions: Sequence[float]) -> None:
+        # location_postcode has no geometry sectors
+        return None
+
+
     def get_place_details(self, worker: DBConnection, ids: DictCursorResults) -> DictCursorResults:
         return ids
 
-    def index_places(self, worker: DBConnection, places: DictCursorResults) -> None:
+    def needs_analysis(self) -> bool:
+        return False
+
+    def locality_key(self, place: DictCursorResult) -> None:
+        return None
+
+    def index_places(self, worker: DBConnection, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None:
         worker.perform(pysql.SQL("""UPDATE location_postcode SET indexed_status = 0
                                     WHERE place_id IN ({})""")
                        .format(pysql.SQL(',').join((pysql.Literal(i[0]) for i in places))))
+
+
+    def staging_table_columns(self) -> Sequence[Tuple[str, str]]:
+        return (('place_id', 'BIGINT'), )
+
+
+    def stage_places(self, copy: CopyBuffer, places: DictCursorResults,
+                     token_info: Optional[Sequence[Any]] = None) -> None:
+        for place in places:
+            copy.add(place[0])
+
+
+    def sql_index_from_staging(self, table: str) -> pysql.Composed:
+        return pysql.SQL("""UPDATE location_postcode SET indexed_status = 0
+                            FROM {} as v
+                            WHERE location_postcode.place_id = v.place_id
+                         """).format(pysql.Identifier(table))
@@ -0,0 +1,196 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Partitioning of the indexing work over multiple independent indexer
+processes.
+"""
+from typing import Optional, List, Dict
+import json
+import logging
+import time
+
+from nominatim.db.connection import connect, Connection
+from nominatim.db import properties
+from nominatim.errors import UsageError
+from nominatim.indexer import runners
+
+LOG = logging.getLogger()
+
+
+class Shard:
+    """ Describes the part of the work that a single indexer process
+        takes care of, when indexing is split into `num_shards` shards.
+        Shards are numbered starting with 1.
+
+        Each runner that can be partitioned by geometry sector is split
+        into ranges of the sector that contain roughly the same number
+        of places. The range boundaries are computed once by the shard
+        that first gets to the runner and saved in the property table,
+        so that all shards work with exactly the same partitioning.
+        Runners that cannot be partitioned are only run by the first shard.
+
+        Ranks need to be indexed strictly one after another. After having
+        finished its part of a runner, a shard therefore records that it is
+        done with the runner and waits until all other shards have recorded
+        the same (see `wait_for_others()`). Places that are marked for
+        reindexing in the range of a shard, after the shard has finished
+        the runner, are left for the next indexing run.
+    """
+    PROPERTY = 'indexer_shards'
+    # Key in the completion markers recording that a shard is done with all work.
+    FINISHED = '*'
+    # Time between two checks if the other shards are done (in seconds).
+    POLL_INTERVAL = 5
+
+    def __init__(self, shard: int, num_shards: int) -> None:
+        if num_shards < 1 or not 1 <= shard <= num_shards:
+            raise UsageError(f"Invalid shard {shard}/{num_shards}.")
+        self.shard = shard
+        self.num_shards = num_shards
+
+
+    @staticmethod
+    def from_string(value: str) -> 'Shard':
+        """ Create a shard from a description of the form 'K/N'.
+        """
+        try:
+            shard, num_shards = (int(v) for v in value.split('/'))
+        except ValueError as exc:
+            raise UsageError(f"Shard must be given as 'K/N', got '{value}'.") from exc
+
+        return Shard(shard, num_shards)
+
+
+    def __str__(self) -> str:
+        return f"{self.shard}/{self.num_shards}"
+
+
+    def property_name(self) -> str:
+        """ Name of the property under which the sector boundaries are saved.
+        """
+        return f"{self.PROPERTY}_{self.num_shards}"
+
+
+    def done_property_name(self) -> str:
+        """ Name of the property under which the shards record which
+            runners they have finished.
+        """
+        return f"{self.property_name()}_done"
+
+
+    def restrict(self, dsn: str, runner: runners.Runner) -> bool:
+        """ Restrict the given runner to the sector range of this shard.
+            Returns false, when the shard has no work to do for the runner.
+        """
+        if self.num_shards == 1:
+            return True
+
+        bounds = self._get_bounds(dsn, runner)
+        if bounds is None:
+            return self.shard == 1
+
+        runner.min_sector = None if self.shard == 1 else bounds[self.shard - 2]
+        runner.max_sector = None if self.shard == self.num_shards \
+                            else bounds[self.shard - 1]
+
+        if runner.min_sector is not None and runner.max_sector is not None \
+           and runner.min_sector >= runner.max_sector:
+            return False
+
+        LOG.info("Shard %s: indexing %s in sector range [%s, %s).",
+                 self, runner.name(), runner.min_sector, runner.max_sector)
+        return True
+
+
+    def wait_for_others(self, dsn: str, runner: runners.Runner) -> None:
+        """ Record that this shard has finished the given runner and
+            block until all other shards have finished it as well.
+        """
+        if self.num_shards == 1:
+            return
+
+        with connect(dsn) as conn:
+            first = True
+            while self._mark_done(conn, runner.name()) < self.num_shards:
+                if first:
+                    LOG.warning("Waiting for other shards to finish %s.", runner.name())
+                    first = False
+                time.sleep(self.POLL_INTERVAL)
+
+
+    def finish(self, dsn: str) -> bool:
+        """ Record that this shard has finished all its work. The last
+            shard to finish removes the saved sector boundaries and
+            completion markers. Returns true if this was the last shard.
+        """
+        if self.num_shards == 1:
+            return True
+
+        with connect(dsn) as conn:
+            if not conn.table_exists('nominatim_properties'):
+                return True
+
+            if self._mark_done(conn, self.FINISHED) < self.num_shards:
+                return False
+
+            with conn.cursor() as cur:
+                cur.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                            (self.property_name(), ))
+                cur.execute('DELETE FROM nominatim_properties WHERE property IN (%s, %s)',
+                            (self.property_name(), self.done_property_name()))
+            conn.commit()
+
+        return True
+
+
+    def _mark_done(self, conn: Connection, key: str) -> int:
+        """ Add this shard to the completion markers under the given key.
+            Returns the number of shards that are done.
+        """
+        with conn.cursor() as cur:
+            # Serialize all shards, so that no marker gets lost.
+            cur.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                        (self.property_name(), ))
+            data = properties.get_property(conn, self.done_property_name())
+            markers: Dict[str, List[int]] = json.loads(data) if data else {}
+
+            done = markers.setdefault(key, [])
+            if self.shard not in done:
+                done.append(self.shard)
+                properties.set_property(conn, self.done_property_name(), json.dumps(markers))
+        conn.commit()
+
+        return len(done)
+
+
+    def _get_bounds(self, dsn: str, runner: runners.Runner) -> Optional[List[int]]:
+        fractions = [i / self.num_shards for i in range(1, self.num_shards)]
+        sql = runner.sql_sector_percentiles(fractions)
+        if sql is None:
+            return None
+
+        with connect(dsn) as conn:
+            with conn.cursor() as cur:
+                # Serialize all shards, so that the boundaries are computed
+                # only once and then read by everybody else.
+                cur.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                            (self.property_name(), ))
+                data = properties.get_property(conn, self.property_name())
+                all_bounds: Dict[str, Optional[List[int]]] = json.loads(data) if data else {}
+
+                if runner.name() not in all_bounds:
+                    cur.execute(sql)
+                    row = cur.fetchone()
+                    all_bounds[runner.name()] = None if row is None or row[0] is None \
+                                                else [int(b) for b in row[0]]
+                    properties.set_property(conn, self.property_name(),
+                                            json.dumps(all_bounds))
+            conn.commit()
+
+        # When there is nothing to index at all, no boundaries are computed
+        # and the whole runner is left to the first shard.
+        return all_bounds[runner.name()]
@@ -0,0 +1,121 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Writing of indexing results through COPY into staging tables.
+"""
+from typing import Optional, Any, Sequence, Dict
+import logging
+
+from psycopg2 import sql as pysql
+
+from nominatim.db.async_connection import WorkerPool
+from nominatim.db.connection import connect, Connection
+from nominatim.db.utils import CopyBuffer
+from nominatim.indexer import runners
+from nominatim.typing import DictCursorResults
+
+LOG = logging.getLogger()
+
+
+class StagingWriter: # pylint: disable=too-many-instance-attributes
+    """ Collects the results of indexing and writes them in bulk into
+        per-connection unlogged staging tables using COPY. Once a staging
+        table is filled, the results are applied to the target table
+        with a single UPDATE on the worker connection owning the table.
+
+        Asynchronous connections cannot run COPY, so the data is copied
+        through a separate synchronous connection. The expensive update
+        is still run on the asynchronous connections of the worker pool.
+
+        The writer may be used as a context manager.
+    """
+
+    def __init__(self, dsn: str, pool: WorkerPool, runner: runners.Runner,
+                 flush_size: int) -> None:
+        self.pool = pool
+        self.runner = runner
+        self.flush_size = flush_size
+        self.buffer = CopyBuffer()
+        self.buffered_rows = 0
+        conn = connect(dsn).connection
+        conn.autocommit = True
+        self.conn: Optional[Connection] = conn
+
+        columns = runner.staging_table_columns()
+        self.column_names = [c[0] for c in columns]
+
+        self.tables: Dict[int, str] = {}
+        with conn.cursor() as cur:
+            # The backend PID is unique across all indexer processes that
+            # use the same database, even when they run on different machines.
+            backend_pid = cur.scalar('SELECT pg_backend_pid()')
+            for i, worker in enumerate(pool.threads):
+                table = f'tmp_indexer_stage_{backend_pid}_{i}'
+                cur.drop_table(table)
+                cur.execute(pysql.SQL("CREATE UNLOGGED TABLE {} ({})")
+                              .format(pysql.Identifier(table),
+                                      pysql.SQL(',').join(
+                                          pysql.Identifier(name) + pysql.SQL(' ' + sqltype)
+                                          for name, sqltype in columns)))
+                self.tables[id(worker)] = table
+
+
+    def add(self, places: DictCursorResults,
+            token_info: Optional[Sequence[Any]] = None) -> None:
+        """ Add the given places to the staging buffer. Flushes the buffer
+            when it has grown to the configured size.
+        """
+        self.runner.stage_places(self.buffer, places, token_info)
+        self.buffered_rows += len(places)
+
+        if self.buffered_rows >= self.flush_size:
+            self.flush()
+
+
+    def flush(self) -> None:
+        """ Copy the buffered rows into the staging table of the next free
+            worker and start the update of the target table.
+        """
+        if self.buffered_rows == 0:
+            return
+
+        assert self.conn is not None
+        worker = self.pool.next_free_worker()
+        table = self.tables[id(worker)]
+
+        with self.buffer:
+            with self.conn.cursor() as cur:
+                self.buffer.copy_out(cur, table, columns=self.column_names)
+        self.buffer = CopyBuffer()
+        self.buffered_rows = 0
+
+        LOG.debug("Applying staged places from %s.", table)
+        worker.perform(self.runner.sql_index_from_staging(table)
+                       + pysql.SQL('; TRUNCATE {}').format(pysql.Identifier(table)))
+
+
+    def close(self) -> None:
+        """ Drop the staging tables and close the connection. The caller
+            must make sure that all workers of the pool have finished.
+        """
+        if self.conn is not None:
+            with self.conn.cursor() as cur:
+                for table in self.tables.values():
+                    cur.drop_table(table)
+            self.conn.close()
+            self.conn = None
+
+
+    def __enter__(self) -> 'StagingWriter':
+        return self
+
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        if exc_type is None:
+            self.flush()
+        self.pool.finish_all()
+        self.close()
@@ -0,0 +1,58 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Computation of the token information for places, shared between the
+indexer, the tokenizer pool and the offline pretokenization.
+"""
+from typing import Any, List, Mapping, Optional, Sequence
+import hashlib
+import json
+
+from nominatim.data.place_info import PlaceInfo
+from nominatim.tokenizer.base import AbstractAnalyzer
+
+# Place data as handed to the name analysis. Rows from a database cursor
+# as well as plain dictionaries may be used.
+PlaceData = Mapping[str, Any]
+PlaceDataList = Sequence[PlaceData]
+
+
+def place_digest(place: PlaceData) -> str:
+    """ Compute a fingerprint over all information of a place that is
+        used by the name analysis.
+    """
+    return hashlib.md5(json.dumps([place.get('name'), place.get('address'),
+                                   place.get('class'), place.get('type'),
+                                   place.get('country_code'), place.get('rank_address')],
+                                  sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def pretokenized_info(place: PlaceData) -> Optional[Any]:
+    """ Return the precomputed token information of a place as fetched
+        by the indexer, provided it is still valid for the place.
+    """
+    digest = place.get('pretoken_digest')
+    if digest is None or digest != place_digest(place):
+        return None
+
+    return place.get('pretoken_info')
+
+
+def analyze_places(analyzer: AbstractAnalyzer, places: PlaceDataList) -> List[Any]:
+    """ Compute the token information for the given places. Precomputed
+        token information is used where available, the remaining places
+        are sent through the analyzer.
+    """
+    result = [pretokenized_info(place) for place in places]
+    todo = [i for i, info in enumerate(result) if info is None]
+
+    if todo:
+        infos = analyzer.process_places([PlaceInfo(places[i]) for i in todo])
+        for i, info in zip(todo, infos):
+            result[i] = info
+
+    return result
@@ -0,0 +1,118 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Process pool for running the name analysis of the tokenizer in parallel
+to the database work of the indexer.
+"""
+from typing import Optional, Any, List, Dict, Tuple, TypeVar, Generic
+import logging
+import multiprocessing
+import multiprocessing.pool
+import multiprocessing.util
+import time
+
+from nominatim.indexer.token_info import analyze_places, PlaceDataList
+from nominatim.tokenizer.base import AbstractTokenizer, AbstractAnalyzer
+
+LOG = logging.getLogger()
+
+PlacesT = TypeVar('PlacesT', bound=PlaceDataList)
+
+# Analyzer of the current worker process. Only set inside the pool processes.
+_ANALYZER: Optional[AbstractAnalyzer] = None
+
+
+def _init_worker(tokenizer: AbstractTokenizer) -> None:
+    global _ANALYZER # pylint: disable=global-statement
+    _ANALYZER = tokenizer.name_analyzer()
+    # Make sure the analyzer's database connection is closed
+    # when the pool shuts down.
+    multiprocessing.util.Finalize(None, _ANALYZER.close, exitpriority=10)
+
+
+def _process_places(places: List[Dict[str, Any]]) -> Tuple[float, List[Any]]:
+    assert _ANALYZER is not None
+    tstart = time.process_time()
+    result = analyze_places(_ANALYZER, places)
+    return time.process_time() - tstart, result
+
+
+class PendingBatch(Generic[PlacesT]):
+    """ A batch of places whose token information is being computed
+        by the tokenizer pool.
+    """
+
+    def __init__(self, pool: 'TokenizerPool', places: PlacesT,
+                 result: 'multiprocessing.pool.AsyncResult[List[Tuple[float, List[Any]]]]'
+                ) -> None:
+        self.pool = pool
+        self.places = places
+        self.result = result
+
+
+    def get(self) -> List[Any]:
+        """ Wait for the tokenizer processes to finish and return the
+            token information in the same order as the places.
+        """
+        tstart = time.time()
+        chunks = self.result.get()
+        self.pool.wait_time += time.time() - tstart
+        self.pool.cpu_time += sum(chunk[0] for chunk in chunks)
+
+        return [info for chunk in chunks for info in chunk[1]]
+
+
+class TokenizerPool:
+    """ A pool of processes, each with its own name analyzer, that
+        compute the token information for places.
+
+        The pool may be used as a context manager.
+    """
+
+    def __init__(self, tokenizer: AbstractTokenizer, num_processes: int) -> None:
+        self.num_processes = num_processes
+        self.wait_time = 0.0
+        # CPU time used by the worker processes for the analysis.
+        self.cpu_time = 0.0
+        # Tokenizers are not necessarily picklable. Use fork, so that the
+        # worker processes inherit the tokenizer from the parent.
+        self.pool: Optional[multiprocessing.pool.Pool] = \
+            multiprocessing.get_context('fork').Pool(num_processes, _init_worker,
+                                                     (tokenizer, ))
+        LOG.info("Started %d tokenizer processes.", num_processes)
+
+
+    def submit(self, places: PlacesT) -> PendingBatch[PlacesT]:
+        """ Send a batch of places to the worker processes for analysis.
+            The places are distributed evenly over all processes.
+        """
+        assert self.pool is not None
+        chunk_size = max(1, -(-len(places) // self.num_processes))
+        chunks = [[dict(p) for p in places[i:i + chunk_size]]
+                  for i in range(0, len(places), chunk_size)]
+
+        return PendingBatch(self, places,
+                            self.pool.map_async(_process_places, chunks, chunksize=1))
+
+
+    def close(self) -> None:
+        """ Wait for the worker processes to finish and shut down the pool.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+    def __enter__(self) -> 'TokenizerPool':
+        return self
+
+
+    def __exit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        if exc_type is not None and self.pool is not None:
+            self.pool.terminate()
+        self.close()
@@ -0,0 +1,115 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Runtime adaption of the batch sizes used by the indexer.
+"""
+import logging
+import time
+
+from nominatim.db.async_connection import WorkerPool
+
+LOG = logging.getLogger()
+
+
+class BatchSizes: # pylint: disable=too-many-instance-attributes
+    """ Number of places fetched from the database in one go (`fetch_size`)
+        and number of places sent to the database with a single
+        SQL statement (`batch_size`).
+
+        The sizes are constant unless `adaptive` is set. In that case,
+        the sizes are adapted from time to time with `update()` according
+        to the measured wait and statement times:
+
+        * When statements finish very fast, most time is spent on
+          statement overhead and the batch size is increased.
+          When they are slow, the batch size is decreased to spread
+          the work better over the connections.
+        * When the indexer has to wait for place details, the fetch size
+          is increased. It is also kept large enough to keep all
+          connections of the pool busy.
+
+        The statement time is measured from sending a statement until the
+        indexer notices that it has finished. This includes time the
+        indexer process spends elsewhere, for example in the tokenizer.
+        When the indexer process itself is the bottleneck, statements
+        therefore look slower than they are and the batch size goes down.
+    """
+    MIN_FETCH_SIZE = 50
+    MAX_FETCH_SIZE = 2000
+    MAX_BATCH_SIZE = 200
+    # Statement latency range (in seconds) the batch size is tuned towards.
+    LOW_LATENCY = 0.05
+    HIGH_LATENCY = 0.5
+    # Minimum number of statements between two adaptions.
+    MIN_SAMPLE_STATEMENTS = 20
+
+    def __init__(self, fetch_size: int, batch_size: int,
+                 num_threads: int, adaptive: bool = False) -> None:
+        self.fetch_size = fetch_size
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.adaptive = adaptive
+
+        self._last_time = time.time()
+        self._last_fetch_wait = 0.0
+        self._last_pool_wait = 0.0
+        self._last_query_time = 0.0
+        self._last_query_count = 0
+
+
+    def update(self, fetch_wait: float, pool: WorkerPool) -> bool:
+        """ Adapt the sizes to the current performance. `fetch_wait` is the
+            total time the fetcher has waited for place details so far.
+            Returns true, when one of the sizes has changed.
+        """
+        if not self.adaptive:
+            return False
+
+        query_count = sum(t.query_count for t in pool.threads)
+        num_queries = query_count - self._last_query_count
+        if num_queries < self.MIN_SAMPLE_STATEMENTS:
+            return False
+
+        now = time.time()
+        query_time = sum(t.query_time for t in pool.threads)
+
+        elapsed = max(now - self._last_time, 0.001)
+        latency = (query_time - self._last_query_time) / num_queries
+        fetch_wait_ratio = (fetch_wait - self._last_fetch_wait) / elapsed
+        pool_wait_ratio = (pool.wait_time - self._last_pool_wait) / elapsed
+
+        self._last_time = now
+        self._last_fetch_wait = fetch_wait
+        self._last_pool_wait = pool.wait_time
+        self._last_query_time = query_time
+        self._last_query_count = query_count
+
+        old_sizes = (self.fetch_size, self.batch_size)
+
+        if latency < self.LOW_LATENCY:
+            self.batch_size = min(self.batch_size * 2, self.MAX_BATCH_SIZE)
+        elif latency > self.HIGH_LATENCY:
+            self.batch_size = max(self.batch_size // 2, 1)
+
+        if fetch_wait_ratio > 0.1:
+            self.fetch_size = self.fetch_size * 2
+        elif fetch_wait_ratio < 0.01 and pool_wait_ratio > 0.5:
+            # The database is the bottleneck, no need to prefetch much.
+            self.fetch_size = self.fetch_size // 2
+
+        self.fetch_size = max(self.fetch_size, self.batch_size * self.num_threads)
+        self.fetch_size = min(max(self.fetch_size, self.MIN_FETCH_SIZE), self.MAX_FETCH_SIZE)
+
+        LOG.debug("Batch tuning: latency %.3fs, fetch wait %.2f, pool wait %.2f",
+                  latency, fetch_wait_ratio, pool_wait_ratio)
+
+        if old_sizes != (self.fetch_size, self.batch_size):
+            LOG.info("Changing batch sizes: fetch size %d, batch size %d",
+                     self.fetch_size, self.batch_size)
+            return True
+
+        return False
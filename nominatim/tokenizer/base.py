@@ -9,11 +9,12 @@ Abstract class definitions for tokenizers. These base classes are here
 mainly for documentation purposes.
 """
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Dict, Any, Optional, Iterable
+from typing import List, Tuple, Dict, Any, Optional, Iterable, Sequence
 from pathlib import Path
 
 from nominatim.config import Configuration
 from nominatim.data.place_info import PlaceInfo
+from nominatim.tokenizer.profiling import AnalyzerProfile
 from nominatim.typing import Protocol
 
 class AbstractAnalyzer(ABC):
@@ -121,6 +122,40 @@ class AbstractAnalyzer(ABC):
         """
 
 
+    def process_places(self, places: Sequence[PlaceInfo]) -> List[Any]:
+        """ Compute the token information for a batch of places.
+
+            Tokenizers may override this function to look up the words
+            of all places at once, which saves round trips to the
+            database. The default implementation simply calls
+            `process_place()` for each place.
+
+            Arguments:
+                places: Place information retrieved from the database.
+
+            Returns:
+                The results of `process_place()` for each place in
+                the same order as the input.
+        """
+        return [self.process_place(place) for place in places]
+
+
+    def enable_profiling(self, dry_run: bool = False) -> AnalyzerProfile: # pylint: disable=unused-argument
+        """ Start collecting performance statistics about the processing
+            of places.
+
+            Arguments:
+                dry_run: When set, the analyzer should not save any
+                         changes to the database, like new words.
+
+            Returns:
+                The object where the statistics are collected. The default
+                implementation neither collects statistics nor supports
+                dry runs.
+        """
+        return AnalyzerProfile()
+
+
 
 class AbstractTokenizer(ABC):
     """ The tokenizer instance is the central instance of the tokenizer in
@@ -202,18 +237,26 @@ class AbstractTokenizer(ABC):
 
 
     @abstractmethod
-    def update_statistics(self) -> None:
+    def update_statistics(self, threads: int = 1) -> None:
         """ Recompute any tokenizer statistics necessary for efficient lookup.
             This function is meant to be called from time to time by the user
             to improve performance. However, the tokenizer must not depend on
             it to be called in order to work.
+
+            Arguments:
+                threads: Number of database connections that may be used
+                         in parallel.
         """
 
 
     @abstractmethod
-    def update_word_tokens(self) -> None:
+    def update_word_tokens(self, threads: int = 1) -> None:
         """ Do house-keeping on the tokenizers internal data structures.
             Remove unused word tokens, resort data etc.
+
+            Arguments:
+                threads: Number of database connections that may be used
+                         in parallel.
         """
 
 
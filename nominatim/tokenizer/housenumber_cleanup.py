@@ -0,0 +1,150 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Removal of housenumber tokens that are no longer in use.
+
+Only housenumbers that are not simple numbers are considered. A token is
+still in use when it appears in the name vector of search_name or when
+it is one of the housenumbers of a place in placex. All work is done
+in the database with the help of auxiliary tables: candidates are
+collected first, then the references are searched for in parallel over
+ranges of place IDs and finally the unused tokens are deleted in
+parallel over ranges of word IDs.
+"""
+from typing import Optional, Tuple, cast
+import logging
+
+from nominatim.db.async_connection import WorkerPool
+from nominatim.db.connection import connect, Cursor
+from nominatim.indexer.progress import ProgressLogger
+from nominatim.tokenizer.word_frequencies import id_chunks
+
+LOG = logging.getLogger()
+
+CANDIDATES_TABLE = 'tmp_housenumber_candidates'
+REFERENCED_TABLE = 'tmp_housenumber_referenced'
+
+# Number of place IDs searched for references in one query.
+PLACE_CHUNK_SIZE = 1000000
+# Number of word IDs deleted in one transaction.
+WORD_CHUNK_SIZE = 50000
+
+
+IdRange = Tuple[Optional[int], Optional[int]]
+
+
+def _run_in_chunks(pool: WorkerPool, name: str, sql: str,
+                   id_range: IdRange, size: int) -> None:
+    """ Execute `sql` for each chunk of the range of IDs. The statement
+        gets the start and the end of the chunk as parameters.
+    """
+    min_id, max_id = id_range
+    if min_id is None or max_id is None:
+        return
+
+    chunks = list(id_chunks(min_id, max_id, size))
+    progress = ProgressLogger(name, len(chunks))
+    for start, end in chunks:
+        pool.next_free_worker().perform(sql, (start, end))
+        progress.add()
+    pool.finish_all()
+    progress.done()
+
+
+def _id_range(cur: Cursor, table: str, column: str) -> IdRange:
+    return cast(Optional[int], cur.scalar(f"SELECT min({column}) FROM {table}")), \
+           cast(Optional[int], cur.scalar(f"SELECT max({column}) FROM {table}"))
+
+
+def remove_unused_housenumbers(dsn: str, threads: int = 1) -> int:
+    """ Delete all housenumber tokens from the word table that are
+        not referenced anymore. `threads` is the number of database
+        connections to use. Returns the number of deleted tokens.
+    """
+    threads = max(1, threads)
+
+    with connect(dsn) as conn:
+        if not conn.table_exists('search_name'):
+            return 0
+
+        with conn.cursor() as cur:
+            cur.drop_table(CANDIDATES_TABLE)
+            cur.drop_table(REFERENCED_TABLE)
+            LOG.info("Collecting housenumber candidates")
+            cur.execute(f"""CREATE UNLOGGED TABLE {CANDIDATES_TABLE} AS
+                              SELECT DISTINCT word_id,
+                                     coalesce(info->>'lookup', word_token) as token
+                              FROM word
+                              WHERE type = 'H'
+                                AND (char_length(coalesce(word, word_token)) > 6
+                                     OR coalesce(word, word_token) not similar to '\\d+')
+                         """)
+            cur.execute(f"CREATE INDEX ON {CANDIDATES_TABLE}(word_id)")
+            cur.execute(f"CREATE INDEX ON {CANDIDATES_TABLE}(token)")
+            cur.execute(f"ANALYZE {CANDIDATES_TABLE}")
+            cur.execute(f"CREATE UNLOGGED TABLE {REFERENCED_TABLE} (word_id INT)")
+            num_candidates = cur.scalar(f"SELECT count(*) FROM {CANDIDATES_TABLE}")
+            search_range = _id_range(cur, 'search_name', 'place_id')
+            placex_range = _id_range(cur, 'placex', 'place_id')
+        conn.commit()
+
+        LOG.info("There are %s candidates for outdated housenumbers.", num_candidates)
+
+        if num_candidates:
+            with WorkerPool(dsn, threads) as pool:
+                _run_in_chunks(pool, 'housenumbers in search_name',
+                               f"""INSERT INTO {REFERENCED_TABLE}
+                                     SELECT DISTINCT c.word_id
+                                     FROM search_name s, unnest(s.name_vector) as v(id),
+                                          {CANDIDATES_TABLE} c
+                                     WHERE s.place_id >= %s and s.place_id < %s
+                                           and c.word_id = v.id""",
+                               search_range, PLACE_CHUNK_SIZE)
+                _run_in_chunks(pool, 'housenumbers in placex',
+                               f"""INSERT INTO {REFERENCED_TABLE}
+                                     SELECT DISTINCT c.word_id
+                                     FROM placex p,
+                                          unnest(string_to_array(p.housenumber, ';')) as h(token),
+                                          {CANDIDATES_TABLE} c
+                                     WHERE p.place_id >= %s and p.place_id < %s
+                                           and p.housenumber is not null
+                                           and (char_length(p.housenumber) > 6
+                                                or p.housenumber not similar to '\\d+')
+                                           and c.token = h.token""",
+                               placex_range, PLACE_CHUNK_SIZE)
+
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE INDEX ON {REFERENCED_TABLE}(word_id)")
+                cur.execute(f"ANALYZE {REFERENCED_TABLE}")
+                num_outdated = cast(int, cur.scalar(f"""SELECT count(DISTINCT word_id)
+                                              FROM {CANDIDATES_TABLE} c
+                                              WHERE NOT EXISTS(SELECT * FROM {REFERENCED_TABLE} r
+                                                               WHERE r.word_id = c.word_id)"""))
+                candidate_range = _id_range(cur, CANDIDATES_TABLE, 'word_id')
+            conn.commit()
+
+            LOG.info("There are %s outdated housenumbers.", num_outdated)
+
+            if num_outdated:
+                with WorkerPool(dsn, threads) as pool:
+                    _run_in_chunks(pool, 'outdated housenumbers',
+                                   f"""DELETE FROM word
+                                       WHERE word_id IN (
+                                         SELECT word_id FROM {CANDIDATES_TABLE} c
+                                         WHERE c.word_id >= %s and c.word_id < %s
+                                           and NOT EXISTS(SELECT * FROM {REFERENCED_TABLE} r
+                                                          WHERE r.word_id = c.word_id))""",
+                                   candidate_range, WORD_CHUNK_SIZE)
+        else:
+            num_outdated = 0
+
+        with conn.cursor() as cur:
+            cur.drop_table(CANDIDATES_TABLE)
+            cur.drop_table(REFERENCED_TABLE)
+        conn.commit()
+
+    return num_outdated
@@ -8,6 +8,7 @@
 Helper class to create ICU rules from a configuration file.
 """
 from typing import Mapping, Any, Dict, Optional
+from pathlib import Path
 import io
 import json
 import logging
@@ -20,6 +21,8 @@ from nominatim.db.connection import Connection
 from nominatim.errors import UsageError
 from nominatim.tokenizer.place_sanitizer import PlaceSanitizer
 from nominatim.tokenizer.icu_token_analysis import ICUTokenAnalysis
+from nominatim.tokenizer.icu_rule_snapshot import RuleSnapshot, SNAPSHOT_FILE, \
+                                                  hash_config_files, hash_analysis_rules
 from nominatim.tokenizer.token_analysis.base import AnalysisModule, Analyzer
 import nominatim.data.country_info
 
@@ -43,23 +46,41 @@ def _get_section(rules: Mapping[str, Any], section: str) -> Any:
 
 class ICURuleLoader:
     """ Compiler for ICU rules from a tokenizer configuration file.
+
+        When `snapshot_dir` is given, the compiled rules are saved in
+        a snapshot file in that directory and reused as long as the
+        configuration does not change.
     """
 
-    def __init__(self, config: Configuration) -> None:
+    def __init__(self, config: Configuration, snapshot_dir: Optional[Path] = None) -> None:
         self.config = config
-        rules = config.load_sub_configuration('icu_tokenizer.yaml',
-                                              config='TOKENIZER_CONFIG')
+        self._snapshot = RuleSnapshot(None if snapshot_dir is None
+                                      else snapshot_dir / SNAPSHOT_FILE)
+
+        files_key = None if snapshot_dir is None \
+                    else hash_config_files(config, 'icu_tokenizer.yaml', 'TOKENIZER_CONFIG')
+        compiled = self._snapshot.get_rules(files_key)
+
+        if compiled is None:
+            rules = config.load_sub_configuration('icu_tokenizer.yaml',
+                                                  config='TOKENIZER_CONFIG')
+            compiled = {'normalization': self._cfg_to_icu_rules(rules, 'normalization'),
+                        'transliteration': self._cfg_to_icu_rules(rules, 'transliteration'),
+                        'token-analysis': _get_section(rules, 'token-analysis'),
+                        # Load optional sanitizer rule set.
+                        'sanitizers': rules.get('sanitizers', [])}
+            self._snapshot.set_rules(files_key, compiled)
 
         # Make sure country information is available to analyzers and sanitizers.
         nominatim.data.country_info.setup_country_config(config)
 
-        self.normalization_rules = self._cfg_to_icu_rules(rules, 'normalization')
-        self.transliteration_rules = self._cfg_to_icu_rules(rules, 'transliteration')
-        self.analysis_rules = _get_section(rules, 'token-analysis')
+        self.normalization_rules: str = compiled['normalization']
+        self.transliteration_rules: str = compiled['transliteration']
+        self.analysis_rules = compiled['token-analysis']
         self._setup_analysis()
 
-        # Load optional sanitizer rule set.
-        self.sanitizer_rules = rules.get('sanitizers', [])
+        self.sanitizer_rules = compiled['sanitizers']
+        self._snapshot.save()
 
 
     def load_config_from_db(self, conn: Connection) -> None:
@@ -80,6 +101,7 @@ class ICURuleLoader:
         else:
             self.analysis_rules = []
         self._setup_analysis()
+        self._snapshot.save()
 
 
     def save_config_to_db(self, conn: Connection) -> None:
@@ -137,6 +159,18 @@ class ICURuleLoader:
         if not isinstance(self.analysis_rules, list):
             raise UsageError("Configuration section 'token-analysis' must be a list.")
 
+        key = hash_analysis_rules(self.normalization_rules, self.transliteration_rules,
+                                  self.analysis_rules)
+        compiled = self._snapshot.get_analysis(key)
+
+        if compiled is not None and \
+           set(compiled) == set(s.get('id', None) for s in self.analysis_rules):
+            for section in self.analysis_rules:
+                name = section.get('id', None)
+                self.analysis[name] = TokenAnalyzerRule(section, None, None, self.config,
+                                                        compiled=compiled[name])
+            return
+
         norm = Transliterator.createFromRules("rule_loader_normalization",
                                               self.normalization_rules)
         trans = Transliterator.createFromRules("rule_loader_transliteration",
@@ -154,6 +188,9 @@ class ICURuleLoader:
             self.analysis[name] = TokenAnalyzerRule(section, norm, trans,
                                                     self.config)
 
+        self._snapshot.set_analysis(key, {name: rule.config
+                                          for name, rule in self.analysis.items()})
+
 
     @staticmethod
     def _cfg_to_icu_rules(rules: Mapping[str, Any], section: str) -> str:
@@ -171,14 +208,22 @@ class ICURuleLoader:
         return ';'.join(flatten_config_list(content, section)) + ';'
 
 
+class _NotCompiled: # pylint: disable=too-few-public-methods
+    """ Marker for a rule without saved module configuration.
+    """
+
+
 class TokenAnalyzerRule:
     """ Factory for a single analysis module. The class saves the configuration
         and creates a new token analyzer on request.
+
+        When `compiled` is given, it is used as the module configuration
+        instead of configuring the module from the rules.
     """
 
     def __init__(self, rules: Mapping[str, Any],
                  normalizer: Any, transliterator: Any,
-                 config: Configuration) -> None:
+                 config: Configuration, compiled: Any = _NotCompiled) -> None:
         analyzer_name = _get_section(rules, 'analyzer')
         if not analyzer_name or not isinstance(analyzer_name, str):
             raise UsageError("'analyzer' parameter needs to be simple string")
@@ -186,8 +231,15 @@ class TokenAnalyzerRule:
         self._analysis_mod: AnalysisModule = \
             config.load_plugin_module(analyzer_name, 'nominatim.tokenizer.token_analysis')
 
-        self.config = self._analysis_mod.configure(rules, normalizer,
-                                                   transliterator)
+        if compiled is _NotCompiled:
+            self.config = self._analysis_mod.configure(rules, normalizer,
+                                                       transliterator)
+        else:
+            self.config = compiled
+
+        # Analyzers with the same fingerprint produce the same results.
+        self.fingerprint = f'{analyzer_name}:' \
+                           + json.dumps(rules, sort_keys=True, default=str)
 
 
     def create(self, normalizer: Any, transliterator: Any) -> Analyzer:
@@ -0,0 +1,147 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Snapshot of the preprocessed configuration of the ICU tokenizer.
+
+Parsing the YAML configuration and preparing the token analysis modules
+takes a considerable amount of time. The snapshot saves the results
+of these steps in the tokenizer directory of the project. Each part is
+keyed by a hash of its input, so that the snapshot is ignored as soon as
+the configuration changes.
+"""
+from typing import Optional, Dict, Any, List
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+
+from nominatim.config import Configuration
+from nominatim.errors import UsageError
+from nominatim.version import NOMINATIM_VERSION
+
+LOG = logging.getLogger()
+
+SNAPSHOT_FILE = 'icu_rules.snapshot'
+
+RE_INCLUDE = re.compile(r'!include\s+(\S+)')
+
+# Number of different setups of the token analysis kept in the snapshot.
+MAX_ANALYSIS_SETUPS = 4
+
+
+def hash_config_files(config: Configuration, filename: str, cfgname: str) -> Optional[str]:
+    """ Compute a hash over the given configuration file and all files
+        it includes. Returns None when one of the files cannot be found.
+    """
+    digest = hashlib.sha256(str(NOMINATIM_VERSION).encode('utf-8'))
+    seen = set()
+
+    try:
+        todo: List[Path] = [config.find_config_file(filename, cfgname)]
+        while todo:
+            path = todo.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            content = path.read_text(encoding='utf-8')
+            digest.update(str(path).encode('utf-8'))
+            digest.update(content.encode('utf-8'))
+            for include in RE_INCLUDE.findall(content):
+                todo.append(Path(include) if Path(include).is_absolute()
+                            else config.find_config_file(include))
+    except (UsageError, OSError):
+        return None
+
+    return digest.hexdigest()
+
+
+def hash_analysis_rules(norm_rules: str, trans_rules: str, analysis_rules: Any) -> str:
+    """ Compute a hash over the rules for the token analysis.
+    """
+    return hashlib.sha256(json.dumps([str(NOMINATIM_VERSION), norm_rules, trans_rules,
+                                      analysis_rules], sort_keys=True).encode('utf-8')
+                         ).hexdigest()
+
+
+class RuleSnapshot:
+    """ Saved configuration for the ICU rule loader. When no path is
+        given, then nothing is saved.
+    """
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = path
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        self.analysis: Dict[str, Dict[Optional[str], Any]] = {}
+        self._changed = False
+
+        if path is not None and path.is_file():
+            try:
+                with path.open('rb') as fd:
+                    data = pickle.load(fd)
+                if data.get('version') == str(NOMINATIM_VERSION):
+                    self.rules = data['rules']
+                    self.analysis = data['analysis']
+            except Exception as exc: # pylint: disable=broad-except
+                LOG.info("Ignoring unreadable rule snapshot '%s': %s", path, exc)
+
+
+    def get_rules(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """ Return the rules from the configuration file saved for the
+            given key, if any.
+        """
+        return None if key is None else self.rules.get(key)
+
+
+    def set_rules(self, key: Optional[str], rules: Dict[str, Any]) -> None:
+        """ Save the rules from the configuration file for the given key.
+            Only a single set of rules is kept.
+        """
+        if self.path is not None and key is not None:
+            self.rules = {key: rules}
+            self._changed = True
+
+
+    def get_analysis(self, key: str) -> Optional[Dict[Optional[str], Any]]:
+        """ Return the configuration of the analysis modules saved for
+            the given key, if any.
+        """
+        return self.analysis.get(key)
+
+
+    def set_analysis(self, key: str, configs: Dict[Optional[str], Any]) -> None:
+        """ Save the configuration of the analysis modules for the given key.
+        """
+        if self.path is not None:
+            self.analysis.pop(key, None)
+            self.analysis[key] = configs
+            while len(self.analysis) > MAX_ANALYSIS_SETUPS:
+                del self.analysis[next(iter(self.analysis))]
+            self._changed = True
+
+
+    def save(self) -> None:
+        """ Write the snapshot, if something has changed. Errors are
+            ignored, the snapshot is only an optimisation.
+        """
+        if self.path is None or not self._changed:
+            return
+
+        tmpfile = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        try:
+            with tmpfile.open('wb') as fd:
+                pickle.dump({'version': str(NOMINATIM_VERSION),
+                             'rules': self.rules,
+                             'analysis': self.analysis}, fd)
+            os.replace(tmpfile, self.path)
+            self._changed = False
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as exc:
+            LOG.info("Cannot save rule snapshot '%s': %s", self.path, exc)
+            if tmpfile.exists():
+                tmpfile.unlink()
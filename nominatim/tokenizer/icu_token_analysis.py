@@ -8,15 +8,74 @@
 Container class collecting all components required to transform an OSM name
 into a Nominatim token.
 """
-from typing import Mapping, Optional, TYPE_CHECKING
+from typing import Mapping, Optional, Dict, List, Tuple, Hashable, TYPE_CHECKING
 from icu import Transliterator
 
+from nominatim.data.place_name import PlaceName
+from nominatim.tokenizer.lru_cache import LRUCache
+from nominatim.tokenizer.profiling import CacheStats
 from nominatim.tokenizer.token_analysis.base import Analyzer
 
 if TYPE_CHECKING:
     from typing import Any
     from nominatim.tokenizer.icu_rule_loader import TokenAnalyzerRule # pylint: disable=cyclic-import
 
+# Maximum number of entries in the caches for canonical IDs and variants.
+MEMO_SIZE = 100000
+
+# The results of the token analysis are memoized in caches that are shared
+# by all analyzers of the process. The keys start with a number that
+# identifies the rules of the analyzer.
+_RULE_IDS: Dict[str, int] = {}
+_CANONICAL_IDS: LRUCache[Tuple[Hashable, ...], str] = LRUCache(MEMO_SIZE)
+_VARIANTS: LRUCache[Tuple[int, str], List[str]] = LRUCache(MEMO_SIZE)
+
+
+def memo_stats() -> Dict[str, CacheStats]:
+    """ Return the hit and miss statistics of the shared caches for
+        the results of the token analysis.
+    """
+    return {'canonical ids': _CANONICAL_IDS.stats, 'variants': _VARIANTS.stats}
+
+
+class _MemoizedAnalyzer:
+    """ Wrapper around a token analyzer that remembers the results of
+        previous calls in the shared caches.
+    """
+
+    def __init__(self, rule_id: int, analyzer: Analyzer) -> None:
+        self.rule_id = rule_id
+        self.analyzer = analyzer
+
+
+    def get_canonical_id(self, name: PlaceName) -> str:
+        """ Return the canonical form of the given name.
+        """
+        # Analyzers may take all properties of the name into account.
+        key = (self.rule_id, name.name, name.kind, name.suffix,
+               tuple(sorted(name.attr.items())))
+        canonical_id = _CANONICAL_IDS.get(key)
+        if canonical_id is None:
+            canonical_id = self.analyzer.get_canonical_id(name)
+            _CANONICAL_IDS[key] = canonical_id
+
+        return canonical_id
+
+
+    def compute_variants(self, canonical_id: str) -> List[str]:
+        """ Compute the transliterated spelling variants for the given
+            canonical ID.
+        """
+        key = (self.rule_id, canonical_id)
+        variants = _VARIANTS.get(key)
+        if variants is None:
+            variants = self.analyzer.compute_variants(canonical_id)
+            _VARIANTS[key] = variants
+
+        # Return a copy, the cached list must not be changed by the caller.
+        return list(variants)
+
+
 class ICUTokenAnalysis:
     """ Container class collecting the transliterators and token analysis
         modules for a single Analyser instance.
@@ -32,8 +91,12 @@ class ICUTokenAnalysis:
         self.search = Transliterator.createFromRules("icu_search",
                                                      norm_rules + trans_rules)
 
-        self.analysis = {name: arules.create(self.normalizer, self.to_ascii)
-                         for name, arules in analysis_rules.items()}
+        self.analysis: Dict[Optional[str], Analyzer] = {}
+        for name, arules in analysis_rules.items():
+            fingerprint = '\n'.join((norm_rules, trans_rules, arules.fingerprint))
+            rule_id = _RULE_IDS.setdefault(fingerprint, len(_RULE_IDS))
+            self.analysis[name] = _MemoizedAnalyzer(
+                                      rule_id, arules.create(self.normalizer, self.to_ascii))
 
 
     def get_analyzer(self, name: Optional[str]) -> Analyzer:
@@ -0,0 +1,351 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+In-memory token cache of the ICU name analyzer and the lookup of the
+words of a batch of places that are not yet in the cache.
+"""
+from typing import Optional, Sequence, List, Tuple, Dict, cast
+import json
+import logging
+
+from nominatim.db.connection import Connection, Cursor
+from nominatim.data.place_name import PlaceName
+from nominatim.tokenizer.icu_token_analysis import ICUTokenAnalysis
+from nominatim.tokenizer.profiling import CacheStats
+from nominatim.tokenizer.lru_cache import LRUCache
+from nominatim.tokenizer import token_cache_file as tcf
+
+LOG = logging.getLogger()
+
+
+class TokenCache:
+    """ Cache for token information to avoid repeated database queries.
+
+        Each of the caches holds at most `maxsize` entries, the least
+        recently used entries are dropped first. A size of 0 means that
+        the caches may grow without limit.
+
+        `preload` sets the number of frequent words that the analyzer
+        loads into the cache before the first place is processed.
+
+        This cache is not thread-safe and needs to be instantiated per
+        analyzer.
+    """
+    def __init__(self, maxsize: int = 0, preload: int = 0) -> None:
+        self.preload_limit = preload
+        self.names: LRUCache[str, Tuple[int, List[int]]] = LRUCache(maxsize)
+        self.partials: LRUCache[str, int] = LRUCache(maxsize)
+        self.fulls: LRUCache[str, List[int]] = LRUCache(maxsize)
+        self.postcodes: LRUCache[str, bool] = LRUCache(maxsize)
+        self.housenumbers: LRUCache[str, Tuple[Optional[int], Optional[str]]] \
+            = LRUCache(maxsize)
+
+
+    @property
+    def stats(self) -> Dict[str, CacheStats]:
+        """ Hit and miss statistics of the different caches.
+        """
+        return {'names': self.names.stats,
+                'partials': self.partials.stats,
+                'fulls': self.fulls.stats,
+                'postcodes': self.postcodes.stats,
+                'housenumbers': self.housenumbers.stats}
+
+
+    def preload(self, conn: Connection, limit: int) -> None:
+        """ Fill the caches for partial and full words as well as the cache
+            for full names with the `limit` most frequent words of each kind
+            from the word table. Names whose partial words are not all
+            in the word table are left out.
+        """
+        for cache in (self.partials, self.fulls, self.names):
+            if cache.maxsize > 0:
+                limit = min(limit, cache.maxsize)
+
+        with conn.cursor() as cur:
+            # Least frequent words come first, so that the most frequent
+            # ones end up as the most recently used entries.
+            cur.execute("""SELECT * FROM
+                             (SELECT word_token, min(word_id) as word_id,
+                                     max((info->>'count')::int) as count
+                              FROM word WHERE type = 'w' GROUP BY word_token
+                              ORDER BY count DESC NULLS LAST LIMIT %s) partials
+                           ORDER BY count ASC NULLS FIRST""", (limit, ))
+            for word_token, word_id, _ in cur:
+                self.partials[word_token] = word_id
+            num_partials = cur.rowcount
+
+            cur.execute("""SELECT * FROM
+                             (SELECT word_token, array_agg(word_id) as word_ids,
+                                     max((info->>'count')::int) as count
+                              FROM word WHERE type = 'W' GROUP BY word_token
+                              ORDER BY count DESC NULLS LAST LIMIT %s) fulls
+                           ORDER BY count ASC NULLS FIRST""", (limit, ))
+            for word_token, word_ids, _ in cur:
+                self.fulls[word_token] = word_ids
+            num_fulls = cur.rowcount
+
+            # Full names are saved with their canonical form in the 'word'
+            # column. The partial words are those of all variants,
+            # like in getorcreate_full_word().
+            cur.execute("""SELECT word, full_id, partials FROM
+                             (SELECT word, min(word_id) as full_id,
+                                     array_agg(word_token) as tokens,
+                                     max((info->>'count')::int) as count
+                              FROM word WHERE type = 'W' and word is not null
+                              GROUP BY word
+                              ORDER BY count DESC NULLS LAST LIMIT %s) fulls,
+                             LATERAL (SELECT array_agg((SELECT min(w.word_id) FROM word w
+                                                        WHERE w.type = 'w'
+                                                              and w.word_token = term))
+                                               as partials
+                                      FROM (SELECT DISTINCT trim(term) as term
+                                            FROM unnest(tokens) as t,
+                                                 unnest(string_to_array(t, ' ')) as term
+                                            WHERE trim(term) != '') terms) p
+                           ORDER BY count ASC NULLS FIRST""", (limit, ))
+            num_names = 0
+            for word, full_id, partials in cur:
+                if partials and None not in partials:
+                    self.names[word] = (full_id, partials)
+                    num_names += 1
+
+        self.preload_limit = 0
+        LOG.info("Preloaded %d partial words, %d full words and %d names"
+                 " into the token cache.", num_partials, num_fulls, num_names)
+
+
+class TokenPrefetch: # pylint: disable=too-many-instance-attributes
+    """ Collects the words of a batch of sanitized places that are neither
+        in the token cache nor in the persistent cache file and looks
+        them up in the word table with a single query for each kind
+        of word.
+
+        Dictionaries keep the order in which the words appear, so that
+        new words get their IDs in a predictable order.
+
+        Words missing from the token cache are counted as cache misses
+        here, the later lookups of the analyzer for them are not counted.
+    """
+    def __init__(self, cache: TokenCache, cache_file: Optional[tcf.TokenCacheFile],
+                 token_analysis: ICUTokenAnalysis) -> None:
+        self.cache = cache
+        self.cache_file = cache_file
+        self.token_analysis = token_analysis
+        self.hnr_analyzer = token_analysis.analysis.get('@housenumber')
+
+        self.full_names: Dict[str, List[str]] = {}
+        self.partials: Dict[str, None] = {}
+        self.streets: Dict[str, None] = {}
+        self.housenumbers: Dict[str, None] = {}
+        self.analyzed_housenumbers: Dict[str, List[str]] = {}
+
+
+    def _search_normalized(self, name: str) -> str:
+        return cast(str, self.token_analysis.search.transliterate(name)).strip()
+
+
+    def add_place(self, names: Sequence[PlaceName], address: Sequence[PlaceName]) -> None:
+        """ Remember all words of the given sanitized place that need
+            to be looked up.
+        """
+        for name in names:
+            self.add_name(name)
+
+        for item in address:
+            if item.kind == 'housenumber':
+                self.add_housenumber(item)
+            elif item.kind == 'street':
+                self.add_street(item)
+            elif not item.kind.startswith('_') and not item.suffix and \
+                 item.kind not in ('postcode', 'country', 'full', 'inclusion'):
+                self.add_partials(item)
+
+
+    def add_name(self, name: PlaceName) -> None:
+        """ Remember the full name and its variants.
+        """
+        analyzer_id = name.get_attr('analyzer')
+        analyzer = self.token_analysis.get_analyzer(analyzer_id)
+        word_id = analyzer.get_canonical_id(name)
+        token_id = word_id if analyzer_id is None else f'{word_id}@{analyzer_id}'
+        if token_id not in self.full_names and not self.cache.names.lookup(token_id):
+            variants = analyzer.compute_variants(word_id)
+            if variants and not self._name_from_cache_file(token_id, variants):
+                self.full_names[token_id] = variants
+
+
+    def add_housenumber(self, item: PlaceName) -> None:
+        """ Remember the housenumber, either normalized or as computed
+            by the housenumber analyzer.
+        """
+        if self.hnr_analyzer is None:
+            norm_name = self._search_normalized(item.name)
+            if norm_name and norm_name not in self.housenumbers \
+               and not self.cache.housenumbers.lookup(norm_name) \
+               and not self._from_cache_file(tcf.HOUSENUMBER, norm_name):
+                self.housenumbers[norm_name] = None
+        else:
+            word_id = self.hnr_analyzer.get_canonical_id(item)
+            if word_id and word_id not in self.analyzed_housenumbers \
+               and not self.cache.housenumbers.lookup(word_id):
+                variants = self.hnr_analyzer.compute_variants(word_id)
+                if variants and not self._from_cache_file(tcf.ANALYZED_HOUSENUMBER,
+                                                          word_id, variants[0]):
+                    self.analyzed_housenumbers[word_id] = variants
+
+
+    def add_street(self, item: PlaceName) -> None:
+        """ Remember the street name for the lookup of its full words.
+        """
+        norm_name = self._search_normalized(item.name)
+        if norm_name not in self.streets and not self.cache.fulls.lookup(norm_name) \
+           and not self._from_cache_file(tcf.FULL, norm_name):
+            self.streets[norm_name] = None
+
+
+    def add_partials(self, item: PlaceName) -> None:
+        """ Remember the partial words of an address term.
+        """
+        for partial in self._search_normalized(item.name).split():
+            if partial not in self.partials and not self.cache.partials.lookup(partial) \
+               and not self._from_cache_file(tcf.PARTIAL, partial):
+                self.partials[partial] = None
+
+
+    def fetch(self, cur: Cursor) -> None:
+        """ Look up all remembered words in the word table, creating them
+            where necessary, and add them to the caches.
+        """
+        if self.full_names:
+            self._fetch_full_names(cur)
+        if self.partials:
+            self._fetch_partials(cur)
+        if self.streets:
+            self._fetch_streets(cur)
+        if self.housenumbers:
+            self._fetch_housenumbers(cur)
+        if self.analyzed_housenumbers:
+            self._fetch_analyzed_housenumbers(cur)
+
+
+    def _fetch_full_names(self, cur: Cursor) -> None:
+        cur.execute("""SELECT item->>0, w.*
+                       FROM jsonb_array_elements(%s::jsonb) as item,
+                            LATERAL getorcreate_full_word(
+                              item->>0,
+                              ARRAY(SELECT jsonb_array_elements_text(item->1))) as w
+                    """, (json.dumps(list(self.full_names.items())), ))
+        for token_id, full, part in cur:
+            self.cache.names[token_id] = (full, part)
+            self._add_name_to_cache_file(token_id, self.full_names[token_id], full)
+
+
+    def _fetch_partials(self, cur: Cursor) -> None:
+        cur.execute("""SELECT word, getorcreate_partial_word(word)
+                       FROM unnest(%s) word""",
+                    (list(self.partials), ))
+        for partial, token in cur:
+            self.cache.partials[partial] = token
+            self._add_to_cache_file(tcf.PARTIAL, partial, [token])
+
+
+    def _fetch_streets(self, cur: Cursor) -> None:
+        cur.execute("""SELECT word_token, array_agg(word_id) FROM word
+                       WHERE word_token = any(%s) and type = 'W'
+                       GROUP BY word_token""",
+                    (list(self.streets), ))
+        missing = dict(self.streets)
+        for norm_name, full in cur:
+            self.cache.fulls[norm_name] = full
+            self._add_to_cache_file(tcf.FULL, norm_name, full)
+            del missing[norm_name]
+        # Remember that the remaining names have no full word.
+        for norm_name in missing:
+            self.cache.fulls[norm_name] = []
+
+
+    def _fetch_housenumbers(self, cur: Cursor) -> None:
+        cur.execute("""SELECT hnr, getorcreate_hnr_id(hnr)
+                       FROM unnest(%s) hnr""",
+                    (list(self.housenumbers), ))
+        for norm_name, hid in cur:
+            self.cache.housenumbers[norm_name] = (hid, norm_name)
+            self._add_to_cache_file(tcf.HOUSENUMBER, norm_name, [hid])
+
+
+    def _fetch_analyzed_housenumbers(self, cur: Cursor) -> None:
+        cur.execute("""SELECT item->>0, create_analyzed_hnr_id(
+                         item->>0, ARRAY(SELECT jsonb_array_elements_text(item->1)))
+                       FROM jsonb_array_elements(%s::jsonb) as item
+                    """, (json.dumps(list(self.analyzed_housenumbers.items())), ))
+        for word_id, hid in cur:
+            self.cache.housenumbers[word_id] = (hid, self.analyzed_housenumbers[word_id][0])
+            self._add_to_cache_file(tcf.ANALYZED_HOUSENUMBER, word_id, [hid])
+
+
+    def _from_cache_file(self, kind: str, key: str, lookup: Optional[str] = None) -> bool:
+        """ Copy the entry for the given key from the persistent cache
+            into the token cache. Returns False, when the persistent cache
+            does not have the entry.
+        """
+        if self.cache_file is None:
+            return False
+
+        ids = self.cache_file.get(kind, key)
+        if ids is None:
+            return False
+
+        if kind == tcf.PARTIAL:
+            self.cache.partials[key] = ids[0]
+        elif kind == tcf.FULL:
+            self.cache.fulls[key] = ids
+        else:
+            self.cache.housenumbers[key] = (ids[0], lookup or key)
+
+        return True
+
+
+    def _name_from_cache_file(self, token_id: str, variants: Sequence[str]) -> bool:
+        """ Assemble the tokens for a full name from the persistent cache.
+            Works like the SQL function getorcreate_full_word(). Returns
+            False, when the full word or one of its partials are unknown.
+        """
+        if self.cache_file is None:
+            return False
+
+        full = self.cache_file.get(tcf.NAME, token_id)
+        if full is None:
+            return False
+
+        partials: List[int] = []
+        for term in dict.fromkeys(t for v in variants for t in v.split(' ') if t):
+            ids = self.cache_file.get(tcf.PARTIAL, term)
+            if ids is None:
+                return False
+            if ids[0] not in partials:
+                partials.append(ids[0])
+
+        self.cache.names[token_id] = (full[0], partials)
+        return True
+
+
+    def _add_to_cache_file(self, kind: str, key: str, ids: Sequence[int]) -> None:
+        if self.cache_file is not None:
+            self.cache_file.add(kind, key, ids)
+
+
+    def _add_name_to_cache_file(self, token_id: str, variants: Sequence[str],
+                                full: int) -> None:
+        if self.cache_file is not None:
+            self.cache_file.add(tcf.NAME, token_id, [full])
+            # The full word may be new, so the lists of full words for
+            # its variants need to be extended as well.
+            for variant in variants:
+                existing = self.cache_file.get(tcf.FULL, variant)
+                if existing is not None and full not in existing:
+                    self.cache_file.add(tcf.FULL, variant, existing + [full])
@@ -9,7 +9,7 @@ Tokenizer implementing normalisation as used before Nominatim 4 but using
 libICU instead of the PostgreSQL module.
 """
 from typing import Optional, Sequence, List, Tuple, Mapping, Any, cast, \
-                   Dict, Set, Iterable
+                   Dict, Set, Iterable, Type
 import itertools
 import json
 import logging
@@ -24,8 +24,13 @@ from nominatim.data.place_info import PlaceInfo
 from nominatim.tokenizer.icu_rule_loader import ICURuleLoader
 from nominatim.tokenizer.place_sanitizer import PlaceSanitizer
 from nominatim.data.place_name import PlaceName
-from nominatim.tokenizer.icu_token_analysis import ICUTokenAnalysis
+from nominatim.tokenizer.icu_token_analysis import ICUTokenAnalysis, memo_stats
 from nominatim.tokenizer.base import AbstractAnalyzer, AbstractTokenizer
+from nominatim.tokenizer.icu_token_cache import TokenCache, TokenPrefetch
+from nominatim.tokenizer.profiling import AnalyzerProfile, make_timed_cursor
+from nominatim.tokenizer import token_cache_file as tcf
+from nominatim.tokenizer.word_frequencies import update_word_frequencies
+from nominatim.tokenizer.housenumber_cleanup import remove_unused_housenumbers
 
 DBCFG_TERM_NORMALIZATION = "tokenizer_term_normalization"
 
@@ -55,7 +60,7 @@ class ICUTokenizer(AbstractTokenizer):
             This copies all necessary data in the project directory to make
             sure the tokenizer remains stable even over updates.
         """
-        self.loader = ICURuleLoader(config)
+        self.loader = ICURuleLoader(config, snapshot_dir=self.data_dir)
 
         self._install_php(config.lib_dir.php, overwrite=True)
         self._save_config()
@@ -68,7 +73,7 @@ class ICUTokenizer(AbstractTokenizer):
     def init_from_project(self, config: Configuration) -> None:
         """ Initialise the tokenizer from the project directory.
         """
-        self.loader = ICURuleLoader(config)
+        self.loader = ICURuleLoader(config, snapshot_dir=self.data_dir)
 
         with connect(self.dsn) as conn:
             self.loader.load_config_from_db(conn)
@@ -83,6 +88,7 @@ class ICUTokenizer(AbstractTokenizer):
         with connect(self.dsn) as conn:
             sqlp = SQLPreprocessor(conn, config)
             sqlp.run_sql_file(conn, 'tokenizer/legacy_tokenizer_indices.sql')
+            self._update_token_cache_file(conn, config)
 
 
     def update_sql_functions(self, config: Configuration) -> None:
@@ -100,66 +106,38 @@ class ICUTokenizer(AbstractTokenizer):
         self.init_from_project(config)
 
 
-    def update_statistics(self) -> None:
+    def update_statistics(self, threads: int = 1) -> None:
         """ Recompute frequencies for all name words.
         """
-        with connect(self.dsn) as conn:
-            if conn.table_exists('search_name'):
-                with conn.cursor() as cur:
-                    cur.drop_table("word_frequencies")
-                    LOG.info("Computing word frequencies")
-                    cur.execute("""CREATE TEMP TABLE word_frequencies AS
-                                     SELECT unnest(name_vector) as id, count(*)
-                                     FROM search_name GROUP BY id""")
-                    cur.execute("CREATE INDEX ON word_frequencies(id)")
-                    LOG.info("Update word table with recomputed frequencies")
-                    cur.execute("""UPDATE word
+        update_word_frequencies(self.dsn,
+                                """UPDATE word
                                    SET info = info || jsonb_build_object('count', count)
-                                   FROM word_frequencies WHERE word_id = id""")
-                    cur.drop_table("word_frequencies")
-            conn.commit()
+                                   FROM word_frequencies
+                                   WHERE word_id = id and id >= %s and id < %s""",
+                                threads=threads)
+
+        with connect(self.dsn) as conn:
+            if self.loader is not None:
+                self._update_token_cache_file(conn, self.loader.config)
 
 
-    def _cleanup_housenumbers(self) -> None:
+    def _cleanup_housenumbers(self, threads: int) -> None:
         """ Remove unused house numbers.
         """
-        with connect(self.dsn) as conn:
-            if not conn.table_exists('search_name'):
-                return
-            with conn.cursor(name="hnr_counter") as cur:
-                cur.execute("""SELECT DISTINCT word_id, coalesce(info->>'lookup', word_token)
-                               FROM word
-                               WHERE type = 'H'
-                                 AND NOT EXISTS(SELECT * FROM search_name
-                                                WHERE ARRAY[word.word_id] && name_vector)
-                                 AND (char_length(coalesce(word, word_token)) > 6
-                                      OR coalesce(word, word_token) not similar to '\\d+')
-                            """)
-                candidates = {token: wid for wid, token in cur}
-            with conn.cursor(name="hnr_counter") as cur:
-                cur.execute("""SELECT housenumber FROM placex
-                               WHERE housenumber is not null
-                                     AND (char_length(housenumber) > 6
-                                          OR housenumber not similar to '\\d+')
-                            """)
-                for row in cur:
-                    for hnr in row[0].split(';'):
-                        candidates.pop(hnr, None)
-            LOG.info("There are %s outdated housenumbers.", len(candidates))
-            LOG.debug("Outdated housenumbers: %s", candidates.keys())
-            if candidates:
-                with conn.cursor() as cur:
-                    cur.execute("""DELETE FROM word WHERE word_id = any(%s)""",
-                                (list(candidates.values()), ))
-                conn.commit()
-
-
-
-    def update_word_tokens(self) -> None:
+        if remove_unused_housenumbers(self.dsn, threads=threads) > 0:
+            with connect(self.dsn) as conn:
+                # The cache file may still contain the deleted housenumbers.
+                if self.loader is None:
+                    tcf.invalidate_cache_file(conn, self.data_dir)
+                else:
+                    self._update_token_cache_file(conn, self.loader.config)
+
+
+    def update_word_tokens(self, threads: int = 1) -> None:
         """ Remove unused tokens.
         """
         LOG.warning("Cleaning up housenumber tokens.")
-        self._cleanup_housenumbers()
+        self._cleanup_housenumbers(threads)
         LOG.warning("Tokenizer house-keeping done.")
 
 
@@ -179,8 +157,13 @@ class ICUTokenizer(AbstractTokenizer):
             Analyzers are not thread-safe. You need to instantiate one per thread.
         """
         assert self.loader is not None
+        config = self.loader.config
         return ICUNameAnalyzer(self.dsn, self.loader.make_sanitizer(),
-                               self.loader.make_token_analysis())
+                               self.loader.make_token_analysis(),
+                               cache=TokenCache(config.get_int('TOKENIZER_CACHE_SIZE'),
+                                                config.get_int('TOKENIZER_CACHE_PRELOAD')),
+                               cache_dir=self.data_dir
+                                         if config.get_bool('TOKENIZER_CACHE_FILE') else None)
 
 
     def _install_php(self, phpdir: Path, overwrite: bool = True) -> None:
@@ -215,6 +198,18 @@ class ICUTokenizer(AbstractTokenizer):
             sqlp = SQLPreprocessor(conn, config)
             sqlp.run_sql_file(conn, 'tokenizer/icu_tokenizer_tables.sql')
             conn.commit()
+            tcf.invalidate_cache_file(conn, self.data_dir)
+
+
+    def _update_token_cache_file(self, conn: Connection, config: Configuration) -> None:
+        """ Recreate the persistent token cache from the word table, when
+            it is enabled. Otherwise remove any outdated cache.
+        """
+        if config.get_bool('TOKENIZER_CACHE_FILE'):
+            LOG.info("Writing token cache file.")
+            tcf.write_cache_file(conn, self.data_dir)
+        else:
+            tcf.invalidate_cache_file(conn, self.data_dir)
 
 
 class ICUNameAnalyzer(AbstractAnalyzer):
@@ -225,23 +220,66 @@ class ICUNameAnalyzer(AbstractAnalyzer):
     """
 
     def __init__(self, dsn: str, sanitizer: PlaceSanitizer,
-                 token_analysis: ICUTokenAnalysis) -> None:
+                 token_analysis: ICUTokenAnalysis,
+                 cache: Optional[TokenCache] = None,
+                 cache_dir: Optional[Path] = None) -> None:
         self.conn: Optional[Connection] = connect(dsn).connection
         self.conn.autocommit = True
         self.sanitizer = sanitizer
         self.token_analysis = token_analysis
 
-        self._cache = _TokenCache()
+        self._cache = cache or TokenCache()
+        # Persistent cache shared with other analyzers.
+        self._cache_file = None if cache_dir is None \
+                           else tcf.TokenCacheFile.load(self.conn, cache_dir)
+        self.profile: Optional[AnalyzerProfile] = None
+        self._cursor_class: Type[Cursor] = Cursor
 
 
     def close(self) -> None:
         """ Free all resources used by the analyzer.
         """
+        if self._cache_file is not None:
+            # Words from a dry run are rolled back and must not be saved.
+            self._cache_file.close(flush=self.profile is None or not self.profile.dry_run)
+            self._cache_file = None
         if self.conn:
             self.conn.close()
             self.conn = None
 
 
+    def enable_profiling(self, dry_run: bool = False) -> AnalyzerProfile:
+        """ Start collecting performance statistics. The time for
+            processing places is split into the time used by the sanitizers
+            and the time used for looking up and creating words in the
+            word table. The time spent with the token analysis is the
+            remainder.
+
+            A dry run does not commit any changes to the word table.
+
+            The statistics for the memoized results of the token analysis
+            cover all analyzers of the process.
+        """
+        assert self.conn is not None
+        self.profile = AnalyzerProfile(dry_run=dry_run)
+        self.profile.caches.update(self._cache.stats)
+        self.profile.caches.update(memo_stats())
+        self._cursor_class = make_timed_cursor(self.profile, 'word lookup')
+        if dry_run:
+            # Changes are rolled back when the connection is closed.
+            self.conn.autocommit = False
+
+        return self.profile
+
+
+    def _word_cursor(self) -> Cursor:
+        """ Return a cursor for accessing the word table during
+            place processing.
+        """
+        assert self.conn is not None
+        return self.conn.cursor(cursor_factory=self._cursor_class)
+
+
     def _search_normalized(self, name: str) -> str:
         """ Return the search token transliteration of the given name.
         """
@@ -471,7 +509,7 @@ class ICUNameAnalyzer(AbstractAnalyzer):
             if norm_name:
                 word_tokens.add(norm_name)
 
-        with self.conn.cursor() as cur:
+        with self._word_cursor() as cur:
             # Get existing names
             cur.execute("""SELECT word_token, coalesce(info ? 'internal', false) as is_internal
                              FROM word
@@ -517,21 +555,59 @@ class ICUNameAnalyzer(AbstractAnalyzer):
             Returns a JSON-serializable structure that will be handed into
             the database via the token_info field.
         """
-        token_info = _TokenInfo()
+        return self.process_places([place])[0]
+
+
+    def process_places(self, places: Sequence[PlaceInfo]) -> List[Dict[str, Any]]:
+        """ Determine tokenizer information for a batch of places.
+
+            All words of the places that are not yet known to the cache
+            are looked up in the word table together, before the token
+            information for the single places is computed.
+        """
+        if self._cache.preload_limit > 0:
+            assert self.conn is not None
+            self._cache.preload(self.conn, self._cache.preload_limit)
+
+        if self.profile is None:
+            sanitized = [self.sanitizer.process_names(place) for place in places]
+        else:
+            sanitized = [self.profile.timed('sanitizer', self.sanitizer.process_names, place)
+                         for place in places]
+
+        self._prefetch_tokens(sanitized)
+
+        results = []
+        for place, (names, address) in zip(places, sanitized):
+            token_info = _TokenInfo()
+
+            if names:
+                token_info.set_names(*self._compute_name_tokens(names))
 
-        names, address = self.sanitizer.process_names(place)
+                if place.is_country():
+                    assert place.country_code is not None
+                    self._add_country_full_names(place.country_code, names)
 
-        if names:
-            token_info.set_names(*self._compute_name_tokens(names))
+            if address:
+                self._process_place_address(token_info, address)
 
-            if place.is_country():
-                assert place.country_code is not None
-                self._add_country_full_names(place.country_code, names)
+            results.append(token_info.to_dict())
 
-        if address:
-            self._process_place_address(token_info, address)
+        return results
 
-        return token_info.to_dict()
+
+    def _prefetch_tokens(self,
+                         places: Sequence[Tuple[List[PlaceName], List[PlaceName]]]) -> None:
+        """ Look up the words of the given sanitized places that are not
+            yet in the cache and add them to the cache. There is a single
+            query for each type of word.
+        """
+        prefetch = TokenPrefetch(self._cache, self._cache_file, self.token_analysis)
+        for names, address in places:
+            prefetch.add_place(names, address)
+
+        with self._word_cursor() as cur:
+            prefetch.fetch(cur)
 
 
     def _process_place_address(self, token_info: '_TokenInfo',
@@ -565,7 +641,7 @@ class ICUNameAnalyzer(AbstractAnalyzer):
             if norm_name:
                 result = self._cache.housenumbers.get(norm_name, result)
                 if result[0] is None:
-                    with self.conn.cursor() as cur:
+                    with self._word_cursor() as cur:
                         hid = cur.scalar("SELECT getorcreate_hnr_id(%s)", (norm_name, ))
 
                         result = hid, norm_name
@@ -580,7 +656,7 @@ class ICUNameAnalyzer(AbstractAnalyzer):
                 if result[0] is None:
                     variants = analyzer.compute_variants(word_id)
                     if variants:
-                        with self.conn.cursor() as cur:
+                        with self._word_cursor() as cur:
                             hid = cur.scalar("SELECT create_analyzed_hnr_id(%s, %s)",
                                              (word_id, list(variants)))
                             result = hid, variants[0]
@@ -606,7 +682,7 @@ class ICUNameAnalyzer(AbstractAnalyzer):
                 need_lookup.append(partial)
 
         if need_lookup:
-            with self.conn.cursor() as cur:
+            with self._word_cursor() as cur:
                 cur.execute("""SELECT word, getorcreate_partial_word(word)
                                FROM unnest(%s) word""",
                             (need_lookup, ))
@@ -627,10 +703,11 @@ class ICUNameAnalyzer(AbstractAnalyzer):
         norm_name = self._search_normalized(name)
 
         # return cached if possible
-        if norm_name in self._cache.fulls:
-            return self._cache.fulls[norm_name]
+        cached = self._cache.fulls.get(norm_name)
+        if cached is not None:
+            return cached
 
-        with self.conn.cursor() as cur:
+        with self._word_cursor() as cur:
             cur.execute("SELECT word_id FROM word WHERE word_token = %s and type = 'W'",
                         (norm_name, ))
             full = [row[0] for row in cur]
@@ -663,7 +740,7 @@ class ICUNameAnalyzer(AbstractAnalyzer):
                 if not variants:
                     continue
 
-                with self.conn.cursor() as cur:
+                with self._word_cursor() as cur:
                     cur.execute("SELECT * FROM getorcreate_full_word(%s, %s)",
                                 (token_id, variants))
                     full, part = cast(Tuple[int, List[int]], cur.fetchone())
@@ -696,7 +773,7 @@ class ICUNameAnalyzer(AbstractAnalyzer):
         else:
             postcode = postcode_name
 
-        if postcode not in self._cache.postcodes:
+        if self._cache.postcodes.get(postcode) is None:
             term = self._search_normalized(postcode_name)
             if not term:
                 return None
@@ -705,10 +782,10 @@ class ICUNameAnalyzer(AbstractAnalyzer):
             if analyzer is not None and variant_base:
                 variants.update(analyzer.compute_variants(variant_base))
 
-            with self.conn.cursor() as cur:
+            with self._word_cursor() as cur:
                 cur.execute("SELECT create_postcode_word(%s, %s)",
                             (postcode, list(variants)))
-            self._cache.postcodes.add(postcode)
+            self._cache.postcodes[postcode] = True
 
         return postcode_name
 
@@ -797,17 +874,3 @@ class _TokenInfo:
         """ Set the postcode to the given one.
         """
         self.postcode = postcode
-
-
-class _TokenCache:
-    """ Cache for token information to avoid repeated database queries.
-
-        This cache is not thread-safe and needs to be instantiated per
-        analyzer.
-    """
-    def __init__(self) -> None:
-        self.names: Dict[str, Tuple[int, List[int]]] = {}
-        self.partials: Dict[str, int] = {}
-        self.fulls: Dict[str, List[int]] = {}
-        self.postcodes: Set[str] = set()
-        self.housenumbers: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
@@ -28,6 +28,7 @@ from nominatim.db.sql_preprocessor import SQLPreprocessor
 from nominatim.data.place_info import PlaceInfo
 from nominatim.errors import UsageError
 from nominatim.tokenizer.base import AbstractAnalyzer, AbstractTokenizer
+from nominatim.tokenizer.word_frequencies import update_word_frequencies
 
 DBCFG_NORMALIZATION = "tokenizer_normalization"
 DBCFG_MAXWORDFREQ = "tokenizer_maxwordfreq"
@@ -210,27 +211,18 @@ class LegacyTokenizer(AbstractTokenizer):
             self._save_config(conn, config)
 
 
-    def update_statistics(self) -> None:
+    def update_statistics(self, threads: int = 1) -> None:
         """ Recompute the frequency of full words.
         """
-        with connect(self.dsn) as conn:
-            if conn.table_exists('search_name'):
-                with conn.cursor() as cur:
-                    cur.drop_table("word_frequencies")
-                    LOG.info("Computing word frequencies")
-                    cur.execute("""CREATE TEMP TABLE word_frequencies AS
-                                     SELECT unnest(name_vector) as id, count(*)
-                                     FROM search_name GROUP BY id""")
-                    cur.execute("CREATE INDEX ON word_frequencies(id)")
-                    LOG.info("Update word table with recomputed frequencies")
-                    cur.execute("""UPDATE word SET search_name_count = count
+        update_word_frequencies(self.dsn,
+                                """UPDATE word SET search_name_count = count
                                    FROM word_frequencies
-                                   WHERE word_token like ' %' and word_id = id""")
-                    cur.drop_table("word_frequencies")
-            conn.commit()
+                                   WHERE word_token like ' %%' and word_id = id
+                                         and id >= %s and id < %s""",
+                                threads=threads)
 
 
-    def update_word_tokens(self) -> None:
+    def update_word_tokens(self, threads: int = 1) -> None:
         """ No house-keeping implemented for the legacy tokenizer.
         """
         LOG.info("No tokenizer clean-up available.")
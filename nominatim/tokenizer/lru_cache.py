@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Size-bounded cache with least-recently-used eviction.
+"""
+from typing import TypeVar, Generic, Optional, Set, Union, overload
+from collections import OrderedDict
+
+from nominatim.tokenizer.profiling import CacheStats
+
+K = TypeVar('K')
+V = TypeVar('V')
+T = TypeVar('T')
+
+class LRUCache(Generic[K, V]):
+    """ Mapping that holds at most `maxsize` entries. When the cache
+        is full, the entry that has not been accessed for the longest
+        time is dropped. A `maxsize` of 0 disables the limit.
+
+        Lookups with `get()` are counted in `stats`. When the entries are
+        fetched ahead of time, `lookup()` must be used to check for them,
+        so that the following `get()` is not counted as a hit.
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self.evictions = 0
+        self._data: 'OrderedDict[K, V]' = OrderedDict()
+        self._prefetched: Set[K] = set()
+
+
+    @overload
+    def get(self, key: K) -> Optional[V]: ...
+
+    @overload
+    def get(self, key: K, default: T) -> Union[V, T]: ...
+
+    def get(self, key: K, default: Optional[T] = None) -> Union[V, T, None]:
+        """ Return the value for the given key or `default` when the key
+            is not in the cache.
+        """
+        counted = key in self._prefetched
+        if counted:
+            self._prefetched.discard(key)
+
+        try:
+            value = self._data[key]
+        except KeyError:
+            if not counted:
+                self.stats.record(False)
+            return default
+
+        self._data.move_to_end(key)
+        if not counted:
+            self.stats.record(True)
+        return value
+
+
+    def lookup(self, key: K) -> bool:
+        """ Check if the key is in the cache in preparation of a later
+            `get()`. A missing key is counted as a miss right away and
+            the next `get()` for the key is then not counted again.
+        """
+        if key in self._data:
+            return True
+
+        self.stats.record(False)
+        self._prefetched.add(key)
+        return False
+
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize > 0:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+    def clear(self) -> None:
+        """ Remove all entries from the cache. Statistics are kept.
+        """
+        self._data.clear()
+        self._prefetched.clear()
@@ -8,12 +8,12 @@
 Handler for cleaning name and address tags in place information before it
 is handed to the token analysis.
 """
-from typing import Optional, List, Mapping, Sequence, Callable, Any, Tuple
+from typing import Optional, List, Mapping, Sequence, Callable, Any, Tuple, Set
 
 from nominatim.errors import UsageError
 from nominatim.config import Configuration
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
-from nominatim.tokenizer.sanitizers.base import SanitizerHandler, ProcessInfo
+from nominatim.tokenizer.sanitizers.base import SanitizerHandler, ProcessInfo, SanitizerScope
 from nominatim.data.place_name import PlaceName
 from nominatim.data.place_info import PlaceInfo
 
@@ -21,10 +21,14 @@ from nominatim.data.place_info import PlaceInfo
 class PlaceSanitizer:
     """ Controller class which applies sanitizer functions on the place
         names and address before they are used by the token analysers.
+
+        Sanitizers that have declared which kinds of names and address
+        parts they work on are skipped for places that have none of them.
+        Set `dispatch` to False to always run all sanitizers.
     """
 
     def __init__(self, rules: Optional[Sequence[Mapping[str, Any]]],
-                 config: Configuration) -> None:
+                 config: Configuration, dispatch: bool = True) -> None:
         self.handlers: List[Callable[[ProcessInfo], None]] = []
 
         if rules:
@@ -39,6 +43,13 @@ class PlaceSanitizer:
 
                 self.handlers.append(module.create(SanitizerConfig(func)))
 
+        # Dispatch plan: each handler with the scope it declared, if any.
+        self.plan: List[Tuple[Callable[[ProcessInfo], None], Optional[SanitizerScope]]] = \
+            [(func, getattr(func, 'sanitizer_scope', None) if dispatch else None)
+             for func in self.handlers]
+        # Number of times each handler has been skipped.
+        self.skipped = [0] * len(self.plan)
+
 
     def process_names(self, place: PlaceInfo) -> Tuple[List[PlaceName], List[PlaceName]]:
         """ Extract a sanitized list of names and address parts from the
@@ -46,8 +57,20 @@ class PlaceSanitizer:
             (list of names, list of address names)
         """
         obj = ProcessInfo(place)
+        name_kinds: Optional[Set[str]] = None
+        address_kinds: Set[str] = set()
+
+        for i, (func, scope) in enumerate(self.plan):
+            if scope is not None:
+                if name_kinds is None:
+                    name_kinds = {name.kind for name in obj.names}
+                    address_kinds = {name.kind for name in obj.address}
+                if not scope.applies(name_kinds, address_kinds):
+                    self.skipped[i] += 1
+                    continue
 
-        for func in self.handlers:
             func(obj)
+            # The handler may have changed the names in any way.
+            name_kinds = None
 
         return obj.names, obj.address
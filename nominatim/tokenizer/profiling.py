@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Helpers for collecting performance statistics of name analyzers.
+"""
+from typing import Dict, Callable, TypeVar, Any, Type
+import time
+
+from nominatim.db.connection import Cursor
+
+T = TypeVar('T')
+
+class CacheStats:
+    """ Hit and miss counter for a cache.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+
+    def record(self, hit: bool) -> None:
+        """ Count a single lookup in the cache.
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+
+    @property
+    def hit_rate(self) -> float:
+        """ Fraction of lookups that could be answered from the cache.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class AnalyzerProfile:
+    """ Performance statistics of a name analyzer, as returned by
+        `AbstractAnalyzer.enable_profiling()`.
+
+        `times` contains the time spent (in seconds) in the different
+        processing steps, `caches` the statistics of the caches of the
+        analyzer. Analyzers fill in as much information as they can.
+        `dry_run` tells if the analyzer keeps changes to the database
+        from being saved.
+    """
+
+    def __init__(self, dry_run: bool = False) -> None:
+        self.dry_run = dry_run
+        self.times: Dict[str, float] = {}
+        self.caches: Dict[str, CacheStats] = {}
+
+
+    def add_time(self, step: str, seconds: float) -> None:
+        """ Add the given time to the processing step.
+        """
+        self.times[step] = self.times.get(step, 0.0) + seconds
+
+
+    def timed(self, step: str, func: Callable[..., T], *args: Any) -> T:
+        """ Call the given function and add the time it took to the
+            processing step.
+        """
+        tstart = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.add_time(step, time.perf_counter() - tstart)
+
+
+def make_timed_cursor(profile: AnalyzerProfile, step: str) -> Type[Cursor]:
+    """ Create a cursor class that adds the time spent executing
+        queries to the given processing step of the profile.
+    """
+    class _TimedCursor(Cursor):
+        # pylint: disable=arguments-renamed,arguments-differ
+        def execute(self, query: Any, args: Any = None) -> None:
+            tstart = time.perf_counter()
+            try:
+                super().execute(query, args)
+            finally:
+                profile.add_time(step, time.perf_counter() - tstart)
+
+    return _TimedCursor
@@ -7,13 +7,22 @@
 """
 Common data types and protocols for sanitizers.
 """
-from typing import Optional, List, Mapping, Callable
+from typing import Optional, List, Mapping, Callable, Dict, Iterable, TypeVar
 
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
 from nominatim.data.place_info import PlaceInfo
 from nominatim.data.place_name import PlaceName
 from nominatim.typing import Protocol, Final
 
+T = TypeVar('T')
+
+KindFilter = Callable[[str], bool]
+
+def ALL_KINDS(_: str) -> bool: # pylint: disable=invalid-name
+    """ Kind filter that accepts names of any kind.
+    """
+    return True
+
 
 class ProcessInfo:
     """ Container class for information handed into to handler functions.
@@ -60,5 +69,60 @@ class SanitizerHandler(Protocol):
 
         Return:
             The result must be a callable that takes a place description
-            and transforms name and address as reuqired.
+            and transforms name and address as reuqired. The callable
+            may declare the names and address parts it works on with
+            `declare_scope()`.
+        """
+
+
+class SanitizerScope:
+    """ Describes which names and address parts a sanitizer works on.
+        `names` and `address` are filters on the kind of the name. When
+        a filter is None, the sanitizer does not look at the respective
+        list at all.
+
+        A sanitizer with a scope must leave the place unchanged when none
+        of its names and address parts are accepted by the filters.
+    """
+
+    def __init__(self, names: Optional[KindFilter] = None,
+                 address: Optional[KindFilter] = None) -> None:
+        self.names = names
+        self.address = address
+        self._name_kinds: Dict[str, bool] = {}
+        self._address_kinds: Dict[str, bool] = {}
+
+
+    @staticmethod
+    def _any_match(kind_filter: Optional[KindFilter], known: Dict[str, bool],
+                   kinds: Iterable[str]) -> bool:
+        if kind_filter is None:
+            return False
+
+        for kind in kinds:
+            result = known.get(kind)
+            if result is None:
+                result = known[kind] = kind_filter(kind)
+            if result:
+                return True
+
+        return False
+
+
+    def applies(self, name_kinds: Iterable[str], address_kinds: Iterable[str]) -> bool:
+        """ Check if the sanitizer needs to be run for a place with
+            names and address parts of the given kinds.
         """
+        return self._any_match(self.names, self._name_kinds, name_kinds) \
+               or self._any_match(self.address, self._address_kinds, address_kinds)
+
+
+def declare_scope(handler: T, names: Optional[KindFilter] = None,
+                  address: Optional[KindFilter] = None) -> T:
+    """ Attach the description of the names and address parts the handler
+        works on to a sanitizer function. The place sanitizer uses the
+        information to skip the handler for places it cannot apply to.
+        Handlers without a scope are always run.
+    """
+    setattr(handler, 'sanitizer_scope', SanitizerScope(names, address))
+    return handler
@@ -26,7 +26,7 @@ Arguments:
 """
 from typing import Callable, Iterator, List
 
-from nominatim.tokenizer.sanitizers.base import ProcessInfo
+from nominatim.tokenizer.sanitizers.base import ProcessInfo, declare_scope
 from nominatim.data.place_name import PlaceName
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
 
@@ -76,5 +76,6 @@ class _HousenumberSanitizer:
 def create(config: SanitizerConfig) -> Callable[[ProcessInfo], None]:
     """ Create a housenumber processing function.
     """
+    sanitizer = _HousenumberSanitizer(config)
 
-    return _HousenumberSanitizer(config)
+    return declare_scope(sanitizer, address=sanitizer.filter_kind)
@@ -23,7 +23,7 @@ Arguments:
 from typing import Callable, Optional, Tuple
 
 from nominatim.data.postcode_format import PostcodeFormatter
-from nominatim.tokenizer.sanitizers.base import ProcessInfo
+from nominatim.tokenizer.sanitizers.base import ProcessInfo, declare_scope
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
 
 class _PostcodeSanitizer:
@@ -77,4 +77,4 @@ def create(config: SanitizerConfig) -> Callable[[ProcessInfo], None]:
     """ Create a function that filters postcodes by their officially allowed pattern.
     """
 
-    return _PostcodeSanitizer(config)
+    return declare_scope(_PostcodeSanitizer(config), address=lambda kind: kind == 'postcode')
@@ -56,7 +56,7 @@ Arguments:
 """
 from typing import Callable, List, Tuple, Sequence
 
-from nominatim.tokenizer.sanitizers.base import ProcessInfo
+from nominatim.tokenizer.sanitizers.base import ProcessInfo, declare_scope
 from nominatim.data.place_name import PlaceName
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
 
@@ -124,5 +124,9 @@ class _TagSanitizer:
 def create(config: SanitizerConfig) -> Callable[[ProcessInfo], None]:
     """ Create a function to process removal of certain tags.
     """
+    sanitizer = _TagSanitizer(config)
 
-    return _TagSanitizer(config)
+    if sanitizer.type == 'name':
+        return declare_scope(sanitizer, names=sanitizer.filter_kind)
+
+    return declare_scope(sanitizer, address=sanitizer.filter_kind)
@@ -13,7 +13,7 @@ Arguments:
 """
 from typing import Callable
 
-from nominatim.tokenizer.sanitizers.base import ProcessInfo
+from nominatim.tokenizer.sanitizers.base import ProcessInfo, declare_scope, ALL_KINDS
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
 
 def create(config: SanitizerConfig) -> Callable[[ProcessInfo], None]:
@@ -36,4 +36,4 @@ def create(config: SanitizerConfig) -> Callable[[ProcessInfo], None]:
 
         obj.names = new_names
 
-    return _process
+    return declare_scope(_process, names=ALL_KINDS)
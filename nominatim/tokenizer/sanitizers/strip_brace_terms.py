@@ -11,7 +11,7 @@ only the main name part with the bracket part removed.
 """
 from typing import Callable
 
-from nominatim.tokenizer.sanitizers.base import ProcessInfo
+from nominatim.tokenizer.sanitizers.base import ProcessInfo, declare_scope, ALL_KINDS
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
 
 
@@ -31,4 +31,4 @@ def create(_: SanitizerConfig) -> Callable[[ProcessInfo], None]:
 
             obj.names.extend(new_names)
 
-    return _process
+    return declare_scope(_process, names=ALL_KINDS)
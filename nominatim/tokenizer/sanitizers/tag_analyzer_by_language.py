@@ -33,7 +33,7 @@ Arguments:
 from typing import Callable, Dict, Optional, List
 
 from nominatim.data import country_info
-from nominatim.tokenizer.sanitizers.base import ProcessInfo
+from nominatim.tokenizer.sanitizers.base import ProcessInfo, declare_scope
 from nominatim.tokenizer.sanitizers.config import SanitizerConfig
 
 class _AnalyzerByLanguage:
@@ -96,4 +96,6 @@ def create(config: SanitizerConfig) -> Callable[[ProcessInfo], None]:
     """ Create a function that sets the analyzer property depending on the
         language of the tag.
     """
-    return _AnalyzerByLanguage(config)
+    sanitizer = _AnalyzerByLanguage(config)
+
+    return declare_scope(sanitizer, names=sanitizer.filter_kind)
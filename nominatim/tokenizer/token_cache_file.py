@@ -0,0 +1,281 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Persistent cache of word IDs of the ICU tokenizer.
+
+The cache consists of two files in the tokenizer directory of the project:
+a memory-mapped file with a sorted index of all words that is created from
+the word table and a journal where analyzers append the words they have
+looked up since. The files are tied to the current state of the word table
+through a stamp that is saved in the database properties. Removing the
+stamp invalidates the cache.
+"""
+from typing import Optional, List, Dict, Tuple, Iterable
+from array import array
+from pathlib import Path
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import uuid
+
+from nominatim.db.connection import Connection
+from nominatim.db.properties import set_property, get_property
+
+LOG = logging.getLogger()
+
+DBCFG_TOKEN_CACHE = 'tokenizer_token_cache'
+
+CACHE_FILE = 'token_cache.bin'
+JOURNAL_FILE = 'token_cache.journal'
+
+# Size in bytes up to which new entries are appended to the journal.
+# The journal is merged into the cache file when it is recreated.
+MAX_JOURNAL_SIZE = 64 * 1024 * 1024
+
+# Kinds of entries in the cache.
+PARTIAL = 'w'                 # partial word token -> word ID
+FULL = 'W'                    # full word token -> word IDs
+NAME = 'N'                    # canonical name -> full word ID
+HOUSENUMBER = 'H'             # housenumber token -> word ID
+ANALYZED_HOUSENUMBER = 'A'    # canonical housenumber -> word ID
+
+_MAGIC = b'NTC1'
+# magic, stamp, number of entries, position of the offset table
+_HEADER = struct.Struct('<4s16sQQ')
+_OFFSET = struct.Struct('<Q')
+
+# The entries must be sorted by the byte representation of their key,
+# hence the 'C' collation.
+_EXPORT_SQL = """
+    SELECT key, ids FROM (
+      SELECT 'w' || chr(31) || word_token as key, ARRAY[min(word_id)] as ids
+        FROM word WHERE type = 'w' GROUP BY word_token
+      UNION ALL
+      SELECT 'W' || chr(31) || word_token, array_agg(word_id)
+        FROM word WHERE type = 'W' GROUP BY word_token
+      UNION ALL
+      SELECT 'N' || chr(31) || word, ARRAY[min(word_id)]
+        FROM word WHERE type = 'W' and word is not null GROUP BY word
+      UNION ALL
+      SELECT 'H' || chr(31) || word_token, ARRAY[min(word_id)]
+        FROM word WHERE type = 'H' GROUP BY word_token
+      UNION ALL
+      SELECT 'A' || chr(31) || word, ARRAY[min(word_id)]
+        FROM word WHERE type = 'H' and word is not null GROUP BY word
+    ) entries
+    ORDER BY key COLLATE "C"
+    """
+
+
+def _make_key(kind: str, key: str) -> str:
+    return kind + '\x1f' + key
+
+
+def _remove_file(path: Path) -> None:
+    if path.exists():
+        path.unlink()
+
+
+def write_cache_file(conn: Connection, data_dir: Path) -> None:
+    """ Create the cache file from the current content of the word table
+        and discard the journal.
+    """
+    stamp = uuid.uuid4()
+    offsets = array('Q')
+    tmpfile = data_dir / (CACHE_FILE + '.tmp')
+
+    with tmpfile.open('wb') as fd:
+        fd.write(_HEADER.pack(_MAGIC, stamp.bytes, 0, 0))
+        with conn.cursor(name='token_cache_export') as cur:
+            cur.itersize = 10000
+            cur.execute(_EXPORT_SQL)
+            for key, ids in cur:
+                offsets.append(fd.tell())
+                fd.write(key.encode('utf-8') + b'\0'
+                         + ','.join(str(i) for i in ids).encode('ascii') + b'\n')
+        table_pos = fd.tell()
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        offsets.tofile(fd)
+        fd.seek(0)
+        fd.write(_HEADER.pack(_MAGIC, stamp.bytes, len(offsets), table_pos))
+
+    os.replace(tmpfile, data_dir / CACHE_FILE)
+    _remove_file(data_dir / JOURNAL_FILE)
+    set_property(conn, DBCFG_TOKEN_CACHE, stamp.hex)
+    LOG.info("Written %d entries to the token cache file.", len(offsets))
+
+
+def invalidate_cache_file(conn: Connection, data_dir: Path) -> None:
+    """ Mark the cache as outdated and remove the files.
+    """
+    if get_property(conn, DBCFG_TOKEN_CACHE):
+        set_property(conn, DBCFG_TOKEN_CACHE, '')
+    _remove_file(data_dir / CACHE_FILE)
+    _remove_file(data_dir / JOURNAL_FILE)
+
+
+class TokenCacheFile:
+    """ Read access to the persistent cache. New entries are collected
+        with `add()` and appended to the journal with `flush()`.
+    """
+
+    def __init__(self, data_dir: Path, stamp: str, mm: mmap.mmap,
+                 num_entries: int, table_pos: int) -> None:
+        self.data_dir = data_dir
+        self.stamp = stamp
+        self._mm = mm
+        self._num_entries = num_entries
+        self._table_pos = table_pos
+        self._journal: Dict[str, List[int]] = {}
+        self._new_entries: List[Tuple[str, List[int]]] = []
+        self._load_journal()
+
+
+    @staticmethod
+    def load(conn: Connection, data_dir: Path) -> Optional['TokenCacheFile']:
+        """ Open the cache file in the given directory. Returns None when
+            there is no cache file or it does not fit the word table.
+        """
+        stamp = get_property(conn, DBCFG_TOKEN_CACHE)
+        if not stamp:
+            return None
+
+        try:
+            with (data_dir / CACHE_FILE).open('rb') as fd:
+                mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        if len(mm) < _HEADER.size:
+            mm.close()
+            return None
+
+        magic, file_stamp, num_entries, table_pos = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or file_stamp.hex() != stamp:
+            LOG.info("Ignoring outdated token cache file.")
+            mm.close()
+            return None
+
+        return TokenCacheFile(data_dir, stamp, mm, num_entries, table_pos)
+
+
+    def _load_journal(self) -> None:
+        try:
+            with (self.data_dir / JOURNAL_FILE).open('r', encoding='utf-8') as fd:
+                if fd.readline().strip() != self.stamp:
+                    return
+                for line in fd:
+                    try:
+                        key, ids = json.loads(line)
+                    except ValueError:
+                        # Incomplete line from a process that was killed.
+                        continue
+                    self._journal[key] = ids
+        except FileNotFoundError:
+            pass
+
+
+    def get(self, kind: str, key: str) -> Optional[List[int]]:
+        """ Return the word IDs saved for the given key or None if the
+            cache does not know about the key.
+        """
+        fullkey = _make_key(kind, key)
+        ids = self._journal.get(fullkey)
+        if ids is not None:
+            return ids
+
+        needle = fullkey.encode('utf-8')
+        low, high = 0, self._num_entries
+        while low < high:
+            mid = (low + high) // 2
+            pos = _OFFSET.unpack_from(self._mm, self._table_pos + mid * _OFFSET.size)[0]
+            end = self._mm.find(b'\0', pos)
+            entry = self._mm[pos:end]
+            if entry == needle:
+                value = self._mm[end + 1:self._mm.find(b'\n', end)]
+                return [int(i) for i in value.split(b',')]
+            if entry < needle:
+                low = mid + 1
+            else:
+                high = mid
+
+        return None
+
+
+    def add(self, kind: str, key: str, ids: Iterable[int]) -> None:
+        """ Remember a new entry for the journal.
+        """
+        fullkey = _make_key(kind, key)
+        idlist = list(ids)
+        self._journal[fullkey] = idlist
+        self._new_entries.append((fullkey, idlist))
+
+
+    def flush(self) -> None:
+        """ Append all new entries to the journal.
+
+            The entries are only written when the journal belongs to the
+            same version of the cache file as this cache. A journal left
+            over from an older version of the file is replaced. Nothing
+            is written when the cache file itself has been replaced in the
+            meantime or the journal has grown beyond MAX_JOURNAL_SIZE.
+        """
+        if not self._new_entries:
+            return
+
+        with (self.data_dir / JOURNAL_FILE).open('a+', encoding='utf-8') as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                fd.seek(0)
+                if fd.readline().strip() != self.stamp:
+                    if not self._is_current():
+                        LOG.info("Token cache file has changed. Discarding new entries.")
+                        self._new_entries = []
+                        return
+                    fd.truncate(0)
+                    fd.write(self.stamp + '\n')
+                elif fd.seek(0, os.SEEK_END) > MAX_JOURNAL_SIZE:
+                    LOG.info("Token cache journal is full. Discarding new entries.")
+                    self._new_entries = []
+                    return
+                fd.write(''.join(json.dumps(entry) + '\n' for entry in self._new_entries))
+                fd.flush()
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+        self._new_entries = []
+
+
+    def _is_current(self) -> bool:
+        """ Check that the cache file on disk still has the stamp of
+            this cache.
+        """
+        try:
+            with (self.data_dir / CACHE_FILE).open('rb') as fd:
+                header = fd.read(_HEADER.size)
+        except OSError:
+            return False
+
+        if len(header) < _HEADER.size:
+            return False
+
+        magic, file_stamp, _, _ = _HEADER.unpack(header)
+        return bool(magic == _MAGIC and file_stamp.hex() == self.stamp)
+
+
+    def close(self, flush: bool = True) -> None:
+        """ Release the file. New entries are written to the journal
+            unless `flush` is False.
+        """
+        if flush:
+            self.flush()
+        self._mm.close()
@@ -0,0 +1,98 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Recomputation of word frequencies from the search_name table.
+
+The frequencies are first aggregated for ranges of place IDs in parallel
+and then merged. The word table is updated in chunks of word IDs, each
+in its own transaction, so that no single long-running transaction
+holds back the cleanup of the table.
+"""
+from typing import Iterator, Tuple
+import logging
+
+from nominatim.db.async_connection import WorkerPool
+from nominatim.db.connection import connect
+
+LOG = logging.getLogger()
+
+PARTS_TABLE = 'word_frequencies_parts'
+FREQUENCY_TABLE = 'word_frequencies'
+
+# Number of place IDs whose names are aggregated in one query.
+PLACE_CHUNK_SIZE = 1000000
+# Number of word IDs updated in one transaction.
+WORD_CHUNK_SIZE = 50000
+
+
+def id_chunks(start: int, end: int, size: int) -> Iterator[Tuple[int, int]]:
+    """ Split the range of IDs from `start` to `end` (both inclusive)
+        into chunks of the given size. Yields the start (inclusive)
+        and end (exclusive) of each chunk.
+    """
+    for chunk in range(start, end + 1, size):
+        yield chunk, min(chunk + size, end + 1)
+
+
+def update_word_frequencies(dsn: str, update_sql: str, threads: int = 1) -> None:
+    """ Count how often each word ID appears in the name vectors of
+        search_name and apply the counts to the word table.
+
+        `update_sql` must update the word table from the table
+        `word_frequencies` with the columns `id` and `count`. It is
+        executed repeatedly and must restrict the update to word IDs
+        from the range given by two placeholders (start inclusive,
+        end exclusive).
+
+        `threads` is the number of database connections to use.
+        Nothing is done when the search_name table does not exist.
+    """
+    threads = max(1, threads)
+
+    with connect(dsn) as conn:
+        if not conn.table_exists('search_name'):
+            return
+
+        with conn.cursor() as cur:
+            cur.drop_table(PARTS_TABLE)
+            cur.drop_table(FREQUENCY_TABLE)
+            cur.execute(f"CREATE UNLOGGED TABLE {PARTS_TABLE} (id INT, count BIGINT)")
+            min_place = cur.scalar("SELECT min(place_id) FROM search_name")
+            max_place = cur.scalar("SELECT max(place_id) FROM search_name")
+        conn.commit()
+
+        if min_place is not None:
+            LOG.info("Computing word frequencies")
+            with WorkerPool(dsn, threads) as pool:
+                for start, end in id_chunks(min_place, max_place, PLACE_CHUNK_SIZE):
+                    pool.next_free_worker().perform(
+                        f"""INSERT INTO {PARTS_TABLE}
+                              SELECT unnest(name_vector) as id, count(*)
+                              FROM search_name
+                              WHERE place_id >= %s and place_id < %s
+                              GROUP BY id""", (start, end))
+
+        with conn.cursor() as cur:
+            LOG.info("Merging word frequencies")
+            cur.execute(f"""CREATE UNLOGGED TABLE {FREQUENCY_TABLE} AS
+                              SELECT id, sum(count)::bigint as count
+                              FROM {PARTS_TABLE} GROUP BY id""")
+            cur.drop_table(PARTS_TABLE)
+            cur.execute(f"CREATE INDEX ON {FREQUENCY_TABLE}(id)")
+            min_word = cur.scalar(f"SELECT min(id) FROM {FREQUENCY_TABLE}")
+            max_word = cur.scalar(f"SELECT max(id) FROM {FREQUENCY_TABLE}")
+        conn.commit()
+
+        if min_word is not None:
+            LOG.info("Update word table with recomputed frequencies")
+            with WorkerPool(dsn, threads) as pool:
+                for start, end in id_chunks(min_word, max_word, WORD_CHUNK_SIZE):
+                    pool.next_free_worker().perform(update_sql, (start, end))
+
+        with conn.cursor() as cur:
+            cur.drop_table(FREQUENCY_TABLE)
+        conn.commit()
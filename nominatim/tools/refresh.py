@@ -18,6 +18,8 @@ from nominatim.config import Configuration
 from nominatim.db.connection import Connection, connect
 from nominatim.db.utils import execute_file
 from nominatim.db.sql_preprocessor import SQLPreprocessor
+from nominatim.db.properties import get_property
+from nominatim.data.word_dictionary import WordDictionary, WordDictionaryWriter
 from nominatim.version import NOMINATIM_VERSION
 
 LOG = logging.getLogger()
@@ -190,6 +192,46 @@ def recompute_importance(conn: Connection) -> None:
     conn.commit()
 
 
+def export_word_dictionary(conn: Connection, filename: Path,
+                           only_if_changed: bool = False) -> bool:
+    """ Write the word table into the word dictionary file that is used
+        by the Python frontend for query analysis. Only the word table
+        of the ICU tokenizer can be exported.
+
+        With `only_if_changed`, an existing file is only replaced when the
+        number of entries or the highest word ID in the word table differ
+        from the ones in the file.
+
+        Returns True when a new file has been written.
+    """
+    if get_property(conn, 'tokenizer') != 'icu':
+        LOG.error('Word dictionary can only be created for the ICU tokenizer.')
+        return False
+
+    if only_if_changed and filename.is_file():
+        with conn.cursor() as cur:
+            num_rows = cur.scalar('SELECT count(*) FROM word')
+            max_word_id = cur.scalar('SELECT coalesce(max(word_id), 0) FROM word')
+        try:
+            with WordDictionary(filename) as current:
+                if current.num_rows == num_rows and current.max_word_id == max_word_id:
+                    return False
+        except (OSError, ValueError):
+            pass
+
+    LOG.warning('Writing word dictionary to %s', filename)
+    with WordDictionaryWriter(filename) as writer:
+        with conn.cursor(name='word_dictionary') as cur:
+            cur.itersize = 10000
+            cur.execute('''SELECT word_id, word_token, type, word, info FROM word
+                           ORDER BY word_token COLLATE "C"''')
+            for row in cur:
+                writer.add(*row)
+    conn.commit()
+
+    return True
+
+
 def _quote_php_variable(var_type: Type[Any], config: Configuration,
                         conf_name: str) -> str:
     if var_type == bool:
@@ -7,18 +7,21 @@
 """
 Functions for importing tiger data and handling tarbar and directory files
 """
-from typing import Any, TextIO, List, Union, cast
+from typing import Any, TextIO, List, Union, Sequence, Dict, Tuple, Optional, cast
 import csv
 import io
+import json
 import logging
 import os
 import tarfile
 
-from psycopg2.extras import Json
+import psycopg2
+from psycopg2 import sql as pysql
 
 from nominatim.config import Configuration
-from nominatim.db.connection import connect
+from nominatim.db.connection import connect, Connection
 from nominatim.db.async_connection import WorkerPool
+from nominatim.db.utils import CopyBuffer
 from nominatim.db.sql_preprocessor import SQLPreprocessor
 from nominatim.errors import UsageError
 from nominatim.data.place_info import PlaceInfo
@@ -27,6 +30,12 @@ from nominatim.tools import freeze
 
 LOG = logging.getLogger()
 
+# Maximum number of lines imported through one staging table.
+STAGING_BATCH_SIZE = 10000
+
+STAGING_COLUMNS = ('linegeo', 'startnumber', 'endnumber', 'interpolation',
+                   'token_info', 'postcode')
+
 class TigerInput:
     """ Context manager that goes through Tiger input files which may
         either be in a directory or gzipped together in a tar file.
@@ -82,30 +91,122 @@ class TigerInput:
         return len(self.files)
 
 
-def handle_threaded_sql_statements(pool: WorkerPool, fd: TextIO,
-                                   analyzer: AbstractAnalyzer) -> None:
-    """ Handles sql statement with multiplexing
+class TigerStaging:
+    """ Loads Tiger lines into staging tables and imports them from
+        there with set-based SQL. Each batch of lines gets its own
+        staging table, so that the imports can run in parallel on the
+        connections of the worker pool.
     """
-    lines = 0
-    # Using pool of database connections to execute sql statements
 
-    sql = "SELECT tiger_line_import(%s, %s, %s, %s, %s, %s)"
+    def __init__(self, conn: Connection, pool: WorkerPool) -> None:
+        self.conn = conn
+        self.pool = pool
+        self.tables: List[str] = []
+
+
+    def load(self, lines: Sequence[Sequence[Any]]) -> None:
+        """ Copy the given lines into a new staging table and schedule
+            their import.
+
+            The geometries are only checked when the lines are imported
+            from the staging table. When the lines cannot be copied
+            at all, they are copied again in smaller parts and the lines
+            that still fail are skipped.
+        """
+        if not lines:
+            return
+
+        table = f'tiger_staging_{len(self.tables)}'
+        self.tables.append(table)
+
+        try:
+            with self.conn.cursor() as cur:
+                cur.drop_table(table)
+                cur.execute(pysql.SQL("""CREATE UNLOGGED TABLE {} (
+                                           linegeo TEXT, startnumber INTEGER,
+                                           endnumber INTEGER, interpolation TEXT,
+                                           token_info JSONB, postcode TEXT)
+                                      """).format(pysql.Identifier(table)))
+                with CopyBuffer() as buf:
+                    for line in lines:
+                        buf.add(*line)
+                    buf.copy_out(cur, table, columns=STAGING_COLUMNS)
+            self.conn.commit()
+        except psycopg2.DataError as err:
+            self.conn.rollback()
+            if len(lines) == 1:
+                LOG.warning("Skipping invalid Tiger line %s: %s", lines[0], err)
+            else:
+                LOG.info("Cannot copy %d Tiger lines, retrying in smaller parts.",
+                         len(lines))
+                half = len(lines) // 2
+                self.load(lines[:half])
+                self.load(lines[half:])
+            return
+
+        self.pool.next_free_worker().perform(
+            pysql.SQL("SELECT tiger_import_from_staging({}); DROP TABLE {}")
+                 .format(pysql.Literal(table), pysql.Identifier(table)))
+
+
+    def cleanup(self) -> None:
+        """ Wait for all imports to finish and remove staging tables
+            that are left over from failed imports.
+        """
+        self.pool.finish_all()
+        with self.conn.cursor() as cur:
+            for table in self.tables:
+                cur.drop_table(table)
+        self.conn.commit()
+
+
+def load_tiger_file(fd: TextIO, analyzer: AbstractAnalyzer, staging: TigerStaging) -> int:
+    """ Read the lines of a Tiger CSV file and hand them to the staging
+        loader. The token information is computed only once for each
+        combination of street and postcode in the file.
+
+        Returns the number of lines read.
+    """
+    tokens: Dict[Tuple[str, str], Tuple[str, Optional[str]]] = {}
+    lines: List[Tuple[Any, ...]] = []
+    total = 0
+    skipped = 0
 
     for row in csv.DictReader(fd, delimiter=';'):
         try:
+            startnumber, endnumber = int(row['from']), int(row['to'])
+        except (TypeError, ValueError):
+            skipped += 1
+            continue
+
+        if not row['geometry'] or row['street'] is None or row['postcode'] is None:
+            skipped += 1
+            continue
+
+        key = (row['street'], row['postcode'])
+        info = tokens.get(key)
+        if info is None:
             address = dict(street=row['street'], postcode=row['postcode'])
-            args = ('SRID=4326;' + row['geometry'],
-                    int(row['from']), int(row['to']), row['interpolation'],
-                    Json(analyzer.process_place(PlaceInfo({'address': address}))),
+            info = (json.dumps(analyzer.process_place(PlaceInfo({'address': address}))),
                     analyzer.normalize_postcode(row['postcode']))
-        except ValueError:
-            continue
-        pool.next_free_worker().perform(sql, args=args)
+            tokens[key] = info
+
+        lines.append(('SRID=4326;' + row['geometry'], startnumber, endnumber,
+                      row['interpolation'], *info))
+
+        if len(lines) >= STAGING_BATCH_SIZE:
+            staging.load(lines)
+            total += len(lines)
+            lines = []
 
-        lines += 1
-        if lines == 1000:
-            print('.', end='', flush=True)
-            lines = 0
+    staging.load(lines)
+    total += len(lines)
+
+    LOG.info("Read %d lines with %d different streets.", total, len(tokens))
+    if skipped:
+        LOG.warning("Skipped %d lines with missing or invalid fields.", skipped)
+
+    return total
 
 
 def add_tiger_data(data_dir: str, config: Configuration, threads: int,
@@ -129,17 +230,18 @@ def add_tiger_data(data_dir: str, config: Configuration, threads: int,
             sql = SQLPreprocessor(conn, config)
             sql.run_sql_file(conn, 'tiger_import_start.sql')
 
-        # Reading files and then for each file line handling
-        # sql_query in <threads - 1> chunks.
+        # Reading the files in this process and importing the lines
+        # from the staging tables on <threads - 1> connections.
         place_threads = max(1, threads - 1)
 
-        with WorkerPool(dsn, place_threads, ignore_sql_errors=True) as pool:
+        with WorkerPool(dsn, place_threads, ignore_sql_errors=True) as pool, \
+             connect(dsn) as conn:
+            staging = TigerStaging(conn, pool)
             with tokenizer.name_analyzer() as analyzer:
                 while tar:
                     with tar.next_file() as fd:
-                        handle_threaded_sql_statements(pool, fd, analyzer)
-
-        print('\n')
+                        load_tiger_file(fd, analyzer, staging)
+            staging.cleanup()
 
     LOG.warning("Creating indexes on Tiger data")
     with connect(dsn) as conn:
@@ -0,0 +1,95 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the execution of searches in the forward geocoder.
+"""
+import asyncio
+import contextlib
+
+import pytest
+
+import nominatim.api as napi
+from nominatim.api.types import SearchDetails
+from nominatim.api.search.geocoder import ForwardGeocoder
+
+class FakeSearch:
+
+    def __init__(self, penalty, accuracy=None, delay=0.01):
+        self.penalty = penalty
+        self.accuracy = accuracy
+        self.delay = delay
+        self.conn = None
+        self.finished = False
+
+
+    async def lookup(self, conn, _):
+        self.conn = conn
+        await asyncio.sleep(self.delay)
+        self.finished = True
+        if self.accuracy is None:
+            return napi.SearchResults()
+        return napi.SearchResults([napi.SearchResult(napi.SourceTable.PLACEX,
+                                                     ('place', 'city'),
+                                                     napi.Point(1.0, 2.0),
+                                                     place_id=round(self.penalty * 100),
+                                                     accuracy=self.accuracy)])
+
+
+def make_searches():
+    return [FakeSearch(0.0, accuracy=-0.4), FakeSearch(0.05, accuracy=0.0),
+            FakeSearch(0.2, accuracy=0.0, delay=1.0), FakeSearch(3.0, accuracy=0.0)]
+
+
+def extra_connections(available):
+    @contextlib.asynccontextmanager
+    async def _factory():
+        yield 'extra' if available else None
+
+    return _factory
+
+
+def run_searches(searches, concurrency, available=True):
+    geocoder = ForwardGeocoder('main', SearchDetails(), concurrency,
+                               extra_connections(available))
+    return asyncio.run(geocoder.execute_searches(None, searches))
+
+
+def test_sequential_searches():
+    searches = make_searches()
+
+    results = run_searches(searches, 1)
+
+    assert [r.place_id for r in results] == [0, 5]
+    assert [s.conn for s in searches] == ['main', 'main', None, None]
+
+
+def test_concurrent_searches_same_result():
+    searches = make_searches()
+
+    results = run_searches(searches, 4)
+
+    assert [r.place_id for r in results] == [0, 5]
+    assert [s.conn for s in searches] == ['main', 'extra', 'extra', None]
+
+
+def test_concurrent_searches_cancelled_after_cutoff():
+    searches = make_searches()
+
+    run_searches(searches, 4)
+
+    assert all(s.finished for s in searches[:2])
+    assert not searches[2].finished
+
+
+@pytest.mark.parametrize('concurrency', [2, 10])
+def test_concurrent_searches_without_free_connections(concurrency):
+    searches = make_searches()
+
+    results = run_searches(searches, concurrency, available=False)
+
+    assert [r.place_id for r in results] == [0, 5]
+    assert [s.conn for s in searches] == ['main', 'main', None, None]
@@ -11,11 +11,13 @@ from pathlib import Path
 
 import pytest
 import pytest_asyncio
+import sqlalchemy as sa
 
 from nominatim.api import NominatimAPIAsync
 from nominatim.api.search.query import Phrase, PhraseType, TokenType, BreakType
 import nominatim.api.search.icu_tokenizer as tok
 from nominatim.api.logging import set_log_output, get_and_disable
+from nominatim.data.word_dictionary import WordDictionaryWriter
 
 async def add_word(conn, word_id, word_token, wtype, word, info = None):
     t = conn.t.meta.tables['word']
@@ -39,6 +41,9 @@ async def conn(table_factory):
                            ('tokenizer_import_transliteration', "'1' > '/1/'; 'ä' > 'ä '")))
     table_factory('word',
                   definition='word_id INT, word_token TEXT, type TEXT, word TEXT, info JSONB')
+    table_factory('import_status',
+                  definition='lastimportdate TIMESTAMP WITH TIME ZONE, sequence_id INT,'
+                             ' indexed BOOLEAN')
 
     api = NominatimAPIAsync(Path('/invalid'), {})
     async with api.begin() as conn:
@@ -184,3 +189,65 @@ async def test_log_output(conn, logtype):
     await ana.analyze_query(make_phrase('foo'))
 
     assert get_and_disable()
+
+
+@pytest.mark.asyncio
+async def test_word_lookup_uses_cache(conn):
+    ana = await tok.create_query_analyzer(conn)
+
+    await add_word(conn, 1, 'foo', 'w', 'FOO')
+
+    await ana.analyze_query(make_phrase('foo'))
+    await conn.execute(sa.text('TRUNCATE word'))
+    query = await ana.analyze_query(make_phrase('foo'))
+
+    assert query.nodes[0].starting[0].tokens[0].token == 1
+    assert conn.word_cache.hits == 1
+    assert conn.word_cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_word_cache_cleared_on_new_import(conn):
+    ana = await tok.create_query_analyzer(conn)
+
+    await add_word(conn, 1, 'foo', 'w', 'FOO')
+    await ana.analyze_query(make_phrase('foo'))
+
+    await conn.execute(sa.text('TRUNCATE word'))
+    await conn.execute(sa.text("INSERT INTO import_status VALUES (now(), 4, true)"))
+    conn.word_cache._next_status_check = 0
+    query = await ana.analyze_query(make_phrase('foo'))
+
+    assert not query.nodes[0].starting
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('with_file', [True, False])
+async def test_word_lookup_in_word_dictionary(table_factory, tmp_path, monkeypatch, with_file):
+    table_factory('nominatim_properties',
+                  definition='property TEXT, value TEXT',
+                  content=(('tokenizer_import_normalisation', ':: lower();'),
+                           ('tokenizer_import_transliteration', "'1' > '/1/'; 'ä' > 'ä '")))
+    table_factory('word',
+                  definition='word_id INT, word_token TEXT, type TEXT, word TEXT, info JSONB',
+                  content=((2, 'foo', 'w', 'FOO', None), ))
+    table_factory('import_status',
+                  definition='lastimportdate TIMESTAMP WITH TIME ZONE, sequence_id INT,'
+                             ' indexed BOOLEAN')
+
+    filename = tmp_path / 'words.bin'
+    if with_file:
+        with WordDictionaryWriter(filename) as writer:
+            writer.add(1, 'foo', 'w', 'FOO', None)
+
+    monkeypatch.setenv('NOMINATIM_API_WORD_DICTIONARY', str(filename))
+    api = NominatimAPIAsync(Path('/invalid'), {})
+    async with api.begin() as conn:
+        ana = await tok.create_query_analyzer(conn)
+
+        assert ana.word_dictionary is not None
+
+        query = await ana.analyze_query(make_phrase('foo'))
+
+        assert query.nodes[0].starting[0].tokens[0].token == (1 if with_file else 2)
+    await api.close()
@@ -10,8 +10,10 @@ Tests for query analyzer creation.
 from pathlib import Path
 
 import pytest
+import sqlalchemy as sa
 
 from nominatim.api import NominatimAPIAsync
+from nominatim.api.search import query_analyzer_factory
 from nominatim.api.search.query_analyzer_factory import make_query_analyzer
 from nominatim.api.search.icu_tokenizer import ICUQueryAnalyzer
 
@@ -31,6 +33,49 @@ async def test_import_icu_tokenizer(table_factory):
     await api.close()
 
 
+@pytest.mark.asyncio
+async def test_icu_tokenizer_shared_between_connections(table_factory):
+    table_factory('nominatim_properties',
+                  definition='property TEXT, value TEXT',
+                  content=(('tokenizer', 'icu'),
+                           ('tokenizer_import_normalisation', ':: lower();'),
+                           ('tokenizer_import_transliteration', "'1' > '/1/'; 'ä' > 'ä '")))
+
+    api = NominatimAPIAsync(Path('/invalid'), {})
+    async with api.begin() as conn:
+        ana1 = await make_query_analyzer(conn)
+    async with api.begin() as conn:
+        ana2 = await make_query_analyzer(conn)
+
+    assert ana1 is not ana2
+    assert ana1.normalizer is ana2.normalizer
+    assert ana1.transliterator is ana2.transliterator
+    await api.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('interval,rebuilt', [(0, True), (3600, False)])
+async def test_icu_tokenizer_rebuilt_on_property_change(table_factory, monkeypatch,
+                                                        interval, rebuilt):
+    monkeypatch.setattr(query_analyzer_factory, 'PROPERTY_CHECK_INTERVAL', interval)
+    table_factory('nominatim_properties',
+                  definition='property TEXT, value TEXT',
+                  content=(('tokenizer', 'icu'),
+                           ('tokenizer_import_normalisation', ':: lower();'),
+                           ('tokenizer_import_transliteration', "'1' > '/1/'; 'ä' > 'ä '")))
+
+    api = NominatimAPIAsync(Path('/invalid'), {})
+    async with api.begin() as conn:
+        ana1 = await make_query_analyzer(conn)
+        await conn.execute(sa.text("""UPDATE nominatim_properties SET value = ':: upper();'
+                                      WHERE property = 'tokenizer_import_normalisation'"""))
+    async with api.begin() as conn:
+        ana2 = await make_query_analyzer(conn)
+
+    assert (ana1.normalizer is not ana2.normalizer) == rebuilt
+    await api.close()
+
+
 @pytest.mark.asyncio
 async def test_import_missing_property(table_factory):
     api = NominatimAPIAsync(Path('/invalid'), {})
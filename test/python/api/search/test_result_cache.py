@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the in-process cache of search results.
+"""
+from nominatim.api.types import SearchDetails, Point
+from nominatim.api.results import SearchResult, SearchResults, SourceTable
+from nominatim.api.search.query import Phrase, PhraseType
+from nominatim.api.search.result_cache import SearchResultCache, make_cache_key
+
+
+def make_results(*place_ids):
+    return SearchResults(SearchResult(source_table=SourceTable.PLACEX,
+                                      category=('place', 'village'),
+                                      centroid=Point(1.0, 2.0), place_id=pid)
+                         for pid in place_ids)
+
+
+def make_key(query, **details):
+    return make_cache_key('search', [Phrase(PhraseType.NONE, p) for p in query.split(',')],
+                          SearchDetails.from_kwargs(details))
+
+
+def test_key_normalizes_phrases():
+    assert make_key('Main  Street,Town') == make_key('main street, town ')
+    assert make_key('Main Street, Town') != make_key('Main Street Town')
+
+
+def test_key_depends_on_details():
+    assert make_key('foo', viewbox='1,2,3,4') == make_key('foo', viewbox=(1, 2, 3, 4))
+    assert make_key('foo', viewbox='1,2,3,4') != make_key('foo', viewbox='1,2,3,5')
+    assert make_key('foo', countries='de,ch') != make_key('foo')
+    assert make_key('foo', max_results=5) != make_key('foo')
+
+
+def test_cache_returns_copy():
+    cache = SearchResultCache(10, 0)
+    cache.add('key', make_results(1, 2))
+
+    results = cache.get('key')
+    results.pop()
+
+    assert [r.place_id for r in cache.get('key')] == [1, 2]
+    assert cache.stats() == {'hits': 2, 'misses': 0, 'size': 1}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SearchResultCache(2, 0)
+    cache.add('a', make_results(1))
+    cache.add('b', make_results(2))
+    cache.get('a')
+    cache.add('c', make_results(3))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_expires_entries(monkeypatch):
+    cache = SearchResultCache(10, 60)
+    now = [1000.0]
+    monkeypatch.setattr('time.monotonic', lambda: now[0])
+
+    cache.add('a', make_results(1))
+    assert cache.get('a') is not None
+
+    now[0] += 61
+    assert cache.get('a') is None
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = SearchResultCache(0, 60)
+    cache.add('a', make_results(1))
+
+    assert not cache.enabled
+    assert len(cache) == 0
@@ -0,0 +1,55 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the in-process cache of the word table.
+"""
+from collections import namedtuple
+
+from nominatim.api.search.word_cache import WordTokenCache
+
+Row = namedtuple('Row', ['word_id', 'word_token'])
+
+
+def test_cache_returns_only_missing_tokens():
+    cache = WordTokenCache(10, 0)
+    cache.add(['foo', 'bar'], [Row(1, 'foo'), Row(2, 'foo')])
+
+    rows, missing = cache.get(['foo', 'bar', 'baz'])
+
+    assert sorted(r.word_id for r in rows) == [1, 2]
+    assert missing == ['baz']
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'size': 2}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = WordTokenCache(2, 0)
+    cache.add(['a'], [])
+    cache.add(['b'], [])
+    cache.get(['a'])
+    cache.add(['c'], [])
+
+    assert cache.get(['a', 'b', 'c'])[1] == ['b']
+
+
+def test_cache_expires_entries(monkeypatch):
+    cache = WordTokenCache(10, 60)
+    now = [1000.0]
+    monkeypatch.setattr('time.monotonic', lambda: now[0])
+
+    cache.add(['a'], [Row(1, 'a')])
+    assert cache.get(['a'])[1] == []
+
+    now[0] += 61
+    assert cache.get(['a'])[1] == ['a']
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = WordTokenCache(0, 60)
+    cache.add(['a'], [Row(1, 'a')])
+
+    assert not cache.enabled
+    assert len(cache) == 0
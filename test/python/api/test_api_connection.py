@@ -69,6 +69,61 @@ async def test_get_property_existing_uncached(apiobj, table_factory):
         assert await conn.get_property('dbv', cached=False) == '1'
 
 
+@pytest.mark.asyncio
+async def test_get_cached_value(apiobj):
+    calls = []
+
+    async def _factory():
+        calls.append(1)
+        return 'value'
+
+    async with apiobj.begin() as conn:
+        assert await conn.get_cached_value('TEST', 'foo', _factory) == 'value'
+    async with apiobj.begin() as conn:
+        assert await conn.get_cached_value('TEST', 'foo', _factory) == 'value'
+
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_cached_value_dropped_on_property_change(apiobj, table_factory):
+    table_factory('nominatim_properties',
+                  definition='property TEXT, value TEXT',
+                  content=(('dbv', '96723'), ))
+
+    async def _factory():
+        return await conn.get_property('dbv')
+
+    async with apiobj.begin() as conn:
+        assert await conn.get_cached_value('TEST', 'foo', _factory) == '96723'
+
+        await conn.execute(sa.text("UPDATE nominatim_properties SET value = '1'"))
+        assert await conn.get_property('dbv', cached=False) == '1'
+
+        assert await conn.get_cached_value('TEST', 'foo', _factory) == '1'
+
+
+@pytest.mark.asyncio
+async def test_refresh_properties(apiobj, table_factory):
+    table_factory('nominatim_properties',
+                  definition='property TEXT, value TEXT',
+                  content=(('tok_a', '1'), ('other', '2')))
+
+    async def _factory():
+        return await conn.get_property('tok_a')
+
+    async with apiobj.begin() as conn:
+        assert await conn.get_property('other') == '2'
+        assert await conn.get_cached_value('TEST', 'foo', _factory) == '1'
+
+        await conn.execute(sa.text("UPDATE nominatim_properties SET value = '3'"))
+        await conn.refresh_properties('tok')
+
+        assert await conn.get_property('tok_a') == '3'
+        assert await conn.get_property('other') == '2'
+        assert await conn.get_cached_value('TEST', 'foo', _factory) == '3'
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize('param', ['foo', 'DB:server_version'])
 async def test_get_property_missing(apiobj, table_factory, param):
@@ -18,6 +18,7 @@ import sqlalchemy as sa
 
 import nominatim.api as napi
 import nominatim.api.logging as loglib
+from nominatim.api.search.result_cache import SearchResultCache
 
 @pytest.fixture(autouse=True)
 def setup_icu_tokenizer(apiobj):
@@ -52,6 +53,26 @@ def test_search_simple_word(apiobj, table_factory):
     assert [r.place_id for r in results] == [444]
 
 
+@pytest.mark.parametrize('use_cache,hits', [(True, 1), (False, 0)])
+def test_search_result_cache(apiobj, table_factory, use_cache, hits):
+    table_factory('word',
+                  definition='word_id INT, word_token TEXT, type TEXT, word TEXT, info JSONB',
+                  content=[(55, 'test', 'W', 'test', None),
+                           (2, 'test', 'w', 'test', None)])
+
+    apiobj.add_placex(place_id=444, class_='place', type='village',
+                      centroid=(1.3, 0.7))
+    apiobj.add_search_name(444, names=[2, 55])
+
+    apiobj.api._async_api.result_cache = SearchResultCache(10, 0)
+
+    apiobj.api.search('TEST')
+    results = apiobj.api.search(' test', use_cache=use_cache)
+
+    assert [r.place_id for r in results] == [444]
+    assert apiobj.api._async_api.result_cache.hits == hits
+
+
 @pytest.mark.parametrize('logtype', ['text', 'html'])
 def test_search_with_debug(apiobj, table_factory, logtype):
     table_factory('word',
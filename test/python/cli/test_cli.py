@@ -14,6 +14,7 @@ the actual functions.
 import importlib
 import pytest
 
+import nominatim.indexer.benchmark
 import nominatim.indexer.indexer
 import nominatim.tools.add_osm_data
 import nominatim.tools.freeze
@@ -165,6 +166,60 @@ class TestCliWithDb:
         assert rank_mock.called == do_ranks
 
 
+    def test_index_command_performance_params(self, monkeypatch, table_factory):
+        table_factory('import_status', 'indexed bool')
+        params = {}
+
+        def _init(self, dsn, tokenizer, num_threads, options):
+            params.update(vars(options))
+
+        monkeypatch.setattr(nominatim.indexer.indexer.Indexer, '__init__', _init)
+        monkeypatch.setattr(nominatim.indexer.indexer.Indexer, 'index_boundaries',
+                            lambda *args: 0)
+        monkeypatch.setattr(nominatim.indexer.indexer.Indexer, 'index_by_rank',
+                            lambda *args: 0)
+        monkeypatch.setattr(nominatim.indexer.indexer.Indexer, 'clear_checkpoint',
+                            lambda *args: None)
+
+        assert self.call_nominatim('index', '--tokenizer-processes', '4',
+                                   '--fetch-connections', '3',
+                                   '--write-mode', 'copy', '--auto-batch-size',
+                                   '--checkpoint', '--shard', '2/3',
+                                   '--locality-dispatch') == 0
+
+        assert params['tokenizer_processes'] == 4
+        assert params['fetch_connections'] == 3
+        assert params['write_mode'] == 'copy'
+        assert params['adaptive_batches']
+        assert params['checkpoints']
+        assert str(params['shard']) == '2/3'
+        assert params['locality_dispatch']
+
+
+    def test_index_command_benchmark(self, mock_func_factory):
+        func = mock_func_factory(nominatim.indexer.benchmark, 'benchmark_tokenizer')
+        func.return_value = nominatim.indexer.benchmark.BenchmarkResult(10, 1.0, True, {}, {})
+        index_func = mock_func_factory(nominatim.indexer.indexer.Indexer, 'index_by_rank')
+
+        assert self.call_nominatim('index', '--benchmark', '--sample', '10') == 0
+
+        assert func.called == 1
+        assert func.last_args[2] == 10
+        assert index_func.called == 0
+
+
+    def test_index_command_benchmark_sanitizers(self, mock_func_factory):
+        func = mock_func_factory(nominatim.indexer.benchmark, 'benchmark_sanitizer_on_db')
+        func.return_value = nominatim.indexer.benchmark.SanitizerBenchmarkResult(10, 1.0, 0.5, {})
+        index_func = mock_func_factory(nominatim.indexer.indexer.Indexer, 'index_by_rank')
+
+        assert self.call_nominatim('index', '--benchmark-sanitizers', '--sample', '10') == 0
+
+        assert func.called == 1
+        assert func.last_args[2] == 10
+        assert index_func.called == 0
+
+
     def test_special_phrases_wiki_command(self, mock_func_factory):
         func = mock_func_factory(nominatim.clicmd.special_phrases.SPImporter, 'import_phrases')
 
@@ -14,6 +14,7 @@ import nominatim.data.country_info
 import nominatim.tools.refresh
 import nominatim.tools.postcodes
 import nominatim.indexer.indexer
+import nominatim.indexer.pretokenize
 import nominatim.db.properties
 
 
@@ -110,6 +111,23 @@ class TestCliImportWithDb:
         assert self.call_nominatim('import', '--continue', 'indexing') == 0
 
 
+    def test_import_continue_tokenize(self, mock_func_factory, placex_table,
+                                      temp_db_conn):
+        mocks = [
+            mock_func_factory(nominatim.indexer.pretokenize, 'pretokenize_places'),
+            mock_func_factory(nominatim.indexer.indexer.Indexer, 'index_full'),
+            mock_func_factory(nominatim.tools.database_import, 'create_search_indices'),
+            mock_func_factory(nominatim.data.country_info, 'create_country_names'),
+            mock_func_factory(nominatim.tools.refresh, 'setup_website'),
+            mock_func_factory(nominatim.db.properties, 'set_property')
+        ]
+
+        assert self.call_nominatim('import', '--continue', 'tokenize') == 0
+
+        for mock in mocks:
+            assert mock.called == 1, "Mock '{}' not called".format(mock.func_name)
+
+
     def test_import_continue_postprocess(self, mock_func_factory):
         mocks = [
             mock_func_factory(nominatim.tools.database_import, 'create_search_indices'),
@@ -44,6 +44,27 @@ class TestRefresh:
         assert self.tokenizer_mock.update_word_tokens_called
 
 
+    def test_refresh_word_dictionary(self, mock_func_factory, monkeypatch):
+        monkeypatch.setenv('NOMINATIM_API_WORD_DICTIONARY', 'words.bin')
+        func_mock = mock_func_factory(nominatim.tools.refresh, 'export_word_dictionary')
+
+        assert self.call_nominatim('refresh', '--word-dictionary') == 0
+        assert func_mock.called == 1
+
+
+    def test_refresh_word_dictionary_not_configured(self):
+        assert self.call_nominatim('refresh', '--word-dictionary') == 1
+
+
+    def test_refresh_word_count_with_word_dictionary(self, mock_func_factory, monkeypatch):
+        monkeypatch.setenv('NOMINATIM_API_WORD_DICTIONARY', 'words.bin')
+        func_mock = mock_func_factory(nominatim.tools.refresh, 'export_word_dictionary')
+
+        assert self.call_nominatim('refresh', '--word-count') == 0
+        assert self.tokenizer_mock.update_statistics_called
+        assert func_mock.called == 1
+
+
     def test_refresh_postcodes(self, mock_func_factory, place_table):
         func_mock = mock_func_factory(nominatim.tools.postcodes, 'update_postcodes')
         idx_mock = mock_func_factory(nominatim.indexer.indexer.Indexer, 'index_postcodes')
@@ -155,3 +155,15 @@ class TestCliReplication:
         assert index_mock.called == 1
         assert sleep_mock.called == 1
         assert sleep_mock.last_args[0] == 60
+
+
+    def test_replication_update_once_exports_word_dictionary(self, monkeypatch, tmp_path,
+                                                            mock_func_factory, index_mock):
+        monkeypatch.setenv('NOMINATIM_API_WORD_DICTIONARY', str(tmp_path / 'words.dict'))
+        self.update_states([nominatim.tools.replication.UpdateState.UP_TO_DATE])
+        export_mock = mock_func_factory(nominatim.tools.refresh, 'export_word_dictionary')
+
+        assert self.call_nominatim('--once') == 0
+
+        assert index_mock.called == 1
+        assert export_mock.called == 1
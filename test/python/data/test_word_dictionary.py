@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2023 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the word dictionary file format.
+"""
+import pytest
+
+from nominatim.data.word_dictionary import WordDictionary, WordDictionaryWriter, WordRow
+
+
+@pytest.fixture
+def dictfile(tmp_path):
+    filename = tmp_path / 'words.bin'
+    with WordDictionaryWriter(filename) as writer:
+        writer.add(3, 'bar', 'W', 'bar', {'count': 3})
+        writer.add(1, 'foo', 'w', 'foo', None)
+        writer.add(2, 'foo', 'W', 'foo', None)
+        writer.add(None, 'park', 'S', 'park', {'class': 'leisure', 'type': 'park', 'op': '-'})
+        writer.add(7, 'ü', 'H', 'ü', {'lookup': 'u'})
+
+    return filename
+
+
+def test_lookup_existing_tokens(dictfile):
+    with WordDictionary(dictfile) as words:
+        assert words.num_tokens == 4
+        assert words.num_rows == 5
+        assert words.max_word_id == 7
+
+        assert words.lookup('bar') == [WordRow(3, 'bar', 'W', 'bar', {'count': 3})]
+        assert [r.word_id for r in words.lookup('foo')] == [1, 2]
+        assert words.lookup('park')[0].word_id is None
+        assert words.lookup('ü')[0].info == {'lookup': 'u'}
+
+
+@pytest.mark.parametrize('token', ['a', 'fo', 'foo2', 'zzz', ''])
+def test_lookup_missing_tokens(dictfile, token):
+    with WordDictionary(dictfile) as words:
+        assert words.lookup(token) == []
+
+
+def test_empty_dictionary(tmp_path):
+    with WordDictionaryWriter(tmp_path / 'words.bin'):
+        pass
+
+    with WordDictionary(tmp_path / 'words.bin') as words:
+        assert words.num_tokens == 0
+        assert words.lookup('foo') == []
+
+
+def test_unsorted_rows_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        with WordDictionaryWriter(tmp_path / 'words.bin') as writer:
+            writer.add(1, 'foo', 'w', 'foo', None)
+            writer.add(2, 'bar', 'w', 'bar', None)
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_bad_file(tmp_path):
+    (tmp_path / 'words.bin').write_text('This is not a dictionary at all.')
+
+    with pytest.raises(ValueError):
+        WordDictionary(tmp_path / 'words.bin')
@@ -13,7 +13,7 @@ import concurrent.futures
 import pytest
 import psycopg2
 
-from nominatim.db.async_connection import DBConnection, DeadlockHandler
+from nominatim.db.async_connection import DBConnection, DeadlockHandler, WorkerPool
 
 
 @pytest.fixture
@@ -70,6 +70,22 @@ def test_bad_query_ignore(temp_db):
         conn.wait()
 
 
+def test_worker_pool_locality_dispatch(temp_db):
+    with WorkerPool('dbname=' + temp_db, 3) as pool:
+        worker = pool.next_free_worker_for({1, 2})
+        worker.perform('SELECT pg_sleep(0.5)')
+
+        # Conflicting work waits for the same connection.
+        assert pool.next_free_worker_for({2, 3}) is worker
+        assert pool.conflicts_avoided == 1
+
+        worker.perform('SELECT pg_sleep(0.5)')
+
+        # Unrelated work goes to another connection.
+        assert pool.next_free_worker_for({4}) is not worker
+        assert pool.conflicts_avoided == 1
+
+
 def exec_with_deadlock(cur, sql, detector):
     with DeadlockHandler(lambda *args: detector.append(1)):
         cur.execute(sql)
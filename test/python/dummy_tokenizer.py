@@ -9,6 +9,7 @@ Tokenizer for testing.
 """
 from nominatim.data.place_info import PlaceInfo
 from nominatim.config import Configuration
+from nominatim.tokenizer.profiling import AnalyzerProfile
 
 def create(dsn, data_dir):
     """ Create a new instance of the tokenizer provided by this module.
@@ -79,3 +80,10 @@ class DummyNameAnalyzer:
     def process_place(place):
         assert isinstance(place, PlaceInfo)
         return {}
+
+    def process_places(self, places):
+        return [self.process_place(place) for place in places]
+
+    @staticmethod
+    def enable_profiling(dry_run=False):
+        return AnalyzerProfile(dry_run=dry_run)
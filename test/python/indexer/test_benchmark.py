@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the tokenizer benchmark.
+"""
+import pytest
+
+from nominatim.data import country_info
+from nominatim.data.place_info import PlaceInfo
+from nominatim.indexer.benchmark import BenchmarkResult, benchmark_tokenizer, \
+                                        benchmark_sanitizer
+from nominatim.tokenizer.profiling import CacheStats
+
+
+def test_benchmark_result_report():
+    stats = CacheStats()
+    stats.record(True)
+    stats.record(True)
+    stats.record(False)
+    result = BenchmarkResult(100, 2.0, True,
+                             {'sanitizer': 0.5, 'word lookup': 1.0}, {'names': stats})
+
+    assert result.places_per_second == 50.0
+    assert result.times['token analysis'] == pytest.approx(0.5)
+
+    report = result.report()
+
+    assert '100 places' in report
+    assert 'word lookup' in report
+    assert '66.7%' in report
+    assert 'dry run' not in report
+
+
+def test_benchmark_result_report_without_profile():
+    result = BenchmarkResult(10, 0.0, False, {}, {})
+
+    assert result.places_per_second == 0.0
+    assert 'does not support dry runs' in result.report()
+
+
+def test_benchmark_tokenizer(placex_table, tokenizer_mock, temp_db_cursor, dsn):
+    temp_db_cursor.execute("""CREATE OR REPLACE FUNCTION placex_indexing_prepare(p placex)
+                              RETURNS TABLE (name HSTORE, address HSTORE) AS $$
+                                SELECT p.name, p.address
+                              $$ LANGUAGE SQL STABLE""")
+    for i in range(10):
+        placex_table.add(names={'name': f'Place {i}'})
+
+    result = benchmark_tokenizer(dsn, tokenizer_mock(), 5)
+
+    assert result.places == 5
+
+
+def test_benchmark_sanitizer(def_config):
+    country_info.setup_country_config(def_config)
+    places = [PlaceInfo({'name': {'name': f'Place {i}'}}) for i in range(10)]
+    places.append(PlaceInfo({'address': {'postcode': '12345'}, 'country_code': 'de'}))
+
+    result = benchmark_sanitizer(places, [{'step': 'split-name-list'},
+                                          {'step': 'clean-postcodes'}], def_config, rounds=2)
+
+    assert result.places == 11
+    assert result.skipped == {'1. split-name-list': 1, '2. clean-postcodes': 10}
+    assert 'speedup' in result.report() or result.planned_time == 0
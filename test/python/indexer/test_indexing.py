@@ -8,9 +8,11 @@
 Tests for running the indexing.
 """
 import itertools
+import json
 import pytest
 
 from nominatim.indexer import indexer
+from nominatim.indexer.metrics import JsonLinesWriter
 from nominatim.tokenizer import factory
 
 class IndexerTestDB:
@@ -295,3 +297,224 @@ def test_index_reopen_connection(test_db, threads, monkeypatch, test_tokenizer):
     idx.index_by_rank(28, 30)
 
     assert test_db.placex_unindexed() == 0
+
+
+@pytest.mark.parametrize("threads", [1, 15])
+@pytest.mark.parametrize("processes", [1, 3])
+def test_index_with_tokenizer_processes(test_db, threads, processes, test_tokenizer):
+    for rank in range(4, 10):
+        test_db.add_admin(rank_address=rank, rank_search=rank)
+    for rank in range(31):
+        test_db.add_place(rank_address=rank, rank_search=rank)
+    for _ in range(250):
+        test_db.add_place(rank_address=30, rank_search=30)
+    test_db.add_osmline()
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, threads,
+                          indexer.IndexerOptions(tokenizer_processes=processes))
+    idx.index_boundaries(0, 30)
+    idx.index_by_rank(0, 30)
+
+    assert test_db.placex_unindexed() == 0
+    assert test_db.osmline_unindexed() == 0
+    assert test_db.scalar("""SELECT count(*) FROM placex
+                             WHERE token_info is null""") == 0
+
+
+@pytest.mark.parametrize("fetchers", [2, 5])
+def test_index_with_multiple_fetch_connections(test_db, fetchers, test_tokenizer):
+    for sector in range(1000):
+        test_db.add_place(rank_address=30, rank_search=30, sector=sector)
+    for postcode in range(1000):
+        test_db.add_postcode('de', postcode)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 4,
+                          indexer.IndexerOptions(fetch_connections=fetchers))
+    idx.index_by_rank(30, 30)
+    idx.index_postcodes()
+
+    assert test_db.placex_unindexed() == 0
+    assert test_db.scalar("""SELECT count(*) FROM location_postcode
+                             WHERE indexed_status != 0""") == 0
+
+
+@pytest.mark.parametrize("threads", [1, 15])
+def test_index_copy_write_mode(test_db, threads, test_tokenizer):
+    for rank in range(4, 10):
+        test_db.add_admin(rank_address=rank, rank_search=rank)
+    for rank in range(31):
+        test_db.add_place(rank_address=rank, rank_search=rank)
+    for _ in range(3000):
+        test_db.add_place(rank_address=30, rank_search=30)
+    test_db.add_osmline()
+    for postcode in range(1000):
+        test_db.add_postcode('de', postcode)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, threads,
+                          indexer.IndexerOptions(write_mode='copy'))
+    idx.index_full(analyse=False)
+
+    assert test_db.placex_unindexed() == 0
+    assert test_db.osmline_unindexed() == 0
+    assert test_db.scalar("""SELECT count(*) FROM location_postcode
+                             WHERE indexed_status != 0""") == 0
+    assert test_db.scalar("""SELECT count(*) FROM pg_tables
+                             WHERE tablename LIKE 'tmp_indexer_stage_%'""") == 0
+
+
+@pytest.mark.parametrize("threads", [1, 15])
+def test_index_adaptive_batches(test_db, threads, monkeypatch, test_tokenizer):
+    monkeypatch.setattr(indexer.BatchSizes, "MIN_SAMPLE_STATEMENTS", 1)
+
+    for rank in range(31):
+        test_db.add_place(rank_address=rank, rank_search=rank)
+    for _ in range(2000):
+        test_db.add_place(rank_address=30, rank_search=30)
+    test_db.add_osmline()
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, threads,
+                          indexer.IndexerOptions(adaptive_batches=True))
+    idx.index_by_rank(0, 30)
+
+    assert test_db.placex_unindexed() == 0
+    assert test_db.osmline_unindexed() == 0
+
+
+def test_index_full_with_checkpoints_clears_checkpoint(test_db, test_tokenizer):
+    for rank in range(31):
+        test_db.add_place(rank_address=rank, rank_search=rank)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 4,
+                          indexer.IndexerOptions(checkpoints=True))
+    idx.index_full(analyse=False)
+
+    assert test_db.placex_unindexed() == 0
+    assert test_db.scalar("""SELECT count(*) FROM nominatim_properties
+                             WHERE property = 'indexer_checkpoint'""") == 0
+
+
+def test_index_resume_from_checkpoint(test_db, test_tokenizer):
+    test_db.add_place(rank_address=5, rank_search=5)
+    test_db.add_place(rank_address=30, rank_search=30, sector=10)
+    test_db.add_place(rank_address=30, rank_search=30, sector=50)
+    test_db.add_place(rank_address=30, rank_search=30, sector=60)
+    with test_db.conn.cursor() as cur:
+        cur.execute("""INSERT INTO nominatim_properties VALUES
+                         ('indexer_checkpoint',
+                          '{"finished": ["rank 5"], "runner": "rank 30", "sector": 50}')""")
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 4,
+                          indexer.IndexerOptions(checkpoints=True))
+    idx.index_by_rank(1, 30)
+
+    # finished rank and sectors before the checkpoint are skipped
+    assert test_db.scalar("""SELECT array_agg(rank_address || '-' || geometry_sector
+                                              ORDER BY place_id)
+                             FROM placex WHERE indexed_status > 0""") == ['5-20', '30-10']
+    assert 'rank 30' in test_db.scalar("""SELECT value FROM nominatim_properties
+                                          WHERE property = 'indexer_checkpoint'""")
+
+
+def test_index_without_checkpoints_ignores_checkpoint(test_db, test_tokenizer):
+    test_db.add_place(rank_address=5, rank_search=5)
+    with test_db.conn.cursor() as cur:
+        cur.execute("""INSERT INTO nominatim_properties VALUES
+                         ('indexer_checkpoint', '{"finished": ["rank 5"]}')""")
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 4)
+    idx.index_by_rank(1, 30)
+
+    assert test_db.placex_unindexed() == 0
+
+
+def test_index_sharded(test_db, test_tokenizer, monkeypatch):
+    monkeypatch.setattr(indexer.Shard, 'wait_for_others', lambda *args: None)
+    for sector in range(10, 110, 10):
+        test_db.add_place(rank_address=30, rank_search=30, sector=sector)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 2,
+                          indexer.IndexerOptions(shard=indexer.Shard(1, 2)))
+    idx.index_by_rank(30, 30)
+
+    assert test_db.scalar("""SELECT array_agg(geometry_sector ORDER BY geometry_sector)
+                             FROM placex WHERE indexed_status > 0""") == [50, 60, 70, 80,
+                                                                          90, 100]
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 2,
+                          indexer.IndexerOptions(shard=indexer.Shard(2, 2)))
+    idx.index_by_rank(30, 30)
+
+    assert test_db.placex_unindexed() == 0
+
+
+def test_index_sharded_postcodes_only_in_first_shard(test_db, test_tokenizer, monkeypatch):
+    monkeypatch.setattr(indexer.Shard, 'wait_for_others', lambda *args: None)
+    for postcode in range(1000, 1010):
+        test_db.add_postcode('de', postcode)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 2,
+                          indexer.IndexerOptions(shard=indexer.Shard(2, 2)))
+    assert idx.index_postcodes() == 0
+    assert test_db.scalar("SELECT count(*) FROM location_postcode WHERE indexed_status > 0") == 10
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 2,
+                          indexer.IndexerOptions(shard=indexer.Shard(1, 2)))
+    idx.index_postcodes()
+    assert test_db.scalar("SELECT count(*) FROM location_postcode WHERE indexed_status > 0") == 0
+
+
+def test_index_uses_pending_summary(test_db, test_tokenizer, monkeypatch):
+    def _no_count(*args):
+        raise AssertionError("Unexpected count query")
+
+    monkeypatch.setattr(indexer.runners.RankRunner, 'sql_count_objects', _no_count)
+    test_db.add_place(rank_address=5, rank_search=5)
+    test_db.add_place(rank_address=30, rank_search=30)
+    test_db.add_place(rank_address=30, rank_search=30)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 2)
+
+    assert idx.index_by_rank(0, 30) == 3
+    assert test_db.placex_unindexed() == 0
+
+
+def test_index_pending_summary_outdated(test_db, test_tokenizer):
+    test_db.add_place(rank_address=30, rank_search=30)
+    test_db.add_place(rank_address=30, rank_search=30)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 2)
+    # Summary computed before the places were marked for indexing.
+    idx.pending = indexer.PendingSummary({})
+
+    assert idx.index_by_rank(30, 30) == 2
+    assert test_db.placex_unindexed() == 0
+
+
+def test_index_with_metrics(test_db, test_tokenizer, tmp_path):
+    test_db.add_place(rank_address=26, rank_search=26)
+    test_db.add_place(rank_address=30, rank_search=30)
+    test_db.add_place(rank_address=30, rank_search=30)
+
+    outfile = tmp_path / 'metrics.jsonl'
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, 2,
+                          indexer.IndexerOptions(metrics=JsonLinesWriter(outfile)))
+    idx.index_by_rank(26, 30)
+
+    lines = [json.loads(l) for l in outfile.read_text().splitlines()]
+
+    assert [(l['runner'], l['places']) for l in lines] == [('rank 26', 1), ('rank 30', 2)]
+    assert all(l['statements'] > 0 for l in lines)
+
+
+@pytest.mark.parametrize("threads", [1, 5])
+def test_index_locality_dispatch(test_db, threads, test_tokenizer):
+    for sector in (10, 10, 10, 20, 20, 30):
+        test_db.add_place(rank_address=30, rank_search=30, sector=sector)
+    test_db.add_osmline(sector=30)
+
+    idx = indexer.Indexer('dbname=test_nominatim_python_unittest', test_tokenizer, threads,
+                          indexer.IndexerOptions(locality_dispatch=True))
+    idx.index_by_rank(30, 30)
+
+    assert test_db.placex_unindexed() == 0
+    assert test_db.osmline_unindexed() == 0
@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the export of indexer metrics.
+"""
+import json
+
+import pytest
+
+from nominatim.errors import UsageError
+from nominatim.indexer import metrics
+
+
+def _make_metrics(runner, places=100, duration=2.0):
+    stats = metrics.RunnerMetrics(runner)
+    stats.places = places
+    stats.duration = duration
+    stats.deadlock_retries = 3
+
+    return stats
+
+
+def test_places_per_second():
+    assert _make_metrics('rank 30').places_per_second == 50.0
+    assert _make_metrics('rank 30', duration=0).places_per_second == 0.0
+
+
+def test_metrics_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        metrics.MetricsWriter(tmp_path / 'metrics.txt')
+
+
+def test_json_lines_writer(tmp_path):
+    outfile = tmp_path / 'metrics.jsonl'
+    writer = metrics.JsonLinesWriter(outfile)
+
+    writer.add(_make_metrics('rank 26'))
+    writer.add(_make_metrics('rank 30', places=10))
+
+    lines = [json.loads(l) for l in outfile.read_text().splitlines()]
+
+    assert [l['runner'] for l in lines] == ['rank 26', 'rank 30']
+    assert lines[1]['places'] == 10
+    assert lines[0]['places_per_second'] == 50.0
+    assert lines[0]['deadlock_retries'] == 3
+
+
+def test_prometheus_writer(tmp_path):
+    outfile = tmp_path / 'metrics.prom'
+    writer = metrics.PrometheusWriter(outfile)
+
+    writer.add(_make_metrics('rank 26'))
+    writer.add(_make_metrics('rank 30'))
+    writer.add(_make_metrics('rank 26', places=4))
+
+    lines = outfile.read_text().splitlines()
+
+    assert 'nominatim_indexer_places{runner="rank 26"} 4' in lines
+    assert 'nominatim_indexer_places{runner="rank 30"} 100' in lines
+    assert 'nominatim_indexer_deadlock_retries{runner="rank 30"} 3' in lines
+    assert '# TYPE nominatim_indexer_places gauge' in lines
+    assert not (tmp_path / 'metrics.prom.tmp').exists()
+
+
+def test_create_metrics_writer_disabled(project_env):
+    assert metrics.create_metrics_writer(project_env) is None
+
+
+@pytest.mark.parametrize('fmt,cls', [('json', metrics.JsonLinesWriter),
+                                     ('prometheus', metrics.PrometheusWriter)])
+def test_create_metrics_writer(project_env, monkeypatch, fmt, cls):
+    monkeypatch.setenv('NOMINATIM_INDEXER_METRICS_FILE', 'metrics.out')
+    monkeypatch.setenv('NOMINATIM_INDEXER_METRICS_FORMAT', fmt)
+
+    writer = metrics.create_metrics_writer(project_env)
+
+    assert isinstance(writer, cls)
+    assert writer.path == project_env.project_dir / 'metrics.out'
+
+
+def test_create_metrics_writer_bad_format(project_env, monkeypatch):
+    monkeypatch.setenv('NOMINATIM_INDEXER_METRICS_FILE', 'metrics.out')
+    monkeypatch.setenv('NOMINATIM_INDEXER_METRICS_FORMAT', 'xml')
+
+    with pytest.raises(UsageError):
+        metrics.create_metrics_writer(project_env)
@@ -0,0 +1,64 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the offline computation of token information.
+"""
+import pytest
+
+from nominatim.indexer import pretokenize, token_info
+
+
+class CountingAnalyzer:
+
+    def __init__(self):
+        self.processed = []
+
+    def process_places(self, places):
+        self.processed.extend(places)
+        return [{'names': p.name['name']} for p in places]
+
+
+def _place(**kwargs):
+    place = {'name': None, 'address': None, 'class': 'place', 'type': 'city',
+             'country_code': 'de', 'rank_address': 16}
+    place.update(kwargs)
+    return place
+
+
+@pytest.mark.parametrize('row,name,address',
+                         [(dict(name={'name': 'A', '_place_name': 'B'}), {'name': 'A'}, None),
+                          (dict(name={'_place_name': 'B'}), None, None),
+                          (dict(address={'city': 'X', '_unlisted_place': 'Y'}),
+                           None, {'city': 'X'}),
+                          (dict(address={'street': 'X', '_inherited': ''}), None, None)])
+def test_prepare_place(row, name, address):
+    place = pretokenize._prepare_place(_place(**row))
+
+    assert place['name'] == name
+    assert place['address'] == address
+
+
+def test_place_digest_changes_with_names():
+    digest = token_info.place_digest(_place(name={'name': 'A'}))
+
+    assert digest == token_info.place_digest(_place(name={'name': 'A'}))
+    assert digest != token_info.place_digest(_place(name={'name': 'A', '_place_name': 'B'}))
+    assert digest != token_info.place_digest(_place(name={'name': 'A'}, rank_address=4))
+
+
+def test_analyze_places_uses_valid_pretokenized_info():
+    analyzer = CountingAnalyzer()
+    valid = _place(name={'name': 'A'})
+    valid['pretoken_digest'] = token_info.place_digest(valid)
+    valid['pretoken_info'] = {'names': 'pre'}
+    outdated = _place(name={'name': 'B'}, pretoken_digest='x', pretoken_info={'names': 'old'})
+    missing = _place(name={'name': 'C'})
+
+    result = token_info.analyze_places(analyzer, [valid, outdated, missing])
+
+    assert result == [{'names': 'pre'}, {'names': 'B'}, {'names': 'C'}]
+    assert [p.name['name'] for p in analyzer.processed] == ['B', 'C']
@@ -0,0 +1,30 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for helper functions of the indexer runners.
+"""
+import pytest
+
+from nominatim.indexer import runners
+
+@pytest.mark.parametrize("data,result",
+                         [(None, None),
+                          ({}, ''),
+                          ({'name': 'Foo'}, '"name"=>"Foo"'),
+                          ({'a': 'x', 'b': None}, '"a"=>"x","b"=>NULL'),
+                          ({'q"': 'a\\b"c'}, '"q\\""=>"a\\\\b\\"c"')])
+def test_hstore_text(data, result):
+    assert runners._hstore_text(data) == result
+
+
+def test_hstore_text_roundtrip(temp_db_cursor):
+    temp_db_cursor.execute('CREATE EXTENSION IF NOT EXISTS hstore')
+    data = {'name': 'A "quoted" \\ name', 'ref': '=>', 'empty': ''}
+
+    for key, value in data.items():
+        assert temp_db_cursor.scalar('SELECT %s::hstore -> %s',
+                                     (runners._hstore_text(data), key)) == value
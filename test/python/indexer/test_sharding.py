@@ -0,0 +1,63 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the partitioning of indexing work into shards.
+"""
+import pytest
+
+from nominatim.errors import UsageError
+from nominatim.indexer import sharding
+from nominatim.indexer.sharding import Shard
+
+
+class RunnerStub:
+
+    def name(self):
+        return 'rank 30'
+
+
+def test_shard_from_string():
+    shard = Shard.from_string('2/5')
+
+    assert shard.shard == 2
+    assert shard.num_shards == 5
+    assert str(shard) == '2/5'
+    assert shard.property_name() == 'indexer_shards_5'
+
+
+@pytest.mark.parametrize('value', ['', '3', '1/2/3', 'a/b', '0/2', '3/2', '1/0'])
+def test_shard_from_string_invalid(value):
+    with pytest.raises(UsageError):
+        Shard.from_string(value)
+
+
+def test_single_shard_does_not_wait(dsn):
+    Shard(1, 1).wait_for_others(dsn, RunnerStub())
+
+
+def test_wait_for_others_waits_for_completion_markers(dsn, property_table, monkeypatch):
+    sleeps = []
+    def _other_shard_finishes(_):
+        sleeps.append(1)
+        Shard(2, 2).wait_for_others(dsn, RunnerStub())
+
+    monkeypatch.setattr(sharding.time, 'sleep', _other_shard_finishes)
+
+    Shard(1, 2).wait_for_others(dsn, RunnerStub())
+
+    assert len(sleeps) == 1
+
+
+def test_finish_clears_properties_in_last_shard_only(dsn, property_table):
+    property_table.set('indexer_shards_2', '{}')
+
+    assert not Shard(2, 2).finish(dsn)
+    assert property_table.get('indexer_shards_2') == '{}'
+
+    assert Shard(1, 2).finish(dsn)
+    assert property_table.get('indexer_shards_2') is None
+    assert property_table.get('indexer_shards_2_done') is None
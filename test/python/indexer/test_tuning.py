@@ -0,0 +1,92 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the adaptive batch sizes of the indexer.
+"""
+import pytest
+
+from nominatim.indexer.tuning import BatchSizes
+
+class FakeConnection:
+    def __init__(self):
+        self.query_time = 0.0
+        self.query_count = 0
+
+
+class FakePool:
+    def __init__(self, num_threads):
+        self.threads = [FakeConnection() for _ in range(num_threads)]
+        self.wait_time = 0.0
+
+    def run_queries(self, num, latency):
+        for thread in self.threads:
+            thread.query_count += num
+            thread.query_time += num * latency
+
+
+@pytest.fixture
+def pool():
+    return FakePool(4)
+
+
+def test_fixed_sizes_do_not_change(pool):
+    sizes = BatchSizes(100, 20, 4)
+    pool.run_queries(100, 0.001)
+
+    assert not sizes.update(100.0, pool)
+    assert (sizes.fetch_size, sizes.batch_size) == (100, 20)
+
+
+def test_no_update_with_too_few_statements(pool):
+    sizes = BatchSizes(100, 20, 4, adaptive=True)
+    pool.run_queries(1, 0.001)
+
+    assert not sizes.update(0.0, pool)
+    assert (sizes.fetch_size, sizes.batch_size) == (100, 20)
+
+
+def test_fast_statements_increase_batch_size(pool):
+    sizes = BatchSizes(100, 20, 4, adaptive=True)
+    pool.run_queries(10, 0.001)
+
+    assert sizes.update(0.0, pool)
+    assert sizes.batch_size == 40
+    # enough places fetched to keep all connections busy
+    assert sizes.fetch_size == 160
+
+
+def test_slow_statements_decrease_batch_size(pool):
+    sizes = BatchSizes(100, 20, 4, adaptive=True)
+    pool.run_queries(10, 2.0)
+
+    assert sizes.update(0.0, pool)
+    assert sizes.batch_size == 10
+    assert sizes.fetch_size == 100
+
+
+def test_batch_size_stays_within_bounds(pool):
+    sizes = BatchSizes(100, 1, 4, adaptive=True)
+    pool.run_queries(10, 2.0)
+    sizes.update(0.0, pool)
+
+    assert sizes.batch_size == 1
+
+    pool = FakePool(4)
+    sizes = BatchSizes(100, BatchSizes.MAX_BATCH_SIZE, 4, adaptive=True)
+    pool.run_queries(10, 0.001)
+    sizes.update(0.0, pool)
+
+    assert sizes.batch_size == BatchSizes.MAX_BATCH_SIZE
+    assert sizes.fetch_size <= BatchSizes.MAX_FETCH_SIZE
+
+
+def test_fetch_wait_increases_fetch_size(pool):
+    sizes = BatchSizes(100, 1, 4, adaptive=True)
+    pool.run_queries(10, 0.1)
+
+    assert sizes.update(1000.0, pool)
+    assert sizes.fetch_size == 200
@@ -13,8 +13,11 @@ import itertools
 
 import pytest
 
-from nominatim.tokenizer import icu_tokenizer
+from nominatim.tokenizer import icu_tokenizer, icu_token_cache
+from nominatim.tokenizer import token_cache_file as tcf
 import nominatim.tokenizer.icu_rule_loader
+import nominatim.tokenizer.word_frequencies
+import nominatim.tokenizer.housenumber_cleanup
 from nominatim.db import properties
 from nominatim.db.sql_preprocessor import SQLPreprocessor
 from nominatim.data.place_info import PlaceInfo
@@ -243,6 +246,26 @@ def test_update_statistics(word_table, table_factory, temp_db_cursor, tokenizer_
                                           (info->>'count')::int > 0""") > 0
 
 
+def test_update_statistics_parallel(word_table, table_factory, temp_db_cursor,
+                                    tokenizer_factory, monkeypatch):
+    monkeypatch.setattr(nominatim.tokenizer.word_frequencies, 'PLACE_CHUNK_SIZE', 5)
+    monkeypatch.setattr(nominatim.tokenizer.word_frequencies, 'WORD_CHUNK_SIZE', 2)
+    for wid in range(1000, 1005):
+        word_table.add_full_word(wid, f'w{wid}')
+    table_factory('search_name',
+                  'place_id BIGINT, name_vector INT[]',
+                  [(i, [1000 + i % 3, 1004]) for i in range(1, 23)])
+    tok = tokenizer_factory()
+
+    tok.update_statistics(threads=3)
+
+    counts = temp_db_cursor.row_set("""SELECT word_id, (info->>'count')::int FROM word
+                                       WHERE type = 'W'""")
+    assert counts == {(1000, 7), (1001, 8), (1002, 7), (1003, None), (1004, 22)}
+    assert not temp_db_cursor.table_exists('word_frequencies')
+    assert not temp_db_cursor.table_exists('word_frequencies_parts')
+
+
 def test_normalize_postcode(analyzer):
     with analyzer() as anl:
         anl.normalize_postcode('123') == '123'
@@ -388,6 +411,109 @@ def test_add_country_names_extend(analyzer, word_table):
     assert word_table.get_country() == {('ch', 'SCHWEIZ'), ('ch', 'SUISSE')}
 
 
+def test_token_cache_preload(word_table, temp_db_conn, temp_db_cursor):
+    temp_db_cursor.execute("""INSERT INTO word (word_id, word_token, type, word, info)
+                              VALUES (1, 'BAR', 'w', NULL, '{"count": 5}'),
+                                     (2, 'FOO', 'w', NULL, '{"count": 100}'),
+                                     (3, 'ZAP', 'w', NULL, '{"count": 1}'),
+                                     (4, 'FOO', 'W', 'foo', '{"count": 20}'),
+                                     (5, 'FOO', 'W', 'Foo', '{"count": 3}'),
+                                     (6, 'BAR', 'W', 'bar', '{"count": 2}')""")
+
+    cache = icu_token_cache.TokenCache(10, preload=2)
+    cache.preload(temp_db_conn, cache.preload_limit)
+
+    assert cache.preload_limit == 0
+
+    assert len(cache.partials) == 2
+    assert cache.partials.get('FOO') == 2
+    assert cache.partials.get('BAR') == 1
+    assert 'ZAP' not in cache.partials
+    assert len(cache.fulls) == 2
+    assert sorted(cache.fulls.get('FOO')) == [4, 5]
+    assert len(cache.names) == 2
+    assert cache.names.get('foo') == (4, [2])
+    assert cache.names.get('Foo') == (5, [2])
+
+
+def test_token_cache_preload_names(word_table, temp_db_conn, temp_db_cursor):
+    temp_db_cursor.execute("""INSERT INTO word (word_id, word_token, type, word, info)
+                              VALUES (1, 'BAR', 'w', NULL, '{"count": 5}'),
+                                     (2, 'FOO', 'w', NULL, '{"count": 100}'),
+                                     (3, 'FOO BAR', 'W', 'foo bar', '{"count": 20}'),
+                                     (3, 'BAR FOO', 'W', 'foo bar', '{"count": 20}'),
+                                     (4, 'FOO ZAP', 'W', 'foo zap', '{"count": 30}')""")
+
+    cache = icu_token_cache.TokenCache(10)
+    cache.preload(temp_db_conn, 10)
+
+    # 'foo zap' is missing the partial word 'ZAP'
+    assert len(cache.names) == 1
+    full, partials = cache.names.get('foo bar')
+    assert full == 3
+    assert sorted(partials) == [1, 2]
+
+
+def test_token_cache_preload_bounded(word_table, temp_db_conn, temp_db_cursor):
+    temp_db_cursor.execute("""INSERT INTO word (word_id, word_token, type, info)
+                              SELECT i, 'W' || i, 'w', json_build_object('count', i)
+                              FROM generate_series(1, 20) as i""")
+
+    cache = icu_token_cache.TokenCache(5)
+    cache.preload(temp_db_conn, 100)
+
+    assert len(cache.partials) == 5
+    assert all('W' + str(i) in cache.partials for i in range(16, 21))
+
+
+def test_token_cache_stats():
+    cache = icu_token_cache.TokenCache(2)
+    cache.partials['a'] = 1
+    cache.partials['b'] = 2
+    cache.partials.get('a')
+    cache.partials['c'] = 3
+
+    assert cache.partials.get('b') is None
+    assert cache.stats['partials'].hits == 1
+    assert cache.stats['partials'].misses == 1
+    assert cache.partials.evictions == 1
+
+
+def test_analyzer_with_cache_file(analyzer, sql_functions, word_table, temp_db_conn,
+                                  temp_db_cursor, tmp_path, monkeypatch):
+    monkeypatch.setenv('NOMINATIM_TOKENIZER_CACHE_FILE', 'yes')
+    place = PlaceInfo({'name': {'name': 'Soft Bar'}, 'address': {'housenumber': '34'}})
+
+    with analyzer() as anl:
+        info = anl.process_place(place)
+
+    tcf.write_cache_file(temp_db_conn, tmp_path / 'tokenizer')
+    # Remove the words, so that only the cache file knows them.
+    temp_db_cursor.execute("DELETE FROM word")
+
+    with analyzer() as anl:
+        assert anl.process_place(place) == info
+
+    assert word_table.count() == 0
+
+
+def test_analyzer_cache_file_journal(analyzer, sql_functions, word_table, temp_db_conn,
+                                     temp_db_cursor, tmp_path, monkeypatch):
+    monkeypatch.setenv('NOMINATIM_TOKENIZER_CACHE_FILE', 'yes')
+    tcf.write_cache_file(temp_db_conn, tmp_path / 'tokenizer')
+    place = PlaceInfo({'address': {'city': 'Honu Lulu'}})
+
+    with analyzer() as anl:
+        info = anl.process_place(place)
+
+    temp_db_cursor.execute("DELETE FROM word")
+
+    with analyzer() as anl:
+        assert anl.process_place(place) == info
+
+    assert word_table.count() == 0
+
+
 class TestPlaceNames:
 
     @pytest.fixture(autouse=True)
@@ -417,6 +543,24 @@ class TestPlaceNames:
         self.expect_name_terms(info, '#Soft bAr', '#34', 'Soft', 'bAr', '34')
 
 
+    def test_dry_run_does_not_save_words(self, word_table):
+        self.analyzer.enable_profiling(dry_run=True)
+        self.process_named_place({'name': 'Soft bAr'})
+        self.analyzer.close()
+
+        assert word_table.count() == 0
+
+
+    def test_process_places_shared_partials(self):
+        infos = self.analyzer.process_places([PlaceInfo({'name': {'name': 'Soft Bar'}}),
+                                              PlaceInfo({'name': {'name': 'Hard Bar'}}),
+                                              PlaceInfo({'name': {'name': 'Soft Bar'}})])
+
+        self.expect_name_terms(infos[0], '#Soft Bar', 'soft', 'bar')
+        self.expect_name_terms(infos[1], '#Hard Bar', 'hard', 'bar')
+        assert infos[2] == infos[0]
+
+
     @pytest.mark.parametrize('sep', [',' , ';'])
     def test_names_with_separator(self, sep):
         info = self.process_named_place({'name': sep.join(('New York', 'Big Apple'))})
@@ -551,6 +695,26 @@ class TestPlaceAddress:
         assert eval(info['street']) == self.name_token_set('#Grand Road')
 
 
+    def test_process_places_street_in_same_batch(self):
+        infos = self.analyzer.process_places([PlaceInfo({'name': {'name' : 'Grand Road'}}),
+                                              PlaceInfo({'address': {'street': 'Grand Road'}})])
+
+        assert len(infos) == 2
+        assert eval(infos[1]['street']) == self.name_token_set('#Grand Road')
+
+
+    def test_process_places_same_as_single(self, getorcreate_hnr_id):
+        places = [PlaceInfo({'address': {'housenumber': '12', 'city': 'Zwickau'}}),
+                  PlaceInfo({'address': {'housenumber': '3', 'city': 'Zwickau'}}),
+                  PlaceInfo({'address': {'housenumber': '12', 'place': 'Honu Lulu'}})]
+
+        infos = self.analyzer.process_places(places)
+
+        assert infos == [self.analyzer.process_place(place) for place in places]
+        assert infos[0]['hnr_tokens'] == infos[2]['hnr_tokens']
+        assert infos[0]['hnr_tokens'] != infos[1]['hnr_tokens']
+
+
     def test_process_place_place(self):
         info = self.process_address(place='Honu Lulu')
 
@@ -590,6 +754,34 @@ class TestPlaceAddress:
         assert result == {'city': self.name_token_set('Bruxelles')}
 
 
+    def test_process_place_profiling(self):
+        profile = self.analyzer.enable_profiling()
+
+        self.process_address(street='Grand Road', city='Zwickau')
+        self.process_address(city='Zwickau')
+
+        assert profile.times['sanitizer'] > 0
+        assert profile.times['word lookup'] > 0
+        assert profile.caches['partials'].hits == 1
+        assert profile.caches['partials'].misses == 1
+        assert profile.caches['fulls'].misses == 1
+        assert not profile.dry_run
+
+
+    def test_process_places_profiling(self):
+        profile = self.analyzer.enable_profiling()
+
+        self.analyzer.process_places(
+            [PlaceInfo({'address': {'street': 'Grand Road', 'city': 'Zwickau'}}),
+             PlaceInfo({'address': {'city': 'Zwickau'}}),
+             PlaceInfo({'address': {'city': 'Zwickau', 'suburb': 'Bosen'}})])
+
+        assert profile.caches['partials'].hits == 2
+        assert profile.caches['partials'].misses == 2
+        assert profile.caches['fulls'].hits == 0
+        assert profile.caches['fulls'].misses == 1
+
+
     def test_process_place_address_terms_empty(self):
         info = self.process_address(country='de', city=' ', street='Hauptstr',
                                     full='right behind the church')
@@ -727,6 +919,23 @@ class TestUpdateWordTokens:
         assert word_table.count_housenumbers() == 1
 
 
+    def test_cleanup_housenumbers_parallel(self, add_housenumber, word_table, temp_db_cursor,
+                                           search_entry, placex_table, monkeypatch):
+        monkeypatch.setattr(nominatim.tokenizer.housenumber_cleanup, 'PLACE_CHUNK_SIZE', 2)
+        monkeypatch.setattr(nominatim.tokenizer.housenumber_cleanup, 'WORD_CHUNK_SIZE', 2)
+        for i in range(10):
+            add_housenumber(9980 + i, f'{i} a')
+        search_entry(9981)
+        search_entry(123, 9985)
+        placex_table.add(housenumber='7 a;8 b')
+
+        self.tok.update_word_tokens(threads=3)
+
+        assert word_table.count_housenumbers() == 3
+        assert temp_db_cursor.row_set("SELECT word_id FROM word WHERE type = 'H'") \
+                 == {(9981, ), (9985, ), (9987, )}
+
+
     def test_keep_housenumbers_from_placex_table_hnr_list(self, add_housenumber, word_table, placex_table):
         add_housenumber(9991, '9 b')
         add_housenumber(9990, '34z')
@@ -13,6 +13,9 @@ import pytest
 import yaml
 
 from nominatim.tokenizer.icu_rule_loader import ICURuleLoader
+from nominatim.tokenizer.icu_rule_snapshot import SNAPSHOT_FILE
+import nominatim.tokenizer.token_analysis.generic
+import nominatim.config
 from nominatim.errors import UsageError
 
 from icu import Transliterator
@@ -73,6 +76,50 @@ class TestIcuRuleLoader:
         assert rules.get_transliteration_rules() == ''
 
 
+    def test_snapshot_is_used(self, tmp_path, monkeypatch):
+        self.config_rules('street -> st')
+        loader = ICURuleLoader(self.project_env, snapshot_dir=tmp_path)
+
+        assert (tmp_path / SNAPSHOT_FILE).exists()
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("Configuration must not be parsed.")
+
+        monkeypatch.setattr(self.project_env, 'load_sub_configuration', _fail)
+        monkeypatch.setattr(nominatim.tokenizer.token_analysis.generic, 'configure', _fail)
+
+        loader2 = ICURuleLoader(self.project_env, snapshot_dir=tmp_path)
+
+        assert loader2.get_search_rules() == loader.get_search_rules()
+        assert loader2.analysis_rules == loader.analysis_rules
+        assert loader2.analysis[None].config['replacements'] \
+                 == loader.analysis[None].config['replacements']
+
+        analyzer = loader2.make_token_analysis().get_analyzer(None)
+        assert sorted(analyzer.compute_variants('main street')) == ['main st', 'main street']
+
+
+    def test_snapshot_outdated_after_config_change(self, tmp_path, monkeypatch):
+        self.config_rules('street -> st')
+        ICURuleLoader(self.project_env, snapshot_dir=tmp_path)
+
+        monkeypatch.setattr(nominatim.config, 'CONFIG_CACHE', {})
+        self.config_rules('street -> str')
+        loader = ICURuleLoader(self.project_env, snapshot_dir=tmp_path)
+
+        analyzer = loader.make_token_analysis().get_analyzer(None)
+        assert sorted(analyzer.compute_variants('main street')) == ['main str', 'main street']
+
+
+    def test_snapshot_broken_file(self, tmp_path):
+        (tmp_path / SNAPSHOT_FILE).write_text('garbage')
+        self.config_rules('street -> st')
+
+        loader = ICURuleLoader(self.project_env, snapshot_dir=tmp_path)
+
+        assert loader.get_search_rules()
+
+
     @pytest.mark.parametrize("section", CONFIG_SECTIONS)
     def test_missing_section(self, section):
         rule_cfg = { s: [] for s in CONFIG_SECTIONS if s != section}
@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the memoization of results of the token analysis.
+"""
+from textwrap import dedent
+
+import pytest
+
+import nominatim.config
+from nominatim.tokenizer.icu_rule_loader import ICURuleLoader
+from nominatim.tokenizer.icu_token_analysis import memo_stats
+from nominatim.data.place_name import PlaceName
+
+
+@pytest.fixture
+def make_analysis(project_env, monkeypatch):
+    def _mk(*variants):
+        # The rule file is rewritten, so it must not come from the cache.
+        monkeypatch.setattr(nominatim.config, 'CONFIG_CACHE', {})
+        content = dedent("""\
+        normalization:
+            - ":: lower ()"
+        transliteration:
+            - "::  Latin ()"
+        token-analysis:
+            - analyzer: generic
+              variants:
+                  - words:
+        """)
+        content += '\n'.join(("             - " + s for s in variants)) + '\n'
+        (project_env.project_dir / 'icu_tokenizer.yaml').write_text(content)
+
+        return ICURuleLoader(project_env).make_token_analysis()
+
+    return _mk
+
+
+def test_memoized_variants(make_analysis):
+    analyzer = make_analysis('street -> st').get_analyzer(None)
+    stats = memo_stats()['variants']
+
+    variants = analyzer.compute_variants('main street')
+    hits = stats.hits
+    variants2 = analyzer.compute_variants('main street')
+
+    assert sorted(variants) == ['main st', 'main street']
+    assert variants2 == variants
+    assert stats.hits == hits + 1
+
+
+def test_memoized_variants_returns_copy(make_analysis):
+    analyzer = make_analysis('street -> st').get_analyzer(None)
+
+    analyzer.compute_variants('side street').append('foo')
+
+    assert 'foo' not in analyzer.compute_variants('side street')
+
+
+def test_memoized_canonical_id(make_analysis):
+    analyzer = make_analysis('street -> st').get_analyzer(None)
+    stats = memo_stats()['canonical ids']
+
+    assert analyzer.get_canonical_id(PlaceName('Main Street', 'name', None)) == 'main street'
+    hits = stats.hits
+    assert analyzer.get_canonical_id(PlaceName('Main Street', 'name', None)) == 'main street'
+    assert stats.hits == hits + 1
+
+
+def test_memo_shared_between_same_rules(make_analysis):
+    analyzer1 = make_analysis('street -> st').get_analyzer(None)
+    analyzer2 = make_analysis('street -> st').get_analyzer(None)
+    stats = memo_stats()['variants']
+
+    analyzer1.compute_variants('high street')
+    hits = stats.hits
+    analyzer2.compute_variants('high street')
+
+    assert stats.hits == hits + 1
+
+
+def test_memo_not_shared_between_different_rules(make_analysis):
+    analyzer1 = make_analysis('street -> st').get_analyzer(None)
+    analyzer2 = make_analysis('street -> str').get_analyzer(None)
+
+    assert 'low st' in analyzer1.compute_variants('low street')
+    assert sorted(analyzer2.compute_variants('low street')) == ['low str', 'low street']
@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the LRU cache used by the tokenizers.
+"""
+from nominatim.tokenizer.lru_cache import LRUCache
+
+
+def test_get_missing():
+    cache = LRUCache(10)
+
+    assert cache.get('foo') is None
+    assert cache.get('foo', 3) == 3
+    assert cache.stats.hits == 0
+    assert cache.stats.misses == 2
+
+
+def test_get_existing():
+    cache = LRUCache(10)
+    cache['foo'] = 'bar'
+
+    assert cache.get('foo') == 'bar'
+    assert 'foo' in cache
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 0
+
+
+def test_lookup_counts_missing_once():
+    cache = LRUCache(10)
+    cache['foo'] = 'bar'
+
+    assert cache.lookup('foo')
+    assert not cache.lookup('baz')
+    cache['baz'] = 'new'
+
+    assert cache.get('foo') == 'bar'
+    assert cache.get('baz') == 'new'
+    assert cache.get('baz') == 'new'
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 1
+
+
+def test_evict_least_recently_used():
+    cache = LRUCache(3)
+    for i in range(3):
+        cache[i] = i
+
+    cache.get(0)
+    cache[3] = 3
+
+    assert len(cache) == 3
+    assert 1 not in cache
+    assert all(i in cache for i in (0, 2, 3))
+    assert cache.evictions == 1
+
+
+def test_overwrite_does_not_evict():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    cache['a'] = 3
+
+    assert len(cache) == 2
+    assert cache.get('a') == 3
+    assert cache.evictions == 0
+
+
+def test_unbounded():
+    cache = LRUCache(0)
+    for i in range(1000):
+        cache[i] = i
+
+    assert len(cache) == 1000
+    assert cache.evictions == 0
+
+
+def test_clear_keeps_stats():
+    cache = LRUCache(10)
+    cache['a'] = 1
+    cache.get('a')
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.stats.hits == 1
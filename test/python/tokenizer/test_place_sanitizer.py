@@ -12,6 +12,7 @@ import pytest
 from nominatim.errors import UsageError
 import nominatim.tokenizer.place_sanitizer as sanitizer
 from nominatim.data.place_info import PlaceInfo
+from nominatim.data import country_info
 
 
 def test_placeinfo_clone_new_name():
@@ -75,3 +76,49 @@ def test_sanitizer_empty_list(def_config, rules):
 def test_sanitizer_missing_step_definition(def_config):
     with pytest.raises(UsageError):
         san = sanitizer.PlaceSanitizer([{'id': 'split-name-list'}], def_config)
+
+
+def test_sanitizer_skips_handler_out_of_scope(def_config):
+    country_info.setup_country_config(def_config)
+    san = sanitizer.PlaceSanitizer([{'step': 'clean-postcodes'},
+                                    {'step': 'split-name-list'}], def_config)
+
+    name, address = san.process_names(PlaceInfo({'address': {'street': 'Bald'}}))
+
+    assert not name
+    assert [a.name for a in address] == ['Bald']
+    assert san.skipped == [1, 1]
+
+
+def test_sanitizer_scope_follows_changed_kinds(def_config):
+    san = sanitizer.PlaceSanitizer([{'step': 'clean-housenumbers',
+                                     'filter-kind': ['housenumber', 'conscriptionnumber'],
+                                     'convert-to-name': '.*'},
+                                    {'step': 'split-name-list'}], def_config)
+
+    name, _ = san.process_names(PlaceInfo({'address': {'conscriptionnumber': 'abc;def'}}))
+
+    assert [n.name for n in name] == ['abc', 'def']
+    assert san.skipped == [0, 0]
+
+
+@pytest.mark.parametrize('dispatch', [True, False])
+@pytest.mark.parametrize('place', [{'name': {'name': 'A;B (C)'}},
+                                   {'address': {'postcode': '12345', 'housenumber': '1;2'}},
+                                   {'name': {'name': 'Foo'}, 'address': {'street': 'Bar'}},
+                                   {}])
+def test_sanitizer_dispatch_same_result(def_config, dispatch, place):
+    country_info.setup_country_config(def_config)
+    rules = [{'step': 'split-name-list'}, {'step': 'strip-brace-terms'},
+             {'step': 'clean-housenumbers'}, {'step': 'clean-postcodes'},
+             {'step': 'tag-analyzer-by-language'}]
+    san = sanitizer.PlaceSanitizer(rules, def_config, dispatch=dispatch)
+    ref = sanitizer.PlaceSanitizer(rules, def_config, dispatch=False)
+
+    place = dict(place, country_code='de')
+
+    def _simplify(result):
+        return [sorted((n.name, n.kind, n.suffix) for n in names) for names in result]
+
+    assert _simplify(san.process_names(PlaceInfo(place))) \
+             == _simplify(ref.process_names(PlaceInfo(place)))
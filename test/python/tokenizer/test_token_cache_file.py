@@ -0,0 +1,144 @@
+# SPDX-License-Identifier: GPL-2.0-only
+#
+# This file is part of Nominatim. (https://nominatim.org)
+#
+# Copyright (C) 2022 by the Nominatim developer community.
+# For a full list of authors see the git log.
+"""
+Tests for the persistent token cache of the ICU tokenizer.
+"""
+import pytest
+
+from nominatim.tokenizer import token_cache_file as tcf
+from nominatim.db import properties
+
+from mock_icu_word_table import MockIcuWordTable
+
+
+@pytest.fixture
+def word_table(temp_db_conn, property_table):
+    table = MockIcuWordTable(temp_db_conn)
+    with temp_db_conn.cursor() as cur:
+        cur.execute("""INSERT INTO word (word_id, word_token, type, word)
+                       VALUES (1, 'MAIN', 'w', NULL),
+                              (2, 'STREET', 'w', NULL),
+                              (3, 'ST', 'w', NULL),
+                              (4, 'MAIN STREET', 'W', 'main street'),
+                              (4, 'MAIN ST', 'W', 'main street'),
+                              (5, 'MAIN ST', 'W', 'main st'),
+                              (6, '12A', 'H', NULL),
+                              (7, '3 A', 'H', '3 a'),
+                              (7, '3A', 'H', '3 a'),
+                              (8, 'ÄPFEL', 'w', NULL)""")
+    temp_db_conn.commit()
+    return table
+
+
+@pytest.fixture
+def cache_file(word_table, temp_db_conn, tmp_path):
+    tcf.write_cache_file(temp_db_conn, tmp_path)
+    cache = tcf.TokenCacheFile.load(temp_db_conn, tmp_path)
+    assert cache is not None
+    yield cache
+    cache.close(flush=False)
+
+
+@pytest.mark.parametrize('kind,key,ids', [(tcf.PARTIAL, 'MAIN', [1]),
+                                          (tcf.PARTIAL, 'ST', [3]),
+                                          (tcf.PARTIAL, 'ÄPFEL', [8]),
+                                          (tcf.FULL, 'MAIN STREET', [4]),
+                                          (tcf.NAME, 'main street', [4]),
+                                          (tcf.NAME, 'main st', [5]),
+                                          (tcf.HOUSENUMBER, '12A', [6]),
+                                          (tcf.HOUSENUMBER, '3A', [7]),
+                                          (tcf.ANALYZED_HOUSENUMBER, '3 a', [7])])
+def test_lookup(cache_file, kind, key, ids):
+    assert cache_file.get(kind, key) == ids
+
+
+def test_lookup_full_multiple(cache_file):
+    assert sorted(cache_file.get(tcf.FULL, 'MAIN ST')) == [4, 5]
+
+
+@pytest.mark.parametrize('kind,key', [(tcf.PARTIAL, 'MAIN ST'), (tcf.PARTIAL, 'A'),
+                                      (tcf.PARTIAL, 'ZZZ'), (tcf.FULL, 'MAIN'),
+                                      (tcf.HOUSENUMBER, '3 a')])
+def test_lookup_missing(cache_file, kind, key):
+    assert cache_file.get(kind, key) is None
+
+
+def test_journal(cache_file, temp_db_conn, tmp_path):
+    cache_file.add(tcf.PARTIAL, 'NEW', [99])
+    assert cache_file.get(tcf.PARTIAL, 'NEW') == [99]
+    cache_file.flush()
+
+    other = tcf.TokenCacheFile.load(temp_db_conn, tmp_path)
+    assert other.get(tcf.PARTIAL, 'NEW') == [99]
+    assert other.get(tcf.PARTIAL, 'MAIN') == [1]
+    other.close()
+
+
+def test_rewrite_discards_journal(cache_file, temp_db_conn, tmp_path):
+    cache_file.add(tcf.PARTIAL, 'NEW', [99])
+    cache_file.flush()
+
+    tcf.write_cache_file(temp_db_conn, tmp_path)
+
+    assert not (tmp_path / tcf.JOURNAL_FILE).exists()
+    other = tcf.TokenCacheFile.load(temp_db_conn, tmp_path)
+    assert other.get(tcf.PARTIAL, 'NEW') is None
+    other.close()
+
+
+def test_flush_replaces_outdated_journal(cache_file, temp_db_conn, tmp_path):
+    (tmp_path / tcf.JOURNAL_FILE).write_text('abcdef\n["w\\u001fOLD", [98]]\n')
+
+    cache_file.add(tcf.PARTIAL, 'NEW', [99])
+    cache_file.flush()
+
+    other = tcf.TokenCacheFile.load(temp_db_conn, tmp_path)
+    assert other.get(tcf.PARTIAL, 'NEW') == [99]
+    assert other.get(tcf.PARTIAL, 'OLD') is None
+    other.close()
+
+
+def test_flush_after_rewrite(cache_file, temp_db_conn, tmp_path):
+    tcf.write_cache_file(temp_db_conn, tmp_path)
+
+    cache_file.add(tcf.PARTIAL, 'NEW', [99])
+    cache_file.flush()
+
+    assert (tmp_path / tcf.JOURNAL_FILE).stat().st_size == 0
+    other = tcf.TokenCacheFile.load(temp_db_conn, tmp_path)
+    assert other.get(tcf.PARTIAL, 'NEW') is None
+    other.close()
+
+
+def test_flush_full_journal(cache_file, temp_db_conn, tmp_path, monkeypatch):
+    monkeypatch.setattr(tcf, 'MAX_JOURNAL_SIZE', 10)
+    cache_file.add(tcf.PARTIAL, 'FIRST', [98])
+    cache_file.flush()
+    cache_file.add(tcf.PARTIAL, 'NEW', [99])
+    cache_file.flush()
+
+    other = tcf.TokenCacheFile.load(temp_db_conn, tmp_path)
+    assert other.get(tcf.PARTIAL, 'FIRST') == [98]
+    assert other.get(tcf.PARTIAL, 'NEW') is None
+    other.close()
+
+
+def test_invalidate(cache_file, temp_db_conn, tmp_path):
+    tcf.invalidate_cache_file(temp_db_conn, tmp_path)
+
+    assert not (tmp_path / tcf.CACHE_FILE).exists()
+    assert tcf.TokenCacheFile.load(temp_db_conn, tmp_path) is None
+
+
+def test_load_outdated_stamp(cache_file, temp_db_conn, tmp_path):
+    properties.set_property(temp_db_conn, tcf.DBCFG_TOKEN_CACHE, 'abcdef')
+
+    assert tcf.TokenCacheFile.load(temp_db_conn, tmp_path) is None
+
+
+def test_load_without_file(property_table, temp_db_conn, tmp_path):
+    assert tcf.TokenCacheFile.load(temp_db_conn, tmp_path) is None
@@ -12,6 +12,9 @@ from pathlib import Path
 import pytest
 
 from nominatim.tools import refresh
+from nominatim.data.word_dictionary import WordDictionary
+
+from mock_icu_word_table import MockIcuWordTable
 
 def test_refresh_import_wikipedia_not_existing(dsn):
     assert refresh.import_wikipedia_articles(dsn, Path('.')) == 1
@@ -99,3 +102,50 @@ def test_invalidate_osm_object_recursive(placex_table, osm_type, temp_db_conn, t
     assert 522 == temp_db_cursor.scalar("""SELECT indexed_status FROM placex
                                            WHERE osm_type = %s and osm_id = %s""",
                                         (osm_type, 57283))
+
+
+class TestExportWordDictionary:
+
+    @pytest.fixture(autouse=True)
+    def setup_tables(self, temp_db_conn, property_table, tmp_path):
+        self.conn = temp_db_conn
+        self.word_table = MockIcuWordTable(temp_db_conn)
+        self.filename = tmp_path / 'words.bin'
+        property_table.set('tokenizer', 'icu')
+        temp_db_conn.commit()
+
+
+    def test_export(self):
+        self.word_table.add_full_word(1, 'foo')
+        self.word_table.add_full_word(2, 'bar')
+        self.word_table.add_postcode(' 1234', '1234')
+
+        assert refresh.export_word_dictionary(self.conn, self.filename)
+
+        with WordDictionary(self.filename) as words:
+            assert words.num_rows == 3
+            assert words.max_word_id == 2
+            assert [r.word_id for r in words.lookup('bar')] == [2]
+            assert words.lookup(' 1234')[0].word == '1234'
+
+
+    def test_export_only_if_changed(self):
+        self.word_table.add_full_word(1, 'foo')
+
+        assert refresh.export_word_dictionary(self.conn, self.filename,
+                                              only_if_changed=True)
+        assert not refresh.export_word_dictionary(self.conn, self.filename,
+                                                  only_if_changed=True)
+
+        self.word_table.add_full_word(2, 'bar')
+
+        assert refresh.export_word_dictionary(self.conn, self.filename,
+                                              only_if_changed=True)
+
+
+    def test_export_legacy_tokenizer(self, property_table):
+        property_table.set('tokenizer', 'legacy')
+        self.conn.commit()
+
+        assert not refresh.export_word_dictionary(self.conn, self.filename)
+        assert not self.filename.exists()
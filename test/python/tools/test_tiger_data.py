@@ -9,6 +9,7 @@ Test for tiger data function
 """
 import tarfile
 from textwrap import dedent
+import io
 
 import pytest
 
@@ -46,17 +47,17 @@ def tiger_table(def_config, temp_db_conn, sql_preprocessor,
     def_config.lib_dir.sql.mkdir()
 
     (def_config.lib_dir.sql / 'tiger_import_start.sql').write_text(
-        """CREATE OR REPLACE FUNCTION tiger_line_import(linegeo GEOMETRY, start INTEGER,
-                                                        stop INTEGER, interpol TEXT,
-                                                        token_info JSONB, postcode TEXT)
+        """CREATE OR REPLACE FUNCTION tiger_import_from_staging(staging TEXT)
            RETURNS INTEGER AS $$
-            INSERT INTO tiger VALUES(linegeo, start, stop, interpol, token_info, postcode)
-            RETURNING 1
-           $$ LANGUAGE SQL;""")
+           BEGIN
+             EXECUTE format('INSERT INTO tiger
+                               SELECT linegeo::GEOMETRY, startnumber, endnumber,
+                                      interpolation, token_info, postcode FROM %I', staging);
+             RETURN 1;
+           END;
+           $$ LANGUAGE plpgsql;""")
     (def_config.lib_dir.sql / 'tiger_import_finish.sql').write_text(
-        """DROP FUNCTION tiger_line_import (linegeo GEOMETRY, in_startnumber INTEGER,
-                                 in_endnumber INTEGER, interpolationtype TEXT,
-                                 token_info JSONB, in_postcode TEXT);""")
+        """DROP FUNCTION tiger_import_from_staging (staging TEXT);""")
 
     return MockTigerTable(temp_db_conn)
 
@@ -123,6 +124,17 @@ def test_add_tiger_data_hnr_nan(def_config, tiger_table, tokenizer_mock,
     assert tiger_table.row()['start'] == 99
 
 
+def test_add_tiger_data_broken_geometry(def_config, tiger_table, tokenizer_mock,
+                                        csv_factory, tmp_path):
+    csv_factory('file1', hnr_from=99)
+    csv_factory('file2', geometry='LINESTRING(-86.466995')
+
+    tiger_data.add_tiger_data(str(tmp_path), def_config, 1, tokenizer_mock())
+
+    assert tiger_table.count() == 1
+    assert tiger_table.row()['start'] == 99
+
+
 @pytest.mark.parametrize("threads", (1, 5))
 def test_add_tiger_data_tarfile(def_config, tiger_table, tokenizer_mock,
                                 tmp_path, src_dir, threads):
@@ -155,3 +167,71 @@ def test_add_tiger_data_empty_tarfile(def_config, tiger_table, tokenizer_mock,
                               tokenizer_mock())
 
     assert tiger_table.count() == 0
+
+
+class _CountingAnalyzer:
+
+    def __init__(self):
+        self.calls = 0
+
+    def process_place(self, place):
+        self.calls += 1
+        return {'street': place.address['street']}
+
+    @staticmethod
+    def normalize_postcode(postcode):
+        return postcode.upper()
+
+
+class _CollectingStaging:
+
+    def __init__(self):
+        self.lines = []
+
+    def load(self, lines):
+        self.lines.extend(lines)
+
+
+def test_load_tiger_file_dedups_street_tokens():
+    fd = io.StringIO(dedent("""\
+        from;to;interpolation;street;city;state;postcode;geometry
+        1;9;odd;Main St;Newtown;AL;12345;LINESTRING(0 0,1 1)
+        2;10;even;Main St;Newtown;AL;12345;LINESTRING(0 0,1 1)
+        11;19;odd;Main St;Newtown;AL;12346;LINESTRING(0 0,1 1)
+        x;19;odd;Side St;Newtown;AL;12346;LINESTRING(0 0,1 1)
+        21;29;odd;Side St;Newtown;AL;12346;
+        31;39;odd;Side St
+        """))
+    analyzer = _CountingAnalyzer()
+    staging = _CollectingStaging()
+
+    assert tiger_data.load_tiger_file(fd, analyzer, staging) == 3
+
+    assert analyzer.calls == 2
+    assert [line[1:3] for line in staging.lines] == [(1, 9), (2, 10), (11, 19)]
+    assert staging.lines[0][0] == 'SRID=4326;LINESTRING(0 0,1 1)'
+    assert staging.lines[2][-1] == '12346'
+
+
+class _PoolStub:
+
+    def __init__(self):
+        self.statements = []
+
+    def next_free_worker(self):
+        return self
+
+    def perform(self, sql):
+        self.statements.append(sql)
+
+
+def test_staging_skips_lines_that_cannot_be_copied(temp_db_conn, temp_db_cursor):
+    pool = _PoolStub()
+    staging = tiger_data.TigerStaging(temp_db_conn, pool)
+    line = ('SRID=4326;LINESTRING(0 0,1 1)', 1, 9, 'odd', '{}', '12345')
+
+    staging.load([line, line[:3] + ('o\x00dd', ) + line[4:], line])
+
+    assert len(pool.statements) == 2
+    tables = [t for t in staging.tables if temp_db_cursor.table_exists(t)]
+    assert sum(temp_db_cursor.table_rows(t) for t in tables) == 2